@@ -0,0 +1,174 @@
+"""
+Bounded cache of whole answers to inline queries.
+
+Telegram sends the same inline queries over and over again: users retype the
+text, popular strings are sent by different users, backspace repeats an
+earlier prefix. The cache stores the built list of results and lets
+concurrent identical queries share one computation.
+
+Answers depend on external data (currency exchange rates): not only the
+results of the calculators but also the set of matching processors. So the
+whole cache is tied to the version of the data and dropped when it changes.
+"""
+
+import json
+import time
+import logging
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+from dataclasses import dataclass
+from typing import *
+
+from prometheus_client import Counter, Gauge
+
+K = TypeVar('K')
+V = TypeVar('V')
+
+_hits = Counter("answer_cache_hits", "Inline answers taken from the cache")
+_misses = Counter("answer_cache_misses", "Inline answers computed from scratch")
+_coalesced = Counter("answer_cache_coalesced", "Inline answers shared with a concurrent identical query")
+_size = Gauge("answer_cache_size_bytes", "Approximate size of all cached inline answers")
+
+
+def json_size(value) -> int:
+    """:return: the length of the value serialized as JSON, in bytes"""
+    return len(json.dumps(value, ensure_ascii=False).encode())
+
+
+@dataclass
+class _Entry(Generic[V]):
+    value: V
+    size: int
+    expires_at: float
+
+
+class AnswerCache(Generic[K, V]):
+    """
+    LRU cache with TTL, bounded by the total size of its values.
+
+    All values are dropped at once as soon as the version returned by
+    `version_func` changes.
+    """
+
+    _logger = logging.getLogger(__name__)
+
+    def __init__(self, max_bytes: int, ttl: float,
+                 version_func: Callable[[], int] = lambda: 0,
+                 sizeof: Callable[[V], int] = json_size) -> None:
+        """
+        :param max_bytes: the maximum total size of all values
+        :param ttl: time to live of each value, in seconds
+        :param version_func: a function returning the current version of the external data
+        :param sizeof: a function estimating the size of a value
+        """
+        self._max_bytes = max_bytes
+        self._ttl = ttl
+        self._version_func = version_func
+        self._sizeof = sizeof
+
+        self._entries: OrderedDict[K, _Entry[V]] = OrderedDict()
+        self._in_flight: Dict[K, Future] = {}
+        self._total_size = 0
+        self._version = version_func()
+        self._lock = threading.Lock()
+
+    def get(self, key: K) -> Optional[V]:
+        """Return the cached value or None without computing it. Misses are not counted."""
+        with self._lock:
+            entry = self._get_valid_entry(key)
+        if entry:
+            _hits.inc()
+            return entry.value
+        return None
+
+    def get_or_compute(self, key: K, compute: Callable[[], V]) -> V:
+        """
+        Return the cached value or compute it. If the same key is being computed
+        concurrently, wait for that computation instead of starting another one.
+
+        :param key: a normalized key of the query
+        :param compute: a function returning the value
+        """
+        with self._lock:
+            entry = self._get_valid_entry(key)
+            if entry:
+                _hits.inc()
+                return entry.value
+            future = self._in_flight.get(key)
+            owner = future is None
+            if owner:
+                future = self._in_flight[key] = Future()
+
+        if not owner:
+            _coalesced.inc()
+            return future.result()
+
+        _misses.inc()
+        # taken in advance, so the data can't be updated between the computation and this moment unnoticed
+        version = self._version_func()
+        try:
+            value = compute()
+        except BaseException as err:
+            future.set_exception(err)
+            raise
+        else:
+            future.set_result(value)
+            self._put(key, value, version)
+            return value
+        finally:
+            with self._lock:
+                del self._in_flight[key]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _get_valid_entry(self, key: K) -> Optional[_Entry[V]]:
+        self._check_version()
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry.expires_at < time.monotonic():
+            self._remove(key)
+            return None
+        self._entries.move_to_end(key)
+        return entry
+
+    def _put(self, key: K, value: V, version: int) -> None:
+        size = self._sizeof(value)
+        if size > self._max_bytes:
+            self._logger.debug(f"The answer is too large to be cached: {size} bytes")
+            return
+        with self._lock:
+            self._check_version()
+            if version != self._version:
+                # computed with the data that has been updated since then
+                return
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = _Entry(value, size, time.monotonic() + self._ttl)
+            self._total_size += size
+            while self._total_size > self._max_bytes:
+                self._remove(next(iter(self._entries)))
+            _size.set(self._total_size)
+
+    def _check_version(self) -> None:
+        version = self._version_func()
+        if version != self._version:
+            self._logger.debug(f"The data has been updated, dropping {len(self._entries)} cached answers")
+            self._version = version
+            self._clear()
+
+    def _clear(self) -> None:
+        self._entries.clear()
+        self._total_size = 0
+        _size.set(0)
+
+    def _remove(self, key: K) -> None:
+        entry = self._entries.pop(key)
+        self._total_size -= entry.size
+        _size.set(self._total_size)
@@ -1,131 +1,244 @@
 #!/usr/bin/env python3
-import json
+import time
+# taken before the heavy imports to include them into the startup profile
+_started_at = time.perf_counter()
+
 import os
 import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional, Tuple
 from aiohttp import web
 from aiotg import Bot, Chat, InlineQuery, CallbackQuery, ChosenInlineResult
 from klocmod import LocalizationsContainer
 
 import msgdb
 import strconv
-from strconv.currates import update_rates_async_loop, update_volatile_rates_async_loop
-from txtproc import TextProcessorsLoader, TextProcessor, metrics
-from txtprocutil import resolve_text_processor_name, collect_help_messages, divide_chunks
+from answercache import AnswerCache
+from strconv.currates import update_rates_async_loop, update_volatile_rates_async_loop, rates_version, \
+    get_snapshot, install_snapshot
+from txtproc import TextProcessorsLoader, TextProcessor, ProcessResult, metrics
+from txtproc.pool import ProcessorPool
+from txtproc.features import extract_features
+from txtprocutil import resolve_text_processor_name, HelpCatalog
+from startup import StartupProfile
+from data import config
 from data.config import *
 from data.currates_conf import EXCHANGE_RATE_SOURCES, UPDATE_VOLATILE_PERIOD_IN_HOURS
 from queryutil import *
 
 
 DECRYPT_BUTTON_CACHE_TIME = 3600    # in seconds
-
-logging.basicConfig(level=logging.DEBUG if DEBUG else logging.INFO)
-bot = Bot(api_token=TOKEN, default_in_groups=True)
-localizations = LocalizationsContainer.from_file("app/localizations.ini")
-
-text_processors = TextProcessorsLoader(strconv)
-metrics.register(*text_processors.all_processors)
-
-async_tasks = [
-    update_rates_async_loop(EXCHANGE_RATE_SOURCES),
-    update_volatile_rates_async_loop(EXCHANGE_RATE_SOURCES, UPDATE_VOLATILE_PERIOD_IN_HOURS),
-]
+HELP_LANGUAGES = ('en', 'ru')       # the languages of 'localizations.ini'
+ANSWER_CACHE_TTL = 600              # in seconds
+ANSWER_CACHE_MAX_SIZE = 32 * 2**20  # in bytes
+
+# settings that are missing in configuration files of older versions (see 'examples/config.py')
+METRICS_SAMPLING_RATE = getattr(config, 'METRICS_SAMPLING_RATE', 0.1)
+HANDLER_THREADS = getattr(config, 'HANDLER_THREADS', 4)
+EXPENSIVE_PROCESSORS_WORKERS = getattr(config, 'EXPENSIVE_PROCESSORS_WORKERS', 2)
+EXPENSIVE_PROCESSORS_TIMEOUT = getattr(config, 'EXPENSIVE_PROCESSORS_TIMEOUT', 1.0)
+MESSAGES_TTL_IN_DAYS = getattr(config, 'MESSAGES_TTL_IN_DAYS', 30)
+
+bot = Bot(api_token=TOKEN, default_in_groups=True, json_serialize=json_serialize)
+
+# Worker processes of 'processor_pool' import this module as '__mp_main__', so the state below is set up by 'main'
+# only. The handlers are defined here but never called there.
+localizations: LocalizationsContainer
+text_processors: TextProcessorsLoader
+help_catalog: HelpCatalog
+# answers are cached already serialized and dropped when the rates are updated
+answer_cache: AnswerCache
+# building of answers is moved off the event loop, so it can accept other updates meanwhile
+handler_executor: ThreadPoolExecutor
+# workers get a copy of the exchange rates and are replaced when the rates change
+processor_pool: Optional[ProcessorPool] = None
 
 
 @bot.command("/start")
 @bot.command("/help")
 @bot.default
 async def start(chat: Chat, _) -> None:
-    lang = localizations.get_lang(chat.message['from'].get('language_code'))
-    messages = collect_help_messages(text_processors.all_processors, lang)
-    kb = InlineKeyboardBuilder()
-    for row in divide_chunks(messages, 2):
-        r = kb.add_row()
-        for cmd in row:
-            r.add(cmd.title, callback_data=f"help:{cmd.name}")
-    chat.send_text(lang['help_message'], parse_mode="Markdown", reply_markup=json.dumps(kb.build()))
+    localized_help = help_catalog.get(localizations.get_lang(chat.message['from'].get('language_code')))
+    chat.send_text(localized_help.message, parse_mode="Markdown", reply_markup=localized_help.reply_markup)
 
 
 @bot.callback("help:")
 def help_callback(chat: Chat, query: CallbackQuery, _: str) -> None:
     lang = localizations.get_lang(query.src['from'].get('language_code'))
+    localized_help = help_catalog.get(lang)
     proc_name = query.data[5:]
-    localized_proc_name = lang[f"hint_{proc_name}"]
+    page = localized_help.pages.get(proc_name)
+    if page is None:
+        # a button of an outdated message, the client waits for an answer anyway
+        query.answer()
+        return
     src_msg = query.src['message']
     src_text: str = src_msg.get('text')
-    if src_text and localized_proc_name == src_text.partition('\n')[0]:
+    if src_text and localized_help.titles[proc_name] == src_text.partition('\n')[0]:
         query.answer(text=lang['current_help_tab'])
     else:
-        messages = collect_help_messages(text_processors.all_processors, lang)
-        msg = [m for m in messages if m.name == proc_name]
-        answer = f"*{localized_proc_name}*\n\n{msg[0].description}"
-        bot.edit_message_text(chat.id, src_msg['message_id'], answer,
+        bot.edit_message_text(chat.id, src_msg['message_id'], page,
                               parse_mode='Markdown',
-                              reply_markup=json.dumps(src_msg['reply_markup']))
+                              reply_markup=localized_help.reply_markup)
 
 
 @bot.inline
-def inline_request_handler(request: InlineQuery) -> None:
+async def inline_request_handler(request: InlineQuery) -> None:
+    with metrics.inline_request_duration.time():
+        lang_code = request.sender.get('language_code') or ""
+        # surrounding whitespace is left by users typing the query and mustn't make a separate answer
+        query = request.query.strip()
+        key = (query, lang_code)
+        # cached answers don't need a trip to another thread
+        results = answer_cache.get(key)
+        if results is None:
+            compute = functools.partial(build_answer, query, lang_code)
+            results = await asyncio.get_running_loop().run_in_executor(handler_executor, answer_cache.get_or_compute,
+                                                                       key, compute)
+        request.answer(results)
+
+
+def build_answer(query: str, lang_code: str) -> RawJSON:
+    """
+    Runs in a thread of 'handler_executor', so it's allowed to block.
+    :return: a serialized list of inline results
+    """
     results = InlineQueryResultsBuilder()
     add_article = get_articles_generator_for(results)
-    lang_code = request.sender.get('language_code')
     lang = localizations.get_lang(lang_code)
-
-    def transform_query(transformer: TextProcessor, **kwargs):
-        processed_str = transformer.process(request.query, lang_code)
-        description = transformer.get_description(request.query, lang_code)
-        parse_mode = "HTML" if transformer.use_html else ""
-        localized_transformer_name = resolve_text_processor_name(transformer, lang)
-        add_article(localized_transformer_name, processed_str, description, parse_mode,
-                    transformer.snake_case_name, **kwargs)
-
-    exclusive_processors = text_processors.match_exclusive_processors(request.query, lang_code)
+    sampled = metrics.sampled()
+    observer = metrics.observe_can_process if sampled else None
+
+    def get_result(transformer: TextProcessor) -> ProcessResult:
+        start = time.perf_counter()
+        result = transformer.get_result(query, lang_code)
+        if sampled:
+            metrics.observe_process(transformer, time.perf_counter() - start, len(query), len(result.text))
+        return result
+
+    def compute_results(processors: List[TextProcessor]) -> List[Tuple[TextProcessor, ProcessResult]]:
+        # expensive processors are submitted first to work in parallel with the others
+        expensive = [x for x in processors if x.is_expensive] if processor_pool else []
+        pending = [processor_pool.submit(x, query, lang_code) for x in expensive]
+        computed = {x: get_result(x) for x in processors if x not in expensive}
+        if pending:
+            computed.update(zip(expensive, processor_pool.collect(pending)))
+        return [(x, computed[x]) for x in processors if computed[x] is not None]
+
+    def transform_query(processors: List[TextProcessor], **kwargs):
+        for transformer, result in compute_results(processors):
+            localized_transformer_name = resolve_text_processor_name(transformer, lang)
+            add_article(localized_transformer_name, result.text, result.description, result.parse_mode,
+                        transformer.snake_case_name, **kwargs)
+
+    features = extract_features(query)
+    exclusive_processors = text_processors.match_exclusive_processors(query, lang_code, features, observer)
     if exclusive_processors:
-        for processor in exclusive_processors:
-            transform_query(processor)
+        transform_query(exclusive_processors)
     else:
-        processors = text_processors.match_simple_processors(request.query, lang_code)
+        processors = text_processors.match_simple_processors(query, lang_code, features, observer)
         reversible_processors = [x for x in processors if x.is_reversible]
         non_reversible_processors = [x for x in processors if not x.is_reversible]
 
-        for processor in non_reversible_processors:
-            transform_query(processor)
+        transform_query(non_reversible_processors)
 
-        msg_id = msgdb.insert(request.query)
+        msg_id = msgdb.insert(query)
         keyboard = InlineKeyboardBuilder()
         keyboard.add_row().add(lang['decrypt'], callback_data=msg_id)
-        for processor in reversible_processors:
-            transform_query(processor, reply_markup=keyboard.build())
+        # serialized once for all reversible results
+        transform_query(reversible_processors, reply_markup=RawJSON(json_serialize(keyboard.build())))
 
-    request.answer(results.build_list())
+    return results.build_json()
 
 
 @bot.callback
-def decrypt(_, callback_query: CallbackQuery) -> None:
+async def decrypt(_, callback_query: CallbackQuery) -> None:
     not_found_msg = localizations.get_phrase(callback_query.src['from'].get('language_code'), 'missing_original_text')
-    message = msgdb.select(callback_query.data) or not_found_msg
+    message = await msgdb.select_async(callback_query.data) or not_found_msg
     callback_query.answer(text=message, cache_time=DECRYPT_BUTTON_CACHE_TIME)
 
 
 @bot.chosen_inline_result_callback
 def chosen_inline_result_callback(chosen_result: ChosenInlineResult) -> None:
     metrics.inc(chosen_result.result_id)
-
-
-if __name__ == '__main__':
+    proc = text_processors.find(chosen_result.result_id.partition(':')[2])
+    if proc:
+        # the same query the result was built for (see 'inline_request_handler')
+        proc.on_chosen(chosen_result.query.strip(), chosen_result.sender.get('language_code') or "")
+
+
+def shutdown_services() -> None:
+    # the threads building answers may still insert messages, so they're stopped before the writer
+    handler_executor.shutdown()
+    if processor_pool:
+        processor_pool.shutdown()
+    msgdb.shutdown()
+
+
+def main() -> None:
+    global localizations, text_processors, help_catalog, answer_cache, handler_executor, processor_pool
+    startup_profile = StartupProfile(_started_at)
+    startup_profile.mark("imports")
+
+    logging.basicConfig(level=logging.DEBUG if DEBUG else logging.INFO)
+    localizations = LocalizationsContainer.from_file("app/localizations.ini")
+    startup_profile.mark("localizations")
+
+    text_processors = TextProcessorsLoader(strconv)
+    metrics.register(*text_processors.all_processors)
+    metrics.set_sampling_rate(METRICS_SAMPLING_RATE)
+    startup_profile.mark("processors")
+
+    help_catalog = HelpCatalog(text_processors.all_processors)
+    # other languages, if any, are built on the first request
+    help_catalog.warm_up(localizations.get_lang(tag) for tag in HELP_LANGUAGES)
+    startup_profile.mark("help")
+
+    answer_cache = AnswerCache(ANSWER_CACHE_MAX_SIZE, ANSWER_CACHE_TTL, version_func=rates_version, sizeof=len)
+    handler_executor = ThreadPoolExecutor(HANDLER_THREADS, thread_name_prefix="inline-handler")
+    if EXPENSIVE_PROCESSORS_WORKERS:
+        processor_pool = ProcessorPool(EXPENSIVE_PROCESSORS_WORKERS, EXPENSIVE_PROCESSORS_TIMEOUT,
+                                       version_func=rates_version,
+                                       initializer=install_snapshot,
+                                       initargs_func=lambda: (get_snapshot(),),
+                                       preload=['strconv'])
     metrics.serve(METRICS_PORT)
+    msgdb.enable_write_behind()
+    startup_profile.mark("services")
 
     loop = asyncio.new_event_loop()
     asyncio.set_event_loop(loop)
+    async_tasks = [
+        update_rates_async_loop(EXCHANGE_RATE_SOURCES),
+        update_volatile_rates_async_loop(EXCHANGE_RATE_SOURCES, UPDATE_VOLATILE_PERIOD_IN_HOURS),
+        msgdb.prune_async_loop(MESSAGES_TTL_IN_DAYS * 24 * 3600),
+    ]
     tasks = [loop.create_task(t) for t in async_tasks]
-    bot.on_cleanup(lambda: [t.cancel() for t in tasks])
+
+    def cleanup() -> None:
+        for t in tasks:
+            t.cancel()
+        shutdown_services()
 
     if DEBUG:
         loop.run_until_complete(bot.delete_webhook())
+        startup_profile.mark("webhook")
+        startup_profile.log_report()
+        bot.on_cleanup(cleanup)
         bot.run(debug=True)
     else:
         webhook_future = bot.set_webhook(f"https://{HOST}:{SERVER_PORT}/{NAME}/")
         loop.run_until_complete(webhook_future)
         app = bot.create_webhook_app(f"/{NAME}/", loop)
+
+        async def on_app_cleanup(_: web.Application) -> None:
+            cleanup()
+
+        # aiotg runs its own cleanup actions only in 'run' and 'run_webhook'
+        app.on_cleanup.append(on_app_cleanup)
+        startup_profile.mark("webhook")
+        startup_profile.log_report()
         if SOCKET_TYPE == 'TCP':
             web.run_app(app, host=APP_HOST, port=APP_PORT, loop=loop)
         elif SOCKET_TYPE == 'UNIX':
@@ -133,3 +246,7 @@ if __name__ == '__main__':
             web.run_app(app, path=UNIX_SOCKET, loop=loop)
         else:
             raise ValueError("The value of the SOCKET_TYPE environment variable is invalid!")
+
+
+if __name__ == '__main__':
+    main()
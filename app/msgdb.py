@@ -1,30 +1,388 @@
-"""Simple wrapper over an sqlite3 database to store textual messages."""
+"""
+Simple wrapper over an sqlite3 database to store textual messages.
 
+By default, every message is written and committed synchronously. Call
+'enable_write_behind()' to switch the module into the write-behind mode: ids
+are returned right away and a dedicated writer thread commits the messages
+in batches, one transaction per a few milliseconds. Batches that fail to be
+committed are kept and retried. Call 'shutdown()' to flush the queue before
+exit; it's also called at exit of the interpreter as the last resort.
+
+Since the ids are handed out before they are committed, the process in the
+write-behind mode must be the only one inserting messages. It holds an
+exclusive lock on the '<database>.lock' file; other processes fail to enable
+the mode or to insert messages synchronously with 'DatabaseLockedError'.
+
+Messages are content-addressed: inserting a text that is already stored
+returns the id of the existing row. Rows older than some TTL are deleted by
+'prune()' in small batches (see 'prune_async_loop()').
+"""
+
+import atexit
+import contextlib
+import queue
+import asyncio
+import hashlib
 import sqlite3
 import logging
+import threading
+import time
 from typing import *
 
-__db = sqlite3.connect('app/data/messages.db')
-__db.execute("CREATE TABLE IF NOT EXISTS Messages(message TEXT NOT NULL)")
+from prometheus_client import Gauge, Histogram
+
+try:
+    import fcntl
+except ModuleNotFoundError:
+    # Windows is used for development only, so the database isn't protected from other processes there
+    fcntl = None
+
+_DB_PATH = 'app/data/messages.db'
+_DEFAULT_COMMIT_INTERVAL = 0.005    # in seconds
+_RETRY_INTERVAL = 1.0               # delay before another attempt to commit a failed batch, in seconds
+# the timestamp of a reused row is refreshed not more often than this
+_TOUCH_INTERVAL = 3600              # in seconds
+_PRUNE_BATCH_SIZE = 500
+_AUTO_VACUUM_INCREMENTAL = 2        # the value of 'PRAGMA auto_vacuum'
+
+_queue_depth = Gauge("msgdb_write_queue_depth", "Messages waiting to be committed")
+_commit_latency = Histogram("msgdb_commit_seconds", "Duration of group commits of messages",
+                            buckets=(.001, .0025, .005, .01, .025, .05, .1, .25, .5, 1))
+
+
+class DatabaseLockedError(RuntimeError):
+    """The database is written by another process in the write-behind mode."""
+
+
+def _lock(path: str, exclusive: bool) -> Optional[IO]:
+    """
+    Lock the database against the processes in the write-behind mode. Close the returned file to release the lock.
+
+    :param exclusive: whether the caller is going to hand out ids before they are committed
+    :raise DatabaseLockedError: if another process has taken the exclusive lock (or any lock, if `exclusive` is True)
+    """
+    if fcntl is None:
+        return None
+    lock_file = open(path + '.lock', 'a')
+    try:
+        fcntl.flock(lock_file, (fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH) | fcntl.LOCK_NB)
+    except BlockingIOError:
+        lock_file.close()
+        raise DatabaseLockedError(f"The database '{path}' is written by another process in the write-behind mode")
+    return lock_file
+
+
+def _connect(path: str) -> sqlite3.Connection:
+    db = sqlite3.connect(path, check_same_thread=False)
+    # makes the file shrink after pruning
+    if db.execute("PRAGMA auto_vacuum").fetchone()[0] != _AUTO_VACUUM_INCREMENTAL:
+        db.execute("PRAGMA auto_vacuum=INCREMENTAL")
+        # the mode of an existing database is changed only by rebuilding it, which happens once
+        if db.execute("SELECT count(*) FROM sqlite_master").fetchone()[0]:
+            logging.getLogger(__name__).info(f"Rebuilding '{path}' to enable incremental vacuum...")
+            db.execute("VACUUM")
+    db.execute("CREATE TABLE IF NOT EXISTS Messages(message TEXT NOT NULL, digest BLOB, created_at INTEGER)")
+    columns = {row[1] for row in db.execute("PRAGMA table_info(Messages)")}
+    for column, column_type in (('digest', 'BLOB'), ('created_at', 'INTEGER')):
+        if column not in columns:
+            db.execute(f"ALTER TABLE Messages ADD COLUMN {column} {column_type}")
+    db.execute("CREATE UNIQUE INDEX IF NOT EXISTS Messages_digest ON Messages(digest)")
+    db.execute("CREATE INDEX IF NOT EXISTS Messages_created_at ON Messages(created_at)")
+    # messages saved before the migration live for the whole TTL since it
+    db.execute("UPDATE Messages SET created_at=? WHERE created_at IS NULL", [int(time.time())])
+    db.commit()
+    return db
+
+
+def _digest(message: str) -> bytes:
+    return hashlib.blake2b(message.encode(), digest_size=16).digest()
+
+
+class _WriteBehindWriter(threading.Thread):
+    """A thread that takes messages from the queue and commits them in batches."""
+
+    _logger = logging.getLogger(__name__)
+    _STOP = object()
+
+    def __init__(self, path: str, last_rowid: int, commit_interval: float, lock_file: Optional[IO] = None) -> None:
+        """
+        :param last_rowid: the maximum id in the database, taken after the exclusive lock
+        :param lock_file: the file holding the exclusive lock, it's closed when the thread stops
+        """
+        super().__init__(name="msgdb-writer", daemon=True)
+        self._path = path
+        self._lock_file = lock_file
+        self._commit_interval = commit_interval
+        self._queue = queue.SimpleQueue()
+        # messages that were accepted but not committed yet
+        self._pending: Dict[int, str] = {}
+        self._pending_digests: Dict[bytes, int] = {}
+        self._last_rowid = last_rowid
+        # Committed messages are removed from the pending ones under this lock. Hold it to look for a message among
+        # both the pending and the committed ones, so it cannot slip between them unnoticed.
+        self.lock = threading.RLock()
+
+    def insert(self, message: str, digest: bytes, timestamp: int) -> int:
+        with self.lock:
+            rowid = self._pending_digests.get(digest)
+            if rowid is not None:
+                return rowid
+            self._last_rowid += 1
+            rowid = self._last_rowid
+            self._pending[rowid] = message
+            self._pending_digests[digest] = rowid
+        self._queue.put(('insert', (rowid, message, digest, timestamp)))
+        _queue_depth.inc()
+        return rowid
+
+    def touch(self, rowid: int, timestamp: int) -> None:
+        self._queue.put(('touch', (timestamp, rowid)))
+        _queue_depth.inc()
+
+    def get_pending(self, rowid: int) -> Optional[str]:
+        return self._pending.get(rowid)
+
+    def get_pending_rowid(self, digest: bytes) -> Optional[int]:
+        return self._pending_digests.get(digest)
+
+    def stop(self) -> None:
+        """Commit all accepted messages and stop the thread."""
+        self._queue.put(self._STOP)
+        self.join()
+
+    def run(self) -> None:
+        db = sqlite3.connect(self._path)
+        db.execute("PRAGMA journal_mode=WAL")
+        db.execute("PRAGMA synchronous=NORMAL")
+        # the ids of failed messages were handed out already, so they're kept pending until they're committed
+        failed = []
+        try:
+            stopped = False
+            while not stopped:
+                try:
+                    batch = [self._queue.get(timeout=_RETRY_INTERVAL if failed else None)]
+                    time.sleep(self._commit_interval)
+                except queue.Empty:
+                    batch = []
+                while not self._queue.empty():
+                    batch.append(self._queue.get())
+                if any(x is self._STOP for x in batch):
+                    stopped = True
+                    batch = [x for x in batch if x is not self._STOP]
+                batch = failed + batch
+                if batch:
+                    failed = [] if self._commit(db, batch) else batch
+            if failed:
+                self._logger.error(f"{len(failed)} operations were lost on shutdown")
+        finally:
+            db.close()
+            if self._lock_file:
+                self._lock_file.close()
+
+    def _commit(self, db: sqlite3.Connection, batch: List[Tuple[str, tuple]]) -> bool:
+        """:return: True if the batch was committed; otherwise, it must be retried later"""
+        inserts = [params for op, params in batch if op == 'insert']
+        touches = [params for op, params in batch if op == 'touch']
+        start = time.perf_counter()
+        try:
+            with db:
+                changes = db.total_changes
+                db.executemany("INSERT OR IGNORE INTO Messages(rowid, message, digest, created_at) VALUES (?, ?, ?, ?)",
+                               inserts)
+                if db.total_changes - changes < len(inserts):
+                    self._insert_conflicting(db, inserts)
+                db.executemany("UPDATE Messages SET created_at=? WHERE rowid=?", touches)
+        except sqlite3.Error as err:
+            self._logger.error(f"Failed to commit {len(batch)} operations, they will be retried: {err}")
+            return False
+        _commit_latency.observe(time.perf_counter() - start)
+        _queue_depth.dec(len(batch))
+        with self.lock:
+            for rowid, _, digest, _ in inserts:
+                del self._pending[rowid]
+                del self._pending_digests[digest]
+        self._logger.debug(f"{len(inserts)} messages were committed, {len(touches)} were touched")
+        return True
+
+    def _insert_conflicting(self, db: sqlite3.Connection, inserts: List[tuple]) -> None:
+        """Save the messages that were ignored because their ids or digests had been taken by another connection."""
+        for rowid, message, _, timestamp in inserts:
+            row = db.execute("SELECT message FROM Messages WHERE rowid=?", [rowid]).fetchone()
+            if row is None:
+                # The same message was saved by another connection. The id was handed out already, so the row is
+                # saved without the digest.
+                db.execute("INSERT INTO Messages(rowid, message, created_at) VALUES (?, ?, ?)",
+                           [rowid, message, timestamp])
+            elif row[0] != message:
+                # can happen only if another process ignores the lock; the id points to a foreign message now
+                self._logger.error(f"The id {rowid} was taken by another connection, the message is lost")
+
+
+__db = _connect(_DB_PATH)
+__db_path = _DB_PATH
+# the connection is shared by the threads handling queries
+__db_lock = threading.RLock()
+__writer: Optional[_WriteBehindWriter] = None
 _logger = logging.getLogger(__name__)
 
 
 def insert(message: str) -> int:
-    cur = __db.execute("INSERT INTO Messages(message) VALUES (?)", [message])
-    __db.commit()
+    """Save the message or find the same one saved earlier. :return: the id of the row"""
+    digest = _digest(message)
+    now = int(time.time())
+    writer = __writer
+    if writer:
+        rowid = writer.get_pending_rowid(digest)
+        if rowid is not None:
+            return rowid
+
+    # The lock is held until the row is inserted, so concurrent inserts of the same message don't clash.
+    # The writer cannot commit the message and forget it between the checks below as well.
+    with __db_lock, writer.lock if writer else contextlib.nullcontext():
+        rowid = writer.get_pending_rowid(digest) if writer else None
+        if rowid is not None:
+            return rowid
+        row = __db.execute("SELECT rowid, created_at FROM Messages WHERE digest=?", [digest]).fetchone()
+        if row:
+            rowid, created_at = row
+            if now - created_at >= _TOUCH_INTERVAL:
+                _touch(rowid, now)
+            _logger.debug("Message '{}' was found with id {:d}".format(message, rowid))
+            return rowid
+
+        if writer:
+            rowid = writer.insert(message, digest, now)
+            _logger.debug("Message '{}' was queued with id {:d}".format(message, rowid))
+            return rowid
+
+        lock_file = _lock(__db_path, exclusive=False)
+        try:
+            cur = __db.execute("INSERT OR IGNORE INTO Messages(message, digest, created_at) VALUES (?, ?, ?)",
+                               [message, digest, now])
+            __db.commit()
+        finally:
+            if lock_file:
+                lock_file.close()
+        if cur.rowcount == 0:
+            # saved by another process in the meantime
+            rowid = __db.execute("SELECT rowid FROM Messages WHERE digest=?", [digest]).fetchone()[0]
+            _logger.debug("Message '{}' was found with id {:d}".format(message, rowid))
+            return rowid
     _logger.debug("Message '{}' was saved with id {:d}".format(message, cur.lastrowid))
     return cur.lastrowid
 
 
 def select(rowid: int) -> Optional[str]:
-    cur = __db.execute("SELECT message FROM Messages WHERE rowid=?", [rowid])
-    row = cur.fetchone()
+    if __writer:
+        try:
+            pending_message = __writer.get_pending(int(rowid))
+        except ValueError:
+            return None
+        if pending_message is not None:
+            return pending_message
+
+    with __db_lock:
+        row = __db.execute("SELECT message FROM Messages WHERE rowid=?", [rowid]).fetchone()
     return row[0] if row else None
 
 
+async def select_async(rowid: int) -> Optional[str]:
+    """The same as `select` but doesn't block the event loop."""
+    return await asyncio.to_thread(select, rowid)
+
+
+def prune(ttl: int, now: Optional[int] = None, batch_size: int = _PRUNE_BATCH_SIZE) -> int:
+    """
+    Delete one batch of messages older than `ttl` seconds and return the freed pages to the file system.
+
+    It uses its own connection, so it's safe to call this function from another thread.
+
+    :return: the number of deleted messages
+    """
+    cutoff = (now or int(time.time())) - ttl
+    db = sqlite3.connect(__db_path)
+    try:
+        with db:
+            # The last row is never deleted since SQLite would reuse its id otherwise,
+            # and old buttons would reveal new messages.
+            cur = db.execute("DELETE FROM Messages WHERE rowid IN "
+                             "(SELECT rowid FROM Messages WHERE created_at < ? "
+                             "AND rowid < (SELECT max(rowid) FROM Messages) LIMIT ?)",
+                             [cutoff, batch_size])
+        db.execute("PRAGMA incremental_vacuum")
+    finally:
+        db.close()
+    return cur.rowcount
+
+
+async def prune_async_loop(ttl: int, period: int = 3600) -> None:
+    """
+    Scheduler function for the asyncio loop to delete outdated messages
+
+    Messages are deleted in small batches on a separate thread, so neither the event loop nor the writers are blocked
+    for long.
+
+    :param ttl: time to live of messages, in seconds
+    :param period: delay between iterations, in seconds
+    """
+    while True:
+        deleted = 0
+        while True:
+            count = await asyncio.to_thread(prune, ttl)
+            deleted += count
+            if count < _PRUNE_BATCH_SIZE:
+                break
+        _logger.info(f"{deleted} outdated messages were deleted")
+        await asyncio.sleep(period)
+
+
+def enable_write_behind(commit_interval: float = _DEFAULT_COMMIT_INTERVAL) -> None:
+    """
+    Switch to the write-behind mode, in which messages are committed in batches by a dedicated thread.
+
+    :param commit_interval: how long the writer waits for more messages before committing a batch, in seconds
+    :raise DatabaseLockedError: if another process is inserting messages into the database
+    """
+    global __writer
+    if __writer:
+        return
+    lock_file = _lock(__db_path, exclusive=True)
+    try:
+        __db.execute("PRAGMA journal_mode=WAL")
+        last_rowid = __db.execute("SELECT max(rowid) FROM Messages").fetchone()[0] or 0
+    except BaseException:
+        if lock_file:
+            lock_file.close()
+        raise
+    __writer = _WriteBehindWriter(__db_path, last_rowid, commit_interval, lock_file)
+    __writer.start()
+    # the writer is a daemon thread, so it would be killed at exit with all queued messages
+    atexit.register(shutdown)
+
+
+def shutdown() -> None:
+    """Flush all queued messages to the database and switch back to the synchronous mode."""
+    global __writer
+    if __writer:
+        atexit.unregister(shutdown)
+        __writer.stop()
+        __writer = None
+
+
+def _touch(rowid: int, timestamp: int) -> None:
+    """Prolong the life of a reused message."""
+    if __writer:
+        __writer.touch(rowid, timestamp)
+    else:
+        with __db_lock:
+            __db.execute("UPDATE Messages SET created_at=? WHERE rowid=?", [timestamp, rowid])
+            __db.commit()
+
+
 def _mock_database(tempfile):
     """Open another file as the database. Used internally for testing purposes."""
-    global __db
+    global __db, __db_path
+    shutdown()
     __db.close()
-    __db = sqlite3.connect(tempfile)
-    __db.execute("CREATE TABLE Messages(message TEXT NOT NULL)")
+    __db = _connect(tempfile)
+    __db_path = tempfile
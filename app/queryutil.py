@@ -1,11 +1,72 @@
 """Utilities to make composing of inline query results easier."""
 
+import json
 import logging
+from json.encoder import encode_basestring
+from typing import Optional, Union
+
+
+class RawJSON(str):
+    """A string that is already serialized as JSON and must be sent as is."""
+    __slots__ = ()
+
+
+def json_serialize(obj) -> str:
+    """A replacement for `json.dumps` that passes pre-serialized `RawJSON` strings through."""
+    if isinstance(obj, RawJSON):
+        return obj
+    return json.dumps(obj, ensure_ascii=False)
+
+
+class InlineQueryResultArticle:
+    """A compact representation of https://core.telegram.org/bots/api#inlinequeryresultarticle
+    with an input message content of the text type.
+    """
+    __slots__ = ('id', 'title', 'description', 'text', 'parse_mode', 'reply_markup')
+
+    def __init__(self, id: str, title: str, text: str, description: str, parse_mode: str = "",
+                 reply_markup: Optional[RawJSON] = None) -> None:
+        if not text:
+            raise ValueError("The text of an article must not be empty")
+        self.id = id
+        self.title = title
+        self.text = text
+        self.description = description
+        self.parse_mode = parse_mode
+        self.reply_markup = reply_markup
+
+    def to_json(self) -> str:
+        parts = ['{"type":"article","id":', encode_basestring(self.id),
+                 ',"title":', encode_basestring(self.title),
+                 ',"description":', encode_basestring(self.description),
+                 ',"input_message_content":{"message_text":', encode_basestring(self.text),
+                 ',"parse_mode":', encode_basestring(self.parse_mode), '}']
+        if self.reply_markup is not None:
+            parts += [',"reply_markup":', self.reply_markup]
+        parts.append('}')
+        return "".join(parts)
+
+    def to_dict(self) -> dict:
+        obj = {
+            'type': 'article',
+            'id': self.id,
+            'title': self.title,
+            'description': self.description,
+            'input_message_content': {
+                'message_text': self.text,
+                'parse_mode': self.parse_mode
+            }
+        }
+        if self.reply_markup is not None:
+            obj['reply_markup'] = json.loads(self.reply_markup)
+        return obj
 
 
 class InlineQueryResultsBuilder:
     """A helper class to make the creation of a result to an inline query a bit easier.
     It takes responsibility for setting proper `id`s to your `InlineQueryResult`s
+
+    Results with empty texts are rejected when they are added.
     """
 
     _logger = logging.getLogger(__name__)
@@ -21,21 +82,37 @@ class InlineQueryResultsBuilder:
         :param result_id: ``id`` of the result will be either an index number or a f"{index_number}:{id}" string
         """
         obj = kwargs
+        if 'input_message_content' in obj and not obj['input_message_content'].get('message_text'):
+            self._logger.warning(f"An empty inline result was filtered out: {obj}")
+            return self
         obj['type'] = type
-        obj['id'] = f"{self._id}:{result_id}" if result_id else str(self._id)
-        self._id += 1
+        obj['id'] = self._next_id(result_id)
         self._list.append(obj)
         return self
 
+    def add_article(self, title: str, text: str, description: str, parse_mode: str = "", result_id: str = "",
+                    reply_markup: Optional[RawJSON] = None) -> "InlineQueryResultsBuilder":
+        """Append a new article with a text message. Can be used in chains of methods."""
+        if not text:
+            self._logger.warning(f"An empty article was filtered out: {title}")
+            return self
+        self._list.append(InlineQueryResultArticle(self._next_id(result_id), title, text, description, parse_mode,
+                                                   reply_markup))
+        return self
+
     def build_list(self) -> list:
-        """:return: a copy of the internal list with non-empty results"""
-        def non_empty_message(x) -> bool:
-            return 'input_message_content' not in x or len(x['input_message_content']['message_text']) > 0
-        valid_msgs = [x for x in self._list if non_empty_message(x)]
-        if len(valid_msgs) != len(self._list):
-            invalid_msgs = [x for x in self._list if not non_empty_message(x)]
-            self._logger.warning(f"Some empty inline results were filtered out: {invalid_msgs}")
-        return valid_msgs
+        """:return: a list of results as dicts"""
+        return [x.to_dict() if isinstance(x, InlineQueryResultArticle) else x.copy() for x in self._list]
+
+    def build_json(self) -> RawJSON:
+        """:return: the list of results serialized for the Bot API"""
+        items = (x.to_json() if isinstance(x, InlineQueryResultArticle) else json_serialize(x) for x in self._list)
+        return RawJSON("[" + ",".join(items) + "]")
+
+    def _next_id(self, result_id: str) -> str:
+        next_id = f"{self._id}:{result_id}" if result_id else str(self._id)
+        self._id += 1
+        return next_id
 
 
 def get_articles_generator_for(storage: InlineQueryResultsBuilder, max_description: int = 120) -> callable:
@@ -46,23 +123,15 @@ def get_articles_generator_for(storage: InlineQueryResultsBuilder, max_descripti
         storage
     """
     def add_article(title: str, text: str, description: str = None, parse_mode: str = "",
-                    article_id: str = "", **kwargs) -> None:
+                    article_id: str = "", reply_markup: Union[RawJSON, dict, None] = None) -> None:
         if not description:
             if len(text) > max_description:
                 description = text[:max_description-1].rstrip() + '…'
             else:
                 description = text
-        storage.add(
-            type='article',
-            result_id=article_id,
-            title=title,
-            description=description,
-            input_message_content={
-                'message_text': text,
-                'parse_mode': parse_mode
-            },
-            **kwargs
-        )
+        if reply_markup is not None and not isinstance(reply_markup, RawJSON):
+            reply_markup = RawJSON(json_serialize(reply_markup))
+        storage.add_article(title, text, description, parse_mode, article_id, reply_markup)
     return add_article
 
 
@@ -0,0 +1,63 @@
+"""
+Timing of the startup phases of the bot.
+
+Usage:
+>>> profile = StartupProfile()
+>>> import heavy_module
+>>> profile.mark("imports")
+>>> load_something()
+>>> profile.mark("loading")
+>>> profile.log_report()
+
+Each phase lasts from the previous mark (or the creation of the profile) to
+its own mark. The durations are also exported as Prometheus gauges, so the
+time of restarts can be watched over releases.
+"""
+
+import time
+import logging
+from typing import Callable, List, Optional, Tuple
+
+from prometheus_client import Gauge
+
+_phase_duration = Gauge("startup_phase_seconds", "Duration of the startup phases of the bot", ['phase'])
+
+
+class StartupProfile:
+    _logger = logging.getLogger(__name__)
+
+    def __init__(self, started_at: Optional[float] = None, clock: Callable[[], float] = time.perf_counter) -> None:
+        """
+        :param started_at: a reading of the clock taken earlier, if the profile cannot be created at the very beginning
+        :param clock: a monotonic clock in seconds
+        """
+        self._clock = clock
+        self._started_at = self._last_mark = clock() if started_at is None else started_at
+        self._phases: List[Tuple[str, float]] = []
+
+    def mark(self, phase: str) -> float:
+        """Finish the phase. :return: its duration in seconds"""
+        now = self._clock()
+        duration = now - self._last_mark
+        self._last_mark = now
+        self._phases.append((phase, duration))
+        _phase_duration.labels(phase).set(duration)
+        return duration
+
+    @property
+    def phases(self) -> List[Tuple[str, float]]:
+        return self._phases.copy()
+
+    @property
+    def total(self) -> float:
+        return self._last_mark - self._started_at
+
+    def report(self) -> str:
+        total = self.total
+        lines = [f"{phase:<20} {duration * 1000:9.1f} ms {duration / total if total else 0:6.1%}"
+                 for phase, duration in self._phases]
+        lines.append(f"{'total':<20} {total * 1000:9.1f} ms")
+        return "\n".join(lines)
+
+    def log_report(self) -> None:
+        self._logger.info("Startup profile:\n" + self.report())
@@ -5,11 +5,18 @@ Mostly this module is just a wrapper over functions form the
 'strconv.util.binhex64' module. Such approach simplifies the testing and
 allows us to use actual functions returning 'Optional' results for both
 checking of ability to handle the query and actual processing.
+
+Since the decoders validate the query by decoding it, the decoded payload is
+carried over from 'match' to 'process', so each query is decoded only once.
 """
 
 import string
+from abc import ABC, abstractmethod
+from functools import lru_cache
+from typing import Optional
 
 from txtproc.abc import Universal, Encoder, Decoder
+from txtproc.features import Feature
 from .util.binhex64 import *
 
 
@@ -18,13 +25,42 @@ class BinaryEncoder(Universal, Encoder):
         return str_to_bin(query)
 
 
-class BinaryDecoder(Decoder):
+class PayloadDecoder(Decoder, ABC):
+    """Base class for decoders which carry the payload decoded while matching over to processing."""
+
+    def __init__(self, query: Optional[str] = None, payload: Optional[str] = None) -> None:
+        self._query = query
+        self._payload = payload
+
+    @classmethod
+    @abstractmethod
+    def decode(cls, query: str) -> Optional[str]:
+        """:return: the decoded query or None if the query cannot be decoded"""
+        pass
+
     @classmethod
     def can_process(cls, query: str, lang_code: str = "") -> bool:
-        return all(char in ('0', '1', ' ') for char in query) and bin_to_str(query)
+        return bool(cls.decode(query))
+
+    @classmethod
+    def match(cls, query: str, lang_code: str = "") -> Optional['PayloadDecoder']:
+        payload = cls.decode(query)
+        return cls(query, payload) if payload else None
 
     def process(self, query: str, lang_code: str = "") -> str:
-        return bin_to_str(query)
+        if self._query == query:
+            return self._payload
+        return self.decode(query)
+
+
+class BinaryDecoder(PayloadDecoder):
+    required_features = Feature.BINARY_ALPHABET
+
+    @classmethod
+    def decode(cls, query: str) -> Optional[str]:
+        if not all(char in ('0', '1', ' ') for char in query):
+            return None
+        return _cached_bin_to_str(query)
 
 
 class HexadecimalEncoder(Universal, Encoder):
@@ -32,16 +68,18 @@ class HexadecimalEncoder(Universal, Encoder):
         return str_to_hex(query)
 
 
-class HexadecimalDecoder(Decoder):
+class HexadecimalDecoder(PayloadDecoder):
+    required_features = Feature.HEX_ALPHABET
+
     @classmethod
-    def can_process(cls, query: str, lang_code: str = "") -> bool:
+    def decode(cls, query: str) -> Optional[str]:
         # Since this processor is able to handle the same queries the BinaryDecoder can, we need to ensure that
-        # we won't swallow binary strings here.
-        if BinaryDecoder.can_process(query, lang_code):
-            return False
-        return all(char in string.hexdigits + ' ' for char in query) and hex_to_str(query)
-
-    def process(self, query: str, lang_code: str = "") -> str:
+        # we won't swallow binary strings here. The result of the binary decoder is cached, so the query won't be
+        # decoded twice.
+        if BinaryDecoder.decode(query):
+            return None
+        if not all(char in string.hexdigits + ' ' for char in query):
+            return None
         return hex_to_str(query)
 
 
@@ -50,10 +88,15 @@ class Base64Encoder(Universal, Encoder):
         return str_to_base64(query)
 
 
-class Base64Decoder(Decoder):
-    @classmethod
-    def can_process(cls, query: str, lang_code: str = "") -> bool:
-        return all(char in string.ascii_letters + string.digits + '+/=' for char in query) and base64_to_str(query)
+class Base64Decoder(PayloadDecoder):
+    required_features = Feature.BASE64_ALPHABET
 
-    def process(self, query: str, lang_code: str = "") -> str:
+    @classmethod
+    def decode(cls, query: str) -> Optional[str]:
+        if not all(char in string.ascii_letters + string.digits + '+/=' for char in query):
+            return None
         return base64_to_str(query)
+
+
+# The binary decoder is called by both binary and hexadecimal decoders for the same query.
+_cached_bin_to_str = lru_cache(maxsize=16)(bin_to_str)
@@ -1,41 +1,157 @@
 """Embedded calculator and currency exchanger for the bot."""
 
-import re
+import datetime
 import logging
-from io import StringIO
+from typing import Iterator, NamedTuple, Optional, Tuple
+
 from txtproc.abc import TextProcessor
+from txtproc.features import Feature
 from . import currates
+from .util import arith
+
+_MAX_SUBSTITUTIONS = 100
+
+_EXPR_CHARS = frozenset("0123456789+-*/%^., ()")
+_CURR_WORD_CHARS = frozenset("ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyzабвгдежзийклмнопрстуфхцчшщъыьэюя.")
+_CURR_SIGNS = frozenset("$€₽£¥")
+_CURR_SEPARATORS = ("to", ">", "в")
+_MIN_CURR_WORD_LENGTH = 3
+
+
+class Expression(NamedTuple):
+    expr: str                   # an arithmetic expression, "1" if omitted
+    from_curr: Optional[str]
+    to_curr: Optional[str]
+    on_date: Optional[datetime.date] = None     # convert at the rates of this day
+
+
+class Substitution(NamedTuple):
+    start: int
+    end: int
+    expression: Expression
+
+
+def parse_expression(text: str) -> Optional[Expression]:
+    """
+    Parse the '{expr} [{from_curr} [to|>|в] [{to_curr}] [@{YYYY-MM-DD}]]' grammar in one pass.
+
+    '2+2*2 EUR to USD' => Expression('2+2*2', 'EUR', 'USD')
+    '100 usd to rub @2025-01-01' => Expression('100', 'usd', 'rub', datetime.date(2025, 1, 1))
+    'foo' => None
+
+    :return: the parsed expression or None if the text doesn't match the grammar
+    """
+    text, at, date = text.rpartition('@')
+    if not at:
+        text, on_date = date, None
+    else:
+        on_date = _parse_date(date.strip())
+        if on_date is None:
+            return None
+
+    n = len(text)
+    i = 0
+    while i < n and text[i] in _EXPR_CHARS:
+        i += 1
+    expr = text[:i].strip()
+    if i == n:
+        # the date makes sense for currencies only
+        return Expression(expr, None, None) if expr and not on_date else None
+
+    from_curr, i = _read_currency(text, i)
+    if from_curr is None:
+        return None
+    i = _skip_spaces(text, i)
+    for sep in _CURR_SEPARATORS:
+        if text.startswith(sep, i):
+            to_curr, matched = _read_last_currency(text, _skip_spaces(text, i + len(sep)))
+            if matched:
+                return Expression(expr or "1", from_curr, to_curr, on_date)
+    to_curr, matched = _read_last_currency(text, i)
+    return Expression(expr or "1", from_curr, to_curr, on_date) if matched else None
+
 
-_subst_re = re.compile(r"\{\{(?P<expr>[0-9+\-*/%^., ()]+?)? *?"
-                       r"((?P<from_curr>[A-Za-zа-я.]{3,}|[$€₽£¥]) *?"
-                       r"(to|>|в)? *?"
-                       r"(?P<to_curr>[A-Za-zа-я.]{3,}|[$€₽£¥])?)?? *?}}")
-_logger = logging.getLogger(__file__)
-_MAX_RECURSION = 100
+def find_substitutions(query: str) -> Iterator[Substitution]:
+    """
+    Find all '{{...}}' substitutions in the query in linear time.
 
-try:
-    # noinspection PyPackageRequirements
-    import numexpr
+    Since the grammar doesn't allow braces inside a substitution, the only
+    candidate for every closing '}}' is the '{{' right after the last '{'
+    before it. Each character of the query is looked at a constant number
+    of times.
+    """
+    n = len(query)
+    pos = 0
+    while True:
+        closing = query.find('}', pos)
+        if closing == -1:
+            return
+        if closing + 1 < n and query[closing + 1] == '}':
+            opening = query.rfind('{', pos, closing) - 1
+            if opening >= pos and query[opening] == '{':
+                expression = parse_expression(query[opening + 2:closing])
+                if expression:
+                    yield Substitution(opening, closing + 2, expression)
+                    pos = closing + 2
+                    continue
+        pos = closing + 1
 
-    def numexpr_eval(s):
-        return numexpr.evaluate(s).take(0)
-    _eval_func = numexpr_eval
-    _logger.info("numexpr eval is used")
-except ModuleNotFoundError:
-    _eval_func = eval
-    _logger.info("unsafe eval is used")
+
+def _parse_date(text: str) -> Optional[datetime.date]:
+    # only the strict 'YYYY-MM-DD' format; 'fromisoformat' accepts other ones since Python 3.11
+    if len(text) != 10 or text[4] != '-' or text[7] != '-':
+        return None
+    try:
+        return datetime.date.fromisoformat(text)
+    except ValueError:
+        return None
+
+
+def _skip_spaces(text: str, i: int) -> int:
+    while i < len(text) and text[i] == ' ':
+        i += 1
+    return i
+
+
+def _read_currency(text: str, i: int) -> Tuple[Optional[str], int]:
+    if i < len(text) and text[i] in _CURR_SIGNS:
+        return text[i], i + 1
+    j = i
+    while j < len(text) and text[j] in _CURR_WORD_CHARS:
+        j += 1
+    if j - i < _MIN_CURR_WORD_LENGTH:
+        return None, i
+    return text[i:j], j
+
+
+def _read_last_currency(text: str, i: int) -> Tuple[Optional[str], bool]:
+    """:return: an optional currency and whether the rest of the text is matched"""
+    if i == len(text):
+        return None, True
+    curr, j = _read_currency(text, i)
+    return curr, curr is not None and _skip_spaces(text, j) == len(text)
 
 
 class Calculator(TextProcessor):
+    required_features = Feature.SUBSTITUTION
+    is_expensive = True
+
     _logger = logging.getLogger(__name__)
 
     @classmethod
     def can_process(cls, query: str, lang_code: str = "") -> bool:
-        return bool(_subst_re.search(query))
+        return next(find_substitutions(query), None) is not None
 
     def process(self, query: str, lang_code: str = "") -> str:
+        return self._safely(self._substitute_all, query, lang_code)
+
+    def process_expression(self, expression: Expression, lang_code: str = "") -> str:
+        """Evaluate one expression without the substitution syntax around it."""
+        return self._safely(self._evaluate, expression, lang_code)
+
+    def _safely(self, func, *args) -> str:
         try:
-            return self.next_expr(query, lang_code, StringIO())
+            return func(*args)
         except currates.ExternalServiceError as err:
             self._logger.error(err)
             return ""   # the bot will ignore this result
@@ -45,36 +161,36 @@ class Calculator(TextProcessor):
         except currates.UnknownLanguageCode as err:
             self._logger.warning(f"The following language code was received but is not present in our data: {err}")
             return ""  # the bot will ignore this result
+        except currates.NoHistoricalRates as err:
+            self._logger.info(f"The rates for the following date were requested but are not present: {err}")
+            return ""  # the bot will ignore this result
+        except arith.EvaluationError as err:
+            self._logger.info(f"The expression cannot be evaluated: {err}")
+            return ""  # the bot will ignore this result
+
+    def _substitute_all(self, query: str, lang_code: str) -> str:
+        parts = []
+        pos = 0
+        for count, subst in enumerate(find_substitutions(query)):
+            if count >= _MAX_SUBSTITUTIONS:
+                self._logger.warning("Maximum number of substitutions was reached while evaluating: " + query)
+                break
+            parts.append(query[pos:subst.start])
+            parts.append(self._evaluate(subst.expression, lang_code))
+            pos = subst.end
+        parts.append(query[pos:])
+        return "".join(parts)
 
-    def next_expr(self, query: str, lang_code: str, sb: StringIO, pos: int = 0, guard: int = 0) -> str:
-        match = _subst_re.search(query, pos=pos)
-        if not match or self._check_guard(guard, query):
-            sb.write(query[pos:])
-            return sb.getvalue()
-        sb.write(query[pos:match.start()])
-        expr = match.group("expr")
-        if not expr:
-            expr = "1"
-        expr = expr.strip().replace(",", ".")
-        val = _eval_func(expr)
-        from_curr = match.group("from_curr")
-        to_curr = match.group("to_curr")
-        if from_curr:
-            val, to_curr = currates.convert(from_curr, to_curr, val, lang_code)
-            val = self._format_number(val)
-            if len(to_curr) == 1:
-                sb.write(f"{to_curr}{val}")
-            else:
-                sb.write(f"{val} {to_curr}")
+    def _evaluate(self, expression: Expression, lang_code: str) -> str:
+        val = arith.evaluate(expression.expr.replace(",", "."))
+        if not expression.from_curr:
+            return self._format_number(val)
+        val, to_curr = currates.convert(expression.from_curr, expression.to_curr, val, lang_code, expression.on_date)
+        val = self._format_number(val)
+        if len(to_curr) == 1:
+            return f"{to_curr}{val}"
         else:
-            sb.write(self._format_number(val))
-        return self.next_expr(query, lang_code, sb, match.end(), guard+1)
-
-    def _check_guard(self, guard: int, query: str) -> bool:
-        if guard >= _MAX_RECURSION:
-            self._logger.warning("Maximum level of recursions was reached while evaluating: " + query)
-            return True
-        return False
+            return f"{val} {to_curr}"
 
     @staticmethod
     def _format_number(val: float) -> str:
@@ -3,19 +3,27 @@ Service for retrieval and storage of currency exchange rates
 
 Fetches the rates for USD pairs from several sources once per day and save them into a file.
 It has a function to calculate the coefficient for any pair and convert a value from one currency into another.
+
+The rates are read from an immutable snapshot, which is replaced atomically on every update. Snapshots are binary
+files mapped into memory (see the ``snapshots`` module), one per day, so the snapshots of previous days are used
+to convert values at the rates of some date in the past without any network access.
+
+The HTTP clients (the ``fetch`` module) and the table of local currencies are imported on first use, so the worker
+processes, which never update the rates, don't import the HTTP clients at all.
 """
 
 import dbm
 import datetime
 import logging
-import requests
 import random
 import asyncio
+import threading
 from functools import reduce
-from typing import List, Iterable, Optional
+from types import MappingProxyType
+from typing import List, Iterable, Optional, Mapping
 
-from .localcurr import LOCALE_TO_CURRENCY
-from .currdsl import Currency
+from .currdsl import CurrencyIndex, CurrencyMatch
+from .snapshots import SnapshotStore
 from .types import *
 from .exceptions import *
 
@@ -25,12 +33,19 @@ except ModuleNotFoundError:
     # for tests
     from examples.currates_conf import CURRENCIES_MAPPING
 
-__all__ = ['update_rates', 'update_rates_async_loop', 'update_volatile_rates_async_loop', 'convert']
+__all__ = ['update_rates', 'update_rates_async', 'update_rates_async_loop', 'update_volatile_rates_async_loop', 'convert',
+           'rates_version', 'get_snapshot', 'install_snapshot']
+
+_SNAPSHOTS_DIRECTORY = 'app/data/currates'
+# the database of the previous versions, it's imported into a snapshot once
+_LEGACY_DB_PATH = 'app/data/currates.db'
 
-__db = dbm.open('app/data/currates.db', flag='c')
-# It's filled in by update_rates() and is used as a cache of sources to fetch data
-# in getter functions if the rates are missing for some reason.
-__src_cache: List[DataSource] = []
+__store = SnapshotStore(_SNAPSHOTS_DIRECTORY)
+_currency_index = CurrencyIndex(CURRENCIES_MAPPING)
+# Loaded from the file at the end of the module, replaced as a whole by update_rates().
+__snapshot: RatesSnapshot
+# updates merge new rates into the current ones, so they're serialized
+__save_lock = threading.Lock()
 _logger = logging.getLogger(__name__)
 
 
@@ -38,41 +53,77 @@ def update_rates(src: Iterable[DataSource]) -> None:
     """
     Makes HTTP requests to fetch currency exchange rates from remote sources
 
-    It saves the data into the file representing a dbm database.
-
-    As a side effect, it also saves the ``src`` list into the global ``__src_cache`` variable.
-    It's a kind of crutch to make the ``convert()`` function more robust without making it
-    to take the sources as an argument explicitly.
+    It saves the data into the snapshot file of the current day.
 
     :param src: a list of sources (see ``currates_conf.py`` for example)
     :raises ExternalServiceError: if something bad happened while executing request
     """
 
     src = list(src)
+    if _is_up_to_date(src):
+        return
+
+    from .fetch import fetch_rates
+    fetched_rates = [fetch_rates(s) for s in src]
+    _save_rates(src, fetched_rates)
 
-    global __src_cache
-    if len(__src_cache) == 0:
-        _logger.info("Filling the cache of currency rates sources...")
-        __src_cache = src
 
+async def update_rates_async(src: Iterable[DataSource]) -> None:
+    """
+    Asynchronous version of ``update_rates()``
+
+    All sources are fetched concurrently with their own timeouts and several attempts each, and the snapshot is
+    written by another thread, so the event loop is never blocked. Sources that failed are logged and skipped,
+    the rates of the others are saved anyway.
+
+    :param src: a list of sources (see ``currates_conf.py`` for example)
+    """
+
+    src = list(src)
+    if _is_up_to_date(src):
+        return
+
+    from .fetch import fetch_all_rates_async
+    results = await fetch_all_rates_async(src)
+
+    fetched_rates = []
+    for s, result in zip(src, results):
+        if isinstance(result, Exception):
+            _logger.error(f"Failed to fetch the exchange rates from {s.name}: {result!r}")
+        else:
+            fetched_rates.append(result)
+    if fetched_rates:
+        await asyncio.to_thread(_save_rates, src, fetched_rates)
+
+
+def _is_up_to_date(src: List[DataSource]) -> bool:
     today = datetime.datetime.utcnow().date()
     volatile = all(x.volatile for x in src)
-    if not volatile and 'date' in __db and __db['date'].decode() == str(today):
+    if not volatile and __snapshot.date == str(today):
         _logger.info("The cache already has the actual currency exchange rates. Skipping...")
-        return
+        return True
+    return False
 
-    fetched_rates = [_fetch_rates(s) for s in src]
+
+def _save_rates(src: List[DataSource], fetched_rates: List[ExchangeRates]) -> None:
+    """Merge the fetched rates into the current ones and write them into the snapshot. Runs in any thread."""
+    global __snapshot
+    today = datetime.datetime.utcnow().date()
+    volatile = all(x.volatile for x in src)
     today_rates = [r.rates for r in fetched_rates if r.date == today]
 
-    if len(today_rates) != len(list(src)):
+    if len(today_rates) != len(fetched_rates):
         filtered_out_src = [ExchangeRates(r.source_name, r.date, {}) for r in fetched_rates if r.date != today]
         _logger.warning(f"The following exchange rate sources were filtered out: {filtered_out_src}")
 
-    rates = reduce(lambda x, y: x | y, today_rates, {})
-    for curr, val in rates.items():
-        __db[curr] = str(val)
-    if not volatile:
-        __db['date'] = str(today)
+    with __save_lock:
+        rates = reduce(lambda x, y: x | y, today_rates, dict(__snapshot.rates))
+        date = __snapshot.date
+        # the next iteration should try to fetch the rates of failed sources again
+        if not volatile and len(fetched_rates) == len(src):
+            date = str(today)
+
+        __snapshot = RatesSnapshot(__snapshot.version + 1, date, __store.save(today, rates, date))
 
 
 async def update_rates_async_loop(src: Iterable[DataSource]) -> None:
@@ -83,7 +134,7 @@ async def update_rates_async_loop(src: Iterable[DataSource]) -> None:
     """
     while True:
         _logger.info("Updating non-volatile rates in asynchronous loop...")
-        update_rates(x for x in src if not x.volatile)
+        await update_rates_async(x for x in src if not x.volatile)
 
         today_midnight = datetime.datetime.combine(datetime.date.today(), datetime.time())
         # with random delay from 5 to 15 minutes and 0 to 60 seconds to be a good API user
@@ -103,7 +154,7 @@ async def update_volatile_rates_async_loop(src: Iterable[DataSource], period_in_
     """
     while True:
         _logger.info("Updating volatile rates in asynchronous loop...")
-        update_rates(x for x in src if x.volatile)
+        await update_rates_async(x for x in src if x.volatile)
 
         # random delay from 1 to 60 seconds to be a good API user
         run_in_time = datetime.timedelta(hours=period_in_hours,
@@ -113,7 +164,8 @@ async def update_volatile_rates_async_loop(src: Iterable[DataSource], period_in_
         await asyncio.sleep(run_in_time.total_seconds())
 
 
-def convert(from_curr: str, to_curr: Optional[str], val: float, lang_code: str) -> (float, str):
+def convert(from_curr: str, to_curr: Optional[str], val: float, lang_code: str,
+            on_date: Optional[datetime.date] = None) -> (float, str):
     """
     Converts a value from one currency into another
 
@@ -121,70 +173,114 @@ def convert(from_curr: str, to_curr: Optional[str], val: float, lang_code: str)
     :param to_curr: destination currency (if None, will be inferred from a 'lang_code')
     :param val: numeric value
     :param lang_code: used for conversion '¥' into either 'yen' or 'yuan'
+    :param on_date: use the rates of this day instead of the current ones
     :return: converted numeric value and currency name in the right declension
     :raises UnsupportedCurrency: if one or both of the currencies isn't present in our data
     :raises UnknownLanguageCode: if 'to_curr' is None and cannot be inferred from a 'lang_code'
+    :raises NoHistoricalRates: if there is no snapshot of the rates for 'on_date'
     """
     if not to_curr:
+        from .localcurr import LOCALE_TO_CURRENCY
         try:
             to_curr = LOCALE_TO_CURRENCY[lang_code.upper()]
         except KeyError:
             raise UnknownLanguageCode(lang_code)
     from_curr = _ensure_not_symbol_or_word(from_curr, lang_code)
     to_curr = _ensure_not_symbol_or_word(to_curr, lang_code)
-    result = _get_coefficient_for(from_curr.code, to_curr.code) * val
+    rates = _get_rates() if on_date is None else _get_historical_rates(on_date)
+    result = _get_coefficient_for(from_curr.code, to_curr.code, rates) * val
     return result, to_curr.resolve_declension(result)
 
 
+def rates_version() -> int:
+    """:returns: a number that changes every time the rates are updated"""
+    return __snapshot.version
+
+
+def get_snapshot() -> RatesSnapshot:
+    """:returns: all rates known at the moment"""
+    return __snapshot
+
+
+def install_snapshot(snapshot: RatesSnapshot) -> None:
+    """
+    Replace the current rates without touching the snapshot files.
+    Intended to pass the current rates to worker processes.
+    """
+    global __snapshot
+    __snapshot = snapshot
+
+
 def currency_exists(curr: Optional[str], lang_code: str) -> bool:
     """:returns: True if a specified currency is present in the database."""
-    if len(__db) == 0:
-        _logger.warning("Currencies disappeared somewhere...")
-        update_rates(__src_cache)
-
+    rates = _get_rates()
     try:
         curr = _ensure_not_symbol_or_word(curr or "", lang_code)
-    except UnsupportedCurrency | UnknownLanguageCode:
+    except (UnsupportedCurrency, UnknownLanguageCode):
         return False
-    return curr and curr.code.upper() in __db
+    return curr and curr.code.upper() in rates
 
 
-def _fetch_rates(src: DataSource) -> ExchangeRates:
-    resp = requests.get(src.url, headers=src.headers)
-    if resp.status_code != 200:
-        raise ExternalServiceError(f"{resp.status_code} {resp.reason}")
-    resp = resp.json()
-    if not src.status_checker(resp):
-        raise ExternalServiceError(resp)
-    return ExchangeRates(src.name, src.date_extractor(resp), src.rates_extractor(resp))
+def _get_rates() -> Mapping[str, float]:
+    # The rates are empty until the first update by the async loop. Queries are never blocked by fetching them;
+    # the currencies are just unsupported meanwhile. The snapshot is taken once, so the rates cannot change
+    # in the middle of a computation.
+    return __snapshot.rates
 
 
-def _get_coefficient_for(from_curr: str, to_curr: str) -> float:
-    if len(__db) == 0:
-        _logger.warning("Currencies disappeared somewhere...")
-        update_rates(__src_cache)
+def _get_historical_rates(on_date: datetime.date) -> Mapping[str, float]:
+    if on_date == datetime.datetime.utcnow().date() and len(__snapshot.rates) > 0:
+        return __snapshot.rates
+    rates = __store.load(on_date)
+    if rates is None:
+        raise NoHistoricalRates(on_date)
+    return rates
 
-    if from_curr not in __db or to_curr not in __db:
-        missed_currencies = [x for x in (from_curr, to_curr) if x not in __db]
-        raise UnsupportedCurrency(*missed_currencies)
 
-    from_usd_rate, to_usd_rate = float(__db[from_curr]), float(__db[to_curr])
+def _get_coefficient_for(from_curr: str, to_curr: str, rates: Mapping[str, float]) -> float:
+    try:
+        from_usd_rate, to_usd_rate = rates[from_curr], rates[to_curr]
+    except KeyError:
+        missed_currencies = [x for x in (from_curr, to_curr) if x not in rates]
+        raise UnsupportedCurrency(*missed_currencies)
     return to_usd_rate / from_usd_rate
 
 
-def _ensure_not_symbol_or_word(curr: str, lang_code: str) -> Currency:
+def _load_snapshot(version: int) -> RatesSnapshot:
+    # a corrupt snapshot of the last day is skipped in favor of the previous one
+    rates = __store.latest()
+    if rates is None:
+        return RatesSnapshot(version, None, MappingProxyType({}))
+    return RatesSnapshot(version, rates.date, rates)
+
+
+def _import_legacy_database(path: str) -> None:
+    """Convert the dbm database of the previous versions into a snapshot if there are no snapshots yet."""
+    if __store.days() or not dbm.whichdb(path):
+        return
+    with dbm.open(path, 'r') as db:
+        date = db['date'].decode() if 'date' in db else None
+        rates = {key.decode(): float(db[key]) for key in db.keys() if key != b'date'}
+    day = datetime.date.fromisoformat(date) if date else datetime.datetime.utcnow().date()
+    __store.save(day, rates, date)
+    _logger.info(f"{len(rates)} rates were imported from {path}")
+
+
+def _ensure_not_symbol_or_word(curr: str, lang_code: str) -> CurrencyMatch:
     if curr == "¥":
         match lang_code:
             case 'ja': curr = 'JPY'
             case 'zh': curr = 'CNY'
             case _: raise UnsupportedCurrency(f"{curr}:{lang_code}")
-    mappings = (m.clone() for m in CURRENCIES_MAPPING)
-    matched_curr = next((m for m in mappings if m.matches(curr)), None)
-    return matched_curr or Currency.from_code(curr)
+    return _currency_index.lookup(curr) or CurrencyMatch(curr.upper())
+
+
+def _mock_database(temp_dir_path: str):
+    """Use another directory for the snapshots. Used internally for testing purposes."""
+    global __store, __snapshot
+    __store = SnapshotStore(temp_dir_path)
+    __snapshot = _load_snapshot(__snapshot.version + 1)
 
 
-def _mock_database(temp_file_path: str):
-    """Open another file as the cache. Used internally for testing purposes."""
-    global __db
-    __db.close()
-    __db = dbm.open(temp_file_path, 'c')
+_import_legacy_database(_LEGACY_DB_PATH)
+__snapshot = _load_snapshot(0)
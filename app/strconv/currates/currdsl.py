@@ -4,7 +4,8 @@ Domain specific language to define mappings from natural languages into currency
 """
 
 from abc import ABC, abstractmethod
-from typing import List, Optional, Tuple
+from dataclasses import dataclass
+from typing import List, Optional, Tuple, Collection, Dict, Iterable
 
 
 class CurrABC(ABC):
@@ -21,7 +22,13 @@ class CurrABC(ABC):
 
 class Words(CurrABC, ABC):
     """Abstract base class for names of currencies in natural languages."""
-    pass
+
+    def index_terms(self) -> Optional[Tuple[Collection[str], Collection[str]]]:
+        """
+        :returns: exact words and prefixes of words matched by this instance to put them into `CurrencyIndex`,
+            or None if the matching logic is more complicated and `matches()` must be called
+        """
+        return None
 
 
 class InEnglish(Words):
@@ -37,6 +44,9 @@ class InEnglish(Words):
     def resolve_declension(self, num: float) -> str:
         return self._singular if num == 1 else self._plural
 
+    def index_terms(self) -> Optional[Tuple[Collection[str], Collection[str]]]:
+        return (self._singular, self._plural), ()
+
 
 class InRussian(Words):
     """Implementation for Russian words (declensions and singular and plural forms)."""
@@ -61,6 +71,9 @@ class InRussian(Words):
             case 2 | 3 | 4 if num not in [12, 13, 14]: return self._head + self._tails[1]
             case _: return self._head + self._tails[2]
 
+    def index_terms(self) -> Optional[Tuple[Collection[str], Collection[str]]]:
+        return (), (self._head,)
+
 
 class Currency(CurrABC):
     """
@@ -119,8 +132,95 @@ class Currency(CurrABC):
     def code(self) -> str:
         return self._code
 
+    @property
+    def signs(self) -> Tuple[str, ...]:
+        return self._signs
+
+    @property
+    def words(self) -> List[Words]:
+        return self._words
+
     def clone(self) -> 'Currency':
         """:returns: a non-abstract clone of the currency"""
         instance = self.__class__(self._code, *self._signs, words=self._words)
         instance._abstract = False
         return instance
+
+
+@dataclass(frozen=True)
+class CurrencyMatch:
+    """Immutable result of a lookup in `CurrencyIndex`."""
+    code: str
+    sign: Optional[str] = None          # the code or sign as it was written
+    words: Optional[Words] = None       # the matched words to resolve the declension
+
+    def resolve_declension(self, num: float) -> str:
+        """:returns: the right declension for the value of a 'num'"""
+        if self.words:
+            return self.words.resolve_declension(num)
+        elif self.sign:
+            return self.sign
+        else:
+            return self.code
+
+
+_Priority = Tuple[int, int]
+_END = ''   # the key of a trie node which marks the end of a prefix
+
+
+class CurrencyIndex:
+    """
+    Lookup index compiled once from the definitions of currencies.
+
+    Codes, signs and exact words are put into a hash map, prefixes (roots of Russian words) into a trie. The result
+    is the same as if the `matches()` methods were called in the order of definitions: the first currency wins, codes
+    and signs take precedence over words of the same currency.
+    """
+
+    def __init__(self, currencies: Iterable[Currency]) -> None:
+        self._exact: Dict[str, Tuple[_Priority, CurrencyMatch]] = {}
+        self._trie: dict = {}
+        self._unindexed: List[Tuple[_Priority, str, Words]] = []
+
+        for i, currency in enumerate(currencies):
+            for sign in (currency.code, *currency.signs):
+                self._exact.setdefault(sign, ((i, -1), CurrencyMatch(currency.code, sign=sign)))
+            for j, words in enumerate(currency.words):
+                entry = ((i, j), CurrencyMatch(currency.code, words=words))
+                terms = words.index_terms()
+                if terms is None:
+                    self._unindexed.append((entry[0], currency.code, words))
+                    continue
+                exact_words, prefixes = terms
+                for word in exact_words:
+                    self._exact.setdefault(word, entry)
+                for prefix in prefixes:
+                    self._add_prefix(prefix, entry)
+
+    def lookup(self, s: str) -> Optional[CurrencyMatch]:
+        """:returns: the match for the first currency matching 's' or None"""
+        candidates = []
+        exact = self._exact.get(s)
+        if exact:
+            candidates.append(exact)
+
+        node = self._trie
+        for ch in s:
+            node = node.get(ch)
+            if node is None:
+                break
+            if _END in node:
+                candidates.append(node[_END])
+
+        for priority, code, words in self._unindexed:
+            if words.matches(s):
+                candidates.append((priority, CurrencyMatch(code, words=words)))
+                break
+
+        return min(candidates, key=lambda x: x[0])[1] if candidates else None
+
+    def _add_prefix(self, prefix: str, entry: Tuple[_Priority, CurrencyMatch]) -> None:
+        node = self._trie
+        for ch in prefix:
+            node = node.setdefault(ch, {})
+        node.setdefault(_END, entry)
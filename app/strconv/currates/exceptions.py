@@ -1,3 +1,6 @@
+import datetime
+
+
 class ExternalServiceError(Exception):
     pass
 
@@ -16,3 +19,11 @@ class UnknownLanguageCode(Exception):
 
     def __str__(self) -> str:
         return f"UnknownLanguageCode({self.lang_code})"
+
+
+class NoHistoricalRates(Exception):
+    def __init__(self, date: datetime.date) -> None:
+        self.date = date
+
+    def __str__(self) -> str:
+        return f"NoHistoricalRates({self.date})"
@@ -0,0 +1,60 @@
+"""
+HTTP clients fetching the exchange rates from remote sources
+
+'requests' and 'aiohttp' are heavy to import and needed only to update the rates, which is done by the main process
+of the bot. So the package imports this module on the first update, and the processes that only convert values
+(workers of the processor pool, for example) never import it.
+"""
+
+import asyncio
+import logging
+from typing import List, Union
+
+import aiohttp
+import requests
+
+from .exceptions import ExternalServiceError
+from .types import DataSource, ExchangeRates
+
+_FETCH_ATTEMPTS = 3
+_RETRY_DELAY = 2.0   # in seconds, doubled after each attempt
+_logger = logging.getLogger(__name__)
+
+
+def fetch_rates(src: DataSource) -> ExchangeRates:
+    resp = requests.get(src.url, headers=src.headers)
+    if resp.status_code != 200:
+        raise ExternalServiceError(f"{resp.status_code} {resp.reason}")
+    resp = resp.json()
+    if not src.status_checker(resp):
+        raise ExternalServiceError(resp)
+    return ExchangeRates(src.name, src.date_extractor(resp), src.rates_extractor(resp))
+
+
+async def fetch_all_rates_async(src: List[DataSource]) -> List[Union[ExchangeRates, Exception]]:
+    """
+    Fetch all sources concurrently with their own timeouts and several attempts each.
+    :return: the rates or the exception for each source, in the same order
+    """
+    async with aiohttp.ClientSession() as session:
+        return await asyncio.gather(*(_fetch_rates_async(session, s) for s in src), return_exceptions=True)
+
+
+async def _fetch_rates_async(session: aiohttp.ClientSession, src: DataSource) -> ExchangeRates:
+    timeout = aiohttp.ClientTimeout(total=src.timeout)
+    for attempt in range(_FETCH_ATTEMPTS):
+        try:
+            async with session.get(src.url, headers=src.headers, timeout=timeout) as resp:
+                if resp.status != 200:
+                    raise ExternalServiceError(f"{resp.status} {resp.reason}")
+                resp = await resp.json(content_type=None)
+            if not src.status_checker(resp):
+                raise ExternalServiceError(resp)
+            return ExchangeRates(src.name, src.date_extractor(resp), src.rates_extractor(resp))
+        except (aiohttp.ClientError, asyncio.TimeoutError, ExternalServiceError) as err:
+            if attempt == _FETCH_ATTEMPTS - 1:
+                raise
+            delay = _RETRY_DELAY * 2**attempt
+            _logger.warning(f"Attempt {attempt + 1} to fetch the exchange rates from {src.name} failed: {err!r}. "
+                            f"Retrying in {delay} seconds...")
+            await asyncio.sleep(delay)
@@ -0,0 +1,196 @@
+"""
+Binary snapshots of exchange rates mapped into memory
+
+Every update of the rates writes a snapshot of all known rates into the file
+of the current day, so the files of previous days form the history of rates.
+The file of the day is replaced atomically, so readers never see a partially
+written file and keep the previous version mapped until they drop it.
+
+Layout of a file (all numbers are little-endian):
+
+    header, 32 bytes:   magic b'CRTS', format version (u16), reserved (u16), number of currencies (u32),
+                        creation time (f64, Unix time), date of the non-volatile rates (10 bytes, ISO),
+                        2 bytes of padding
+    currency table:     16 bytes per currency: UTF-8 codes padded with NUL bytes, sorted
+    rates:              8 bytes per currency: float64 rates of USD to the currency in the order of the table
+
+The files are mapped read-only, so opening a snapshot doesn't read the rates
+and all processes mapping the same file share its pages. The index of
+currency codes is built on the first lookup.
+"""
+
+import datetime
+import logging
+import mmap
+import os
+import struct
+import sys
+import tempfile
+import time
+from array import array
+from functools import lru_cache
+from typing import Dict, Iterator, List, Mapping, Optional
+
+__all__ = ['FORMAT_VERSION', 'SnapshotFormatError', 'MappedRates', 'SnapshotStore', 'write_snapshot']
+
+FORMAT_VERSION = 1
+SUFFIX = '.rates'
+
+_MAGIC = b'CRTS'
+_HEADER = struct.Struct('<4sHHId10s2x')
+_CODE_SIZE = 16
+_RATE = struct.Struct('<d')
+_CACHE_SIZE = 32
+_logger = logging.getLogger(__name__)
+
+
+class SnapshotFormatError(ValueError):
+    """The file is not a snapshot of rates or has an unsupported version of the format."""
+    pass
+
+
+class MappedRates(Mapping[str, float]):
+    """Read-only mapping of currency codes to the rates of USD backed by a memory-mapped snapshot file."""
+
+    def __init__(self, path: str) -> None:
+        with open(path, 'rb') as f:
+            # empty files cannot be mapped at all
+            if os.fstat(f.fileno()).st_size < _HEADER.size:
+                raise SnapshotFormatError(f"{path} is too short")
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, _, count, created_at, date = _HEADER.unpack_from(self._mmap)
+        if magic != _MAGIC:
+            raise SnapshotFormatError(f"{path} is not a snapshot of rates")
+        if version != FORMAT_VERSION:
+            raise SnapshotFormatError(f"{path} has unsupported version {version} of the format")
+        codes_end = _HEADER.size + count * _CODE_SIZE
+        if len(self._mmap) != codes_end + count * _RATE.size:
+            raise SnapshotFormatError(f"{path} is truncated")
+
+        self.path = path
+        self.created_at: float = created_at
+        self.date: Optional[str] = date.rstrip(b'\0').decode('ascii') or None
+        view = memoryview(self._mmap)
+        self._codes = view[_HEADER.size:codes_end]
+        if sys.byteorder == 'little':
+            self._rates = view[codes_end:].cast('d')
+        else:
+            self._rates = array('d', view[codes_end:].tobytes())
+            self._rates.byteswap()
+        self._count = count
+        self._index: Optional[Dict[str, int]] = None
+
+    def __getitem__(self, code: str) -> float:
+        return self._rates[self._get_index()[code]]
+
+    def __contains__(self, code: object) -> bool:
+        return code in self._get_index()
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._get_index())
+
+    def __len__(self) -> int:
+        return self._count
+
+    def _get_index(self) -> Dict[str, int]:
+        if self._index is None:
+            codes = self._codes.tobytes()
+            self._index = {codes[i:i + _CODE_SIZE].rstrip(b'\0').decode(): i // _CODE_SIZE
+                           for i in range(0, len(codes), _CODE_SIZE)}
+        return self._index
+
+
+def write_snapshot(path: str, rates: Mapping[str, float], date: Optional[str]) -> None:
+    """
+    Write the rates into a snapshot file atomically.
+
+    :param path: the path of the file; it's replaced if exists
+    :param rates: rates of USD to the currencies; codes longer than 16 bytes in UTF-8 are skipped
+    :param date: the date when the non-volatile rates were fetched last time, in ISO format
+    """
+    encoded_rates = {}
+    for code, rate in rates.items():
+        encoded_code = code.encode()
+        if len(encoded_code) > _CODE_SIZE:
+            _logger.warning(f"The code of the currency is too long to be saved: {code}")
+            continue
+        encoded_rates[encoded_code] = float(rate)
+    codes = sorted(encoded_rates)
+
+    data = bytearray(_HEADER.pack(_MAGIC, FORMAT_VERSION, 0, len(codes), time.time(), (date or "").encode('ascii')))
+    for code in codes:
+        data += code.ljust(_CODE_SIZE, b'\0')
+    data += struct.pack(f'<{len(codes)}d', *(encoded_rates[code] for code in codes))
+
+    directory = os.path.dirname(path) or '.'
+    fd, tmp_path = tempfile.mkstemp(suffix='.tmp', dir=directory)
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+class SnapshotStore:
+    """Directory with one snapshot file per day."""
+
+    def __init__(self, directory: str) -> None:
+        self.directory = directory
+
+    def path_for(self, day: datetime.date) -> str:
+        return os.path.join(self.directory, day.isoformat() + SUFFIX)
+
+    def save(self, day: datetime.date, rates: Mapping[str, float], date: Optional[str]) -> MappedRates:
+        """Write the snapshot of the day and map it into memory."""
+        os.makedirs(self.directory, exist_ok=True)
+        path = self.path_for(day)
+        write_snapshot(path, rates, date)
+        return self._open(path)
+
+    def load(self, day: datetime.date) -> Optional[MappedRates]:
+        """:returns: the last snapshot of the day or None if there is no readable snapshot for that day"""
+        path = self.path_for(day)
+        try:
+            return self._open(path)
+        except FileNotFoundError:
+            return None
+        except (SnapshotFormatError, OSError) as err:
+            _logger.error(f"Failed to read the snapshot of rates: {err}")
+            return None
+
+    def latest(self) -> Optional[MappedRates]:
+        """:returns: the snapshot of the latest day that has a readable one; corrupt snapshots are skipped"""
+        for day in reversed(self.days()):
+            rates = self.load(day)
+            if rates is not None:
+                return rates
+        return None
+
+    def days(self) -> List[datetime.date]:
+        """:returns: sorted days which have snapshots"""
+        try:
+            names = os.listdir(self.directory)
+        except FileNotFoundError:
+            return []
+        days = []
+        for name in names:
+            if not name.endswith(SUFFIX):
+                continue
+            try:
+                days.append(datetime.date.fromisoformat(name[:-len(SUFFIX)]))
+            except ValueError:
+                continue
+        return sorted(days)
+
+    @staticmethod
+    def _open(path: str) -> MappedRates:
+        # the file of the current day is replaced on every update, so the identity of the file is a part of the key
+        stat = os.stat(path)
+        return _open_mapped_rates(path, stat.st_ino, stat.st_mtime_ns)
+
+
+@lru_cache(maxsize=_CACHE_SIZE)
+def _open_mapped_rates(path: str, _inode: int, _mtime_ns: int) -> MappedRates:
+    return MappedRates(path)
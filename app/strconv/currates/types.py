@@ -1,8 +1,9 @@
 import datetime
+from types import MappingProxyType
 from dataclasses import dataclass
-from typing import Callable, Any, Dict, Optional
+from typing import Callable, Any, Dict, Optional, Mapping
 
-__all__ = ['StatusChecker', 'RatesExtractor', 'DateExtractor', 'DataSource', 'ExchangeRates']
+__all__ = ['StatusChecker', 'RatesExtractor', 'DateExtractor', 'DataSource', 'ExchangeRates', 'RatesSnapshot']
 
 StatusChecker = Callable[[Dict[str, Any]], bool]
 RatesExtractor = Callable[[Dict[str, Any]], Dict[str, float]]
@@ -18,6 +19,7 @@ class DataSource:
     date_extractor: DateExtractor
     headers: Optional[Dict[str, str]] = None    # if API_KEY is not in URL
     volatile: bool = False
+    timeout: float = 10.0                       # in seconds, for each attempt
 
 
 @dataclass
@@ -26,3 +28,19 @@ class ExchangeRates:
     source_name: str
     date: datetime.date
     rates: Dict[str, float]
+
+
+@dataclass(frozen=True)
+class RatesSnapshot:
+    """Immutable set of all known rates. It's replaced as a whole on every update."""
+    version: int
+    date: Optional[str]             # when the non-volatile rates were fetched last time
+    rates: Mapping[str, float]      # USD to the currency
+
+    def __reduce__(self):
+        # mapping proxies cannot be pickled, but the snapshot is passed to worker processes
+        return _restore_snapshot, (self.version, self.date, dict(self.rates))
+
+
+def _restore_snapshot(version: int, date: Optional[str], rates: Dict[str, float]) -> RatesSnapshot:
+    return RatesSnapshot(version, date, MappingProxyType(rates))
@@ -1,8 +1,7 @@
-"""Language layout switcher from EN to RU and vice versa."""
-
-import string
+"""Language layout switcher between the layouts registered in 'strconv.util.layouts'."""
 
 from txtproc.abc import TextProcessor, Universal
+from .util.layouts import LayoutRegistry, DEFAULT_LAYOUTS
 
 
 class LanguageLayoutSwitcher(Universal, TextProcessor):
@@ -10,18 +9,9 @@ class LanguageLayoutSwitcher(Universal, TextProcessor):
         """
         'ghbdtn' => 'привет'
         'руддщ' => 'hello'
+        'ghbdsn' => 'привіт' (for Ukrainian users)
         """
-        en_weight = sum(c in string.ascii_letters for c in query)
-        ru_weight = sum(c in _russian_letters for c in query)
-        if ru_weight > en_weight:
-            return query.translate(_layouts_match_table_ru_en)
-        else:
-            return query.translate(_layouts_match_table_en_ru)
-
+        return _registry.switch(query, lang_code)
 
-_russian_letters = r"абвгдеёжзийклмонпрстуфхцчшщъыьэюяАБВГДЕЁЖЗИЙКЛМНОПРСТУФХЦЧШЩЪЫЬЭЮЯ"
-_latin_layout    = r"""qwertyuiop[]asdfghjkl;'zxcvbnm,./`QWERTYUIOP{}ASDFGHJKL:"|ZXCVBNM<>?~@#$^&"""
-_cyrillic_layout = r"""йцукенгшщзхъфывапролджэячсмитьбю.ёЙЦУКЕНГШЩЗХЪФЫВАПРОЛДЖЭ/ЯЧСМИТЬБЮ,Ё"№;:?"""
 
-_layouts_match_table_en_ru = str.maketrans(_latin_layout, _cyrillic_layout)
-_layouts_match_table_ru_en = str.maketrans(_cyrillic_layout, _latin_layout)
+_registry = LayoutRegistry(DEFAULT_LAYOUTS)
@@ -1,8 +1,139 @@
+"""
+Replacement of ASCII sequences with proper typographic characters.
+
+All rules are compiled into one alternation pattern, so both checking and
+replacing take a single scan of the query regardless of the number of rules.
+The characters the rules may begin with are found by the parser of regular
+expressions and used as a prefilter (see the 'txtproc.features' module).
+"""
+
 import re
+from typing import Dict, FrozenSet, Iterable, List, Match, Optional, Set, Tuple
+
 from txtproc.abc import TextProcessor
+from txtproc.features import Feature, set_typographic_chars
+
+try:
+    from re import _constants as _sre_constants, _parser as _sre_parse     # Python 3.11+
+except ImportError:
+    import sre_constants as _sre_constants, sre_parse as _sre_parse
+
+_ZERO_WIDTH_OPS = {_sre_constants.AT, _sre_constants.ASSERT, _sre_constants.ASSERT_NOT}
+_REPEAT_OPS = {_sre_constants.MAX_REPEAT, _sre_constants.MIN_REPEAT,
+               getattr(_sre_constants, 'POSSESSIVE_REPEAT', _sre_constants.MAX_REPEAT)}
+_MAX_RANGE = 256    # longer ranges of characters are considered to contain any character
+
+
+class ReplacementTable:
+    """
+    A set of regular expressions with their replacements compiled into one
+    pattern. At every position, the first rule that matches wins.
+
+    Replacements are templates like the ones of 're.sub', back references
+    refer to the groups of their own rule.
+    """
+
+    def __init__(self, rules: Iterable[Tuple[str, str]], flags: int = re.IGNORECASE) -> None:
+        rules = list(rules)
+        # Each rule is wrapped into a named group. Since the outer group is closed last, 'lastgroup' of a match is
+        # always the name of the rule, even if the rule has groups of its own.
+        alternatives = (f"(?P<r{i}>{pattern})" for i, (pattern, _) in enumerate(rules))
+        self._regex = re.compile("|".join(alternatives), flags) if rules else None
+        self._replacements = {f"r{i}": replacement for i, (_, replacement) in enumerate(rules)}
+        # Groups of the combined pattern are numbered across all rules, so the rules with back references are
+        # matched once again by their own patterns to expand the templates. Plain strings are returned as is.
+        self._templates = {f"r{i}": re.compile(pattern, flags)
+                           for i, (pattern, replacement) in enumerate(rules) if '\\' in replacement}
+        # the characters matches may begin with, None if any character may
+        self.first_chars: Optional[FrozenSet[str]] = frozenset()
+        for pattern, _ in rules:
+            chars = _first_chars(pattern, flags)
+            if chars is None:
+                self.first_chars = None
+                break
+            self.first_chars |= chars
+
+    def search(self, text: str) -> bool:
+        return self._regex is not None and self._regex.search(text) is not None
+
+    def sub(self, text: str) -> str:
+        if self._regex is None:
+            return text
+        return self._regex.sub(self._replace, text)
+
+    def _replace(self, m: Match) -> str:
+        pattern = self._templates.get(m.lastgroup)
+        if pattern is None:
+            return self._replacements[m.lastgroup]
+        return pattern.match(m.string, m.start()).expand(self._replacements[m.lastgroup])
+
+
+class _AnyChar(Exception):
+    pass
+
+
+def _first_chars(pattern: str, flags: int) -> Optional[FrozenSet[str]]:
+    """:return: the characters a non-empty match of the pattern may begin with or None if any character may"""
+    parsed = _sre_parse.parse(pattern, flags)
+    ignore_case = bool(parsed.state.flags & re.IGNORECASE)
+    try:
+        chars, nullable = _scan(parsed, ignore_case)
+    except _AnyChar:
+        return None
+    return frozenset(chars) if not nullable else None
+
+
+def _scan(items, ignore_case: bool) -> Tuple[Set[str], bool]:
+    """:return: the first characters of a sequence of parsed items and whether the sequence may match nothing"""
+    chars = set()
+    for op, av in items:
+        if op in _ZERO_WIDTH_OPS:
+            continue
+        item_chars, nullable = _scan_item(op, av, ignore_case)
+        chars |= item_chars
+        if not nullable:
+            return chars, False
+    return chars, True
+
+
+def _scan_item(op, av, ignore_case: bool) -> Tuple[Set[str], bool]:
+    if op is _sre_constants.LITERAL:
+        return _literal(av, ignore_case), False
+    if op is _sre_constants.IN:
+        chars = set()
+        for item_op, item_av in av:
+            if item_op is _sre_constants.LITERAL:
+                chars |= _literal(item_av, ignore_case)
+            elif item_op is _sre_constants.RANGE and item_av[1] - item_av[0] < _MAX_RANGE:
+                for code in range(item_av[0], item_av[1] + 1):
+                    chars |= _literal(code, ignore_case)
+            else:
+                raise _AnyChar()
+        return chars, False
+    if op is _sre_constants.SUBPATTERN:
+        return _scan(av[-1], ignore_case)
+    if op is _sre_constants.BRANCH:
+        results = [_scan(branch, ignore_case) for branch in av[1]]
+        return set().union(*(chars for chars, _ in results)), any(nullable for _, nullable in results)
+    if op in _REPEAT_OPS:
+        min_count, _, items = av
+        chars, nullable = _scan(items, ignore_case)
+        return chars, nullable or min_count == 0
+    raise _AnyChar()
+
+
+def _literal(code: int, ignore_case: bool) -> Set[str]:
+    char = chr(code)
+    # Unicode case folding has pairs like 'K' and the Kelvin sign, which are not worth tracking here
+    if ignore_case and char.lower() != char.upper():
+        raise _AnyChar()
+    return {char}
 
 
 class TypographerConverter(TextProcessor):
+    # the characters are derived from the rules (see '_update_features')
+    required_features = Feature.TYPOGRAPHIC_CHARS
+
     replacements = [
         ("<<", "«"),
         (">>", "»"),
@@ -18,14 +149,52 @@ class TypographerConverter(TextProcessor):
         (r"\(r\)", "®"),
         (r"\([tт][mм]\)", "™"),
     ]
+    # additional rules for specific languages, they take precedence over the common ones
+    locale_replacements: Dict[str, List[Tuple[str, str]]] = {}
+
+    _tables: Dict[str, ReplacementTable] = {}
+
+    @classmethod
+    def add_rule(cls, pattern: str, replacement: str, lang_code: str = "") -> None:
+        """
+        Register a new replacement rule for all languages or for a specific one.
+        It doesn't add another scan of the query.
+
+        The rules are stored in the class, so the new rule affects all
+        instances of the processor, including the existing ones.
+        """
+        if lang_code:
+            cls.locale_replacements.setdefault(cls._normalize_lang(lang_code), []).append((pattern, replacement))
+        else:
+            cls.replacements.append((pattern, replacement))
+        cls._tables.clear()
+        cls._update_features()
 
     @classmethod
     def can_process(cls, query: str, lang_code: str = ""):
-        patterns = (pattern for pattern, replacement in cls.replacements)
-        return any(re.search(pattern, query, flags=re.IGNORECASE) for pattern in patterns)
+        return cls._get_table(lang_code).search(query)
 
     def process(self, query: str, lang_code: str = "") -> str:
-        result = query
-        for pattern, replacement in self.replacements:
-            result = re.sub(pattern, replacement, result, flags=re.IGNORECASE)
-        return result
+        return self._get_table(lang_code).sub(query)
+
+    @classmethod
+    def _get_table(cls, lang_code: str) -> ReplacementTable:
+        lang = cls._normalize_lang(lang_code)
+        if lang not in cls.locale_replacements:
+            lang = ""
+        table = cls._tables.get(lang)
+        if table is None:
+            table = cls._tables[lang] = ReplacementTable(cls.locale_replacements.get(lang, []) + cls.replacements)
+        return table
+
+    @classmethod
+    def _update_features(cls) -> None:
+        rules = cls.replacements + [rule for rules in cls.locale_replacements.values() for rule in rules]
+        set_typographic_chars(ReplacementTable(rules).first_chars)
+
+    @staticmethod
+    def _normalize_lang(lang_code: str) -> str:
+        return (lang_code or "").split('-')[0].lower()
+
+
+TypographerConverter._update_features()
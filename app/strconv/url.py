@@ -2,23 +2,100 @@
 URL encoder and decoder.
 
 These text processors work only for URL addresses that start with "http://" or "https://".
+
+All URL processors check and transform the same query, so they share a
+'ParsedURL' context: the query is parsed once and decoded (at most) once.
+The contexts of recent queries and conversions of domain labels to and from
+IDNA are kept in bounded LRU caches.
 """
 
+import os
 import re
 from abc import ABC
-from typing import Collection
-from urllib.parse import quote, unquote, urlparse, urlunparse, parse_qs, ParseResult
+from functools import lru_cache
+from typing import Collection, Mapping, Optional, Tuple
+from urllib.parse import quote, unquote, urlparse, urlunparse, ParseResult
+
+from prometheus_client import Counter
 
 from txtproc.abc import PrefixedTextProcessor, Reversible
+from txtproc.features import Feature
+from .util.urlrules import Ruleset, RulesetFile
 
 _re_url_encoded_char = re.compile("%[0-9]{2}")
 
+_CONTEXT_CACHE_SIZE = 32
+_IDNA_CACHE_SIZE = 1024
+_URL_RULES_FILES = ("app/data/url_rules.json", os.path.join(os.path.dirname(__file__), "url_rules.json"))
+
+_stripped_params = Counter("url_cleaner_stripped_parameters", "Tracking parameters stripped from URLs sent by users",
+                           ['rule'])
+
+
+class ParsedURL:
+    """Per-query context of URL processors with lazily computed results of common work."""
+
+    __slots__ = ('text', 'parsed', '_decoded')
+
+    def __init__(self, text: str) -> None:
+        self.text = text
+        self.parsed = urlparse(text)
+        self._decoded: Optional[str] = None
+
+    @property
+    def decoded(self) -> str:
+        """The URL with percent-encoded characters and IDNA domains decoded."""
+        if self._decoded is None:
+            self._decoded = _decode_url(self.parsed)
+        return self._decoded
+
+
+@lru_cache(maxsize=_CONTEXT_CACHE_SIZE)
+def parse_url(text: str) -> ParsedURL:
+    return ParsedURL(text)
+
+
+@lru_cache(maxsize=_IDNA_CACHE_SIZE)
+def _idna_encode_label(label: str) -> str:
+    return label.encode('idna').decode('utf-8')
+
+
+@lru_cache(maxsize=_IDNA_CACHE_SIZE)
+def _idna_decode_label(label: str) -> str:
+    return label.encode('utf-8').decode('idna')
+
+
+def _decode_url(url_address: ParseResult) -> str:
+    decoded_netloc = url_address.netloc
+    try:
+        decoded_netloc = '.'.join(_idna_decode_label(domain) for domain in url_address.netloc.split('.'))
+    except UnicodeDecodeError:
+        # I don't want to log all this garbage
+        pass
+
+    decoded_url_address = (
+        url_address.scheme,
+        decoded_netloc,
+        unquote(url_address.path),
+        unquote(url_address.params),
+        unquote(url_address.query),
+        unquote(url_address.fragment)
+    )
+    return urlunparse(decoded_url_address)
+
 
 class URLPrefixedTextProcessor(PrefixedTextProcessor, ABC):
+    required_features = Feature.URL
+
     @classmethod
     def get_prefixes(cls) -> Collection[str]:
         return {"http://", "https://"}
 
+    @staticmethod
+    def parse(text: str) -> ParsedURL:
+        """:return: the context of the query shared by all URL processors"""
+        return parse_url(text)
+
 
 class URLEncoder(Reversible, URLPrefixedTextProcessor):
     @classmethod
@@ -26,7 +103,7 @@ class URLEncoder(Reversible, URLPrefixedTextProcessor):
         return "xn--" not in text and _re_url_encoded_char.search(text) is None
 
     def transform(self, text: str) -> str:
-        url_address = urlparse(text)
+        url_address = self.parse(text).parsed
         encoded_url_address = (
             url_address.scheme,
             self._process_netloc(url_address.netloc),
@@ -39,8 +116,7 @@ class URLEncoder(Reversible, URLPrefixedTextProcessor):
 
     @staticmethod
     def _process_netloc(domains: str) -> str:
-        encoded_domains = [domain.encode('idna').decode('utf-8') for domain in domains.split('.')]
-        return '.'.join(encoded_domains)
+        return '.'.join(_idna_encode_label(domain) for domain in domains.split('.'))
 
 
 class URLDecoder(URLPrefixedTextProcessor):
@@ -55,66 +131,50 @@ class URLDecoder(URLPrefixedTextProcessor):
 
     @classmethod
     def do_transform(cls, text: str) -> str:
-        url_address = urlparse(text)
+        return cls.parse(text).decoded
 
-        decoded_netloc = url_address.netloc
-        try:
-            decoded_netloc = cls._process_netloc(url_address.netloc)
-        except UnicodeDecodeError:
-            # I don't want to log all this garbage
-            pass
 
-        decoded_url_address = (
-            url_address.scheme,
-            decoded_netloc,
-            unquote(url_address.path),
-            unquote(url_address.params),
-            unquote(url_address.query),
-            unquote(url_address.fragment)
-        )
-        return urlunparse(decoded_url_address)
-
-    @staticmethod
-    def _process_netloc(domains: str) -> str:
-        decoded_domains = [domain.encode('utf-8').decode('idna') for domain in domains.split('.')]
-        return '.'.join(decoded_domains)
+class URLCleaner(URLPrefixedTextProcessor):
+    """
+    Strips tracking parameters and text highlighting from URLs. The rules are
+    loaded from 'app/data/url_rules.json' if it exists, or from the default
+    'url_rules.json' file next to this module otherwise. Changes of the file,
+    as well as the appearance of the former one, are picked up without a
+    restart.
+    """
 
+    rules_file = RulesetFile(*_URL_RULES_FILES)
 
-class URLCleaner(URLPrefixedTextProcessor):
     def transform(self, text: str) -> str:
-        url = urlparse(text)
-        url = self._get_rid_of_utm_labels(url)
-        url = self._get_rid_of_text_highlighting(url)
-        return urlunparse(url)
+        return _clean_url(self.rules_file.get(), text)[0]
 
     @classmethod
-    def text_filter(cls, text: str) -> bool:
-        return any(x in text for x in ("utm_", "si", "#:~:text="))
+    def on_chosen(cls, query: str, lang_code: str = "") -> None:
+        # counted for the sent URLs only, not for every rendering of the answer while the user is typing
+        _, stripped = _clean_url(cls.rules_file.get(), query)
+        for rule, count in stripped.items():
+            _stripped_params.labels(rule).inc(count)
 
     @classmethod
-    def _get_rid_of_utm_labels(cls, url: ParseResult) -> ParseResult:
-        query = [cls.__flatten_qs(k, v) for k, v in parse_qs(url.query).items() if cls.__filter_qs(k)]
-        return url._replace(query='&'.join(query))
-
-    @staticmethod
-    def _get_rid_of_text_highlighting(url: ParseResult) -> ParseResult:
-        if url.fragment.startswith(":~:text="):
-            return url._replace(fragment="")
-        else:
-            return url
+    def text_filter(cls, text: str) -> bool:
+        return _clean_url(cls.rules_file.get(), text)[0] != text
 
-    @staticmethod
-    def __flatten_qs(key: str, values: list[str]) -> str:
-        return '&'.join(f"{key}={v}" for v in values)
 
-    @staticmethod
-    def __filter_qs(key: str) -> bool:
-        return not (key.startswith("utm_") or key == "si")
+# Both 'text_filter' and 'transform' need the cleaned URL; the ruleset is a part of the key since it may be reloaded.
+@lru_cache(maxsize=_CONTEXT_CACHE_SIZE)
+def _clean_url(ruleset: Ruleset, text: str) -> Tuple[str, Mapping[str, int]]:
+    """:return: the URL without tracking parameters and the number of stripped parameters by names of rules"""
+    url = parse_url(text).parsed
+    query, stripped = ruleset.clean_query(url.hostname or "", url.query)
+    fragment = "" if url.fragment.startswith(":~:text=") else url.fragment
+    if not stripped and fragment == url.fragment:
+        return text, stripped
+    return urlunparse(url._replace(query=query, fragment=fragment)), stripped
 
 
 class InstaFix(URLPrefixedTextProcessor):
     def transform(self, text: str) -> str:
-        url = urlparse(text)
+        url = self.parse(text).parsed
         url = self._get_rid_of_igshid(url)
         url = self._add_dd(url)
         return urlunparse(url)
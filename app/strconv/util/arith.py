@@ -0,0 +1,124 @@
+"""
+Safe evaluator of arithmetic expressions.
+
+Expressions are parsed into a Python AST, which is checked against a small
+whitelist of nodes: numbers, unary plus and minus and the '+ - * / // % ** ^'
+binary operators (the latter is a bitwise XOR, like in Python). Before every
+multiplication and exponentiation of integers, the size of the result is
+estimated and expressions exceeding the budget are rejected without being
+computed. Thus, input like '9**9**9' cannot pin the thread. Floats have a
+fixed size, so they're computed as is: overflows raise 'OverflowError' or
+give inf, which are rejected as well.
+
+Since the expressions don't have any variables, the results are cached by
+the normalized expression.
+"""
+
+import ast
+import math
+import operator
+import re
+from functools import lru_cache
+from typing import Union
+
+__all__ = ['EvaluationError', 'CostLimitExceeded', 'evaluate']
+
+Number = Union[int, float]
+
+# The budget of integer results; the longest ints convertible to float are of this size.
+MAX_INT_BITS = 1024
+_CACHE_SIZE = 1024
+
+_re_spaces = re.compile(r"\s+")
+_re_leading_zeros = re.compile(r"(?<![\d.])0+(?=\d)")
+
+
+class EvaluationError(ValueError):
+    """The expression is invalid or cannot be evaluated."""
+    pass
+
+
+class CostLimitExceeded(EvaluationError):
+    """The result of the expression is too large to be computed."""
+    pass
+
+
+def evaluate(expr: str) -> Number:
+    """
+    '(2+2)*2' => 8
+    '10/3' => 3.3333333333333335
+
+    :raises EvaluationError: if the expression is invalid or its result is not a finite real number
+    :raises CostLimitExceeded: if the result (or an intermediate result) is too large
+    """
+    return _evaluate_normalized(_normalize(expr))
+
+
+def _normalize(expr: str) -> str:
+    # '007' is not a valid Python literal, but it's a valid number for humans
+    return _re_leading_zeros.sub("", _re_spaces.sub("", expr))
+
+
+@lru_cache(maxsize=_CACHE_SIZE)
+def _evaluate_normalized(expr: str) -> Number:
+    try:
+        tree = ast.parse(expr, mode='eval')
+    except (SyntaxError, RecursionError, MemoryError) as err:
+        raise EvaluationError(f"Invalid expression: {expr}") from err
+    try:
+        result = _eval_node(tree.body)
+    except (ZeroDivisionError, OverflowError, TypeError, RecursionError) as err:
+        raise EvaluationError(f"{err}: {expr}") from err
+    if isinstance(result, int):
+        # results must be convertible to float to be formatted
+        try:
+            float(result)
+        except OverflowError as err:
+            raise CostLimitExceeded(expr) from err
+    # a negative number raised to a fractional power is complex; inf and nan come from float overflows
+    if isinstance(result, complex) or isinstance(result, float) and not math.isfinite(result):
+        raise EvaluationError(f"The result is not a real number: {expr}")
+    return result
+
+
+def _eval_node(node: ast.AST) -> Number:
+    match node:
+        case ast.Constant(value=value) if type(value) in (int, float):
+            return value
+        case ast.UnaryOp(op=ast.UAdd(), operand=operand):
+            return +_eval_node(operand)
+        case ast.UnaryOp(op=ast.USub(), operand=operand):
+            return -_eval_node(operand)
+        case ast.BinOp(left=left, op=op, right=right) if type(op) in _binary_operators:
+            a, b = _eval_node(left), _eval_node(right)
+            _check_cost(op, a, b)
+            return _binary_operators[type(op)](a, b)
+        case _:
+            raise EvaluationError(f"Unsupported syntax: {ast.dump(node)}")
+
+
+def _check_cost(op: ast.operator, a: Number, b: Number) -> None:
+    """Estimate the size of an integer result before computing it."""
+    if not isinstance(a, int) or not isinstance(b, int):
+        return
+    if isinstance(op, ast.Pow):
+        # negative powers are floats, which just underflow
+        if abs(a) in (0, 1) or b <= 0:
+            return
+        if math.log2(abs(a)) * b > MAX_INT_BITS:
+            raise CostLimitExceeded(f"{a} ** {b}")
+    elif isinstance(op, ast.Mult):
+        if a.bit_length() + b.bit_length() > MAX_INT_BITS + 1:
+            raise CostLimitExceeded(f"{a} * {b}")
+
+
+_binary_operators = {
+    ast.Add: operator.add,
+    ast.Sub: operator.sub,
+    ast.Mult: operator.mul,
+    ast.Div: operator.truediv,
+    ast.FloorDiv: operator.floordiv,
+    ast.Mod: operator.mod,
+    ast.Pow: operator.pow,
+    ast.BitXor: operator.xor,
+}
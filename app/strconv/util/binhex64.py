@@ -1,40 +1,121 @@
-"""Functions for binary/hexadecimal/base64 conversions."""
+"""
+Functions for binary/hexadecimal/base64 conversions.
+
+The string functions are thin wrappers over the bytes kernels, which accept
+any bytes-like object (including a 'memoryview') and never loop over single
+bytes in Python:
+
+- the binary encoder translates the whole input through 8 lookup tables of
+  256 entries (one per bit position) and interleaves the columns with
+  extended slice assignments;
+- the binary decoder strips the whitespace with 'bytes.translate' and parses
+  all the bits at once as one big integer;
+- hexadecimal and base64 conversions are delegated to 'bytes.hex',
+  'bytes.fromhex' and 'binascii'.
+"""
 
-import re
-import base64
 import binascii
-from typing import Optional
+from typing import Optional, Union
 
-from . import split_every_n_characters
+__all__ = ['str_to_bin', 'str_to_hex', 'str_to_base64',
+           'bin_to_str', 'hex_to_str', 'base64_to_str',
+           'bytes_to_bin', 'bytes_to_hex', 'bytes_to_base64',
+           'bin_to_bytes', 'hex_to_bytes', 'base64_to_bytes']
 
+BytesLike = Union[bytes, bytearray, memoryview]
 
-__all__ = ['str_to_bin', 'str_to_hex', 'str_to_base64',
-           'bin_to_str', 'hex_to_str', 'base64_to_str']
+# _BIT_TABLES[k][n] is the ASCII character of the k-th bit (from the most significant one) of the byte n
+_BIT_TABLES = tuple(bytes(ord('1') if n >> (7 - k) & 1 else ord('0') for n in range(256)) for k in range(8))
+_WHITESPACE = b" \t\n\r\x0b\x0c"
+
+
+def bytes_to_bin(data: BytesLike) -> str:
+    """
+    b'Hi' => '01001000 01101001'
+    """
+    data = bytes(data)
+    n = len(data)
+    if n == 0:
+        return ""
+    out = bytearray(b' ') * (9 * n)
+    for k, table in enumerate(_BIT_TABLES):
+        out[k::9] = data.translate(table)
+    return out[:-1].decode('ascii')
+
+
+def bin_to_bytes(b: str) -> Optional[bytes]:
+    """
+    '01001000 01101001' => b'Hi'
+    '0100100' => None (the number of bits must be a multiple of 8)
+    """
+    try:
+        bits = b.encode('ascii').translate(None, _WHITESPACE)
+    except UnicodeEncodeError:
+        return None
+    n, rem = divmod(len(bits), 8)
+    if rem or bits.translate(None, b"01"):
+        return None
+    if n == 0:
+        return b""
+    # parsing of power-of-two bases is linear in CPython
+    return int(bits, 2).to_bytes(n, 'big')
+
+
+def bytes_to_hex(data: BytesLike) -> str:
+    """
+    b'Hi' => '48 69'
+    """
+    return memoryview(data).hex(' ')
+
+
+def hex_to_bytes(s: str) -> Optional[bytes]:
+    """
+    '48 69' => b'Hi'
+    'usual text' => None
+    """
+    try:
+        return bytes.fromhex(s)
+    except ValueError:
+        return None
+
+
+def bytes_to_base64(data: BytesLike) -> str:
+    """
+    b'Hi' => 'SGk='
+    """
+    return binascii.b2a_base64(data, newline=False).decode('ascii')
+
+
+def base64_to_bytes(b: str) -> Optional[bytes]:
+    """
+    'SGk=' => b'Hi'
+    'usual text' => None
+    """
+    try:
+        return binascii.a2b_base64(b)
+    except (binascii.Error, ValueError):
+        return None
 
 
 def str_to_bin(s: str) -> str:
     """
     'Hello' => '01001000 01100101 01101100 01101100 01101111'
     """
-    b = s.encode()
-    str_bytes = ["{:08b}".format(n) for n in b]
-    return " ".join(str_bytes)
+    return bytes_to_bin(s.encode())
 
 
 def str_to_hex(s: str) -> str:
     """
     'Hello World' => '48 65 6c 6c 6f 20 57 6f 72 6c 64'
     """
-    h = s.encode().hex()
-    bl = split_every_n_characters(2, h)
-    return " ".join(bl)
+    return bytes_to_hex(s.encode())
 
 
 def str_to_base64(s: str) -> str:
     """
     'Hello World' => 'SGVsbG8gV29ybGQ='
     """
-    return base64.b64encode(bytes(s, 'UTF-8')).decode('UTF-8')
+    return bytes_to_base64(s.encode())
 
 
 def bin_to_str(b: str) -> Optional[str]:
@@ -42,18 +123,7 @@ def bin_to_str(b: str) -> Optional[str]:
     '01001000 01100101 01101100 01101100 01101111' => 'Hello'
     'usual text' => None
     """
-    b = re.sub(r"\s+", "", b)
-    str_bytes = split_every_n_characters(8, b)
-    try:
-        numbers = [int(b, 2) for b in str_bytes]
-    except ValueError:
-        return None
-    nb = bytes(numbers)
-    try:
-        chars = nb.decode()
-    except UnicodeDecodeError:
-        return None
-    return "".join(chars)
+    return _decode_utf8(bin_to_bytes(b))
 
 
 def hex_to_str(s: str) -> Optional[str]:
@@ -61,10 +131,7 @@ def hex_to_str(s: str) -> Optional[str]:
     '48 65 6c 6c 6f 20 57 6f 72 6c 64' => 'Hello World'
     'usual text' => None
     """
-    try:
-        return bytearray.fromhex(s).decode()
-    except ValueError:
-        return None
+    return _decode_utf8(hex_to_bytes(s))
 
 
 def base64_to_str(b: str) -> Optional[str]:
@@ -72,7 +139,13 @@ def base64_to_str(b: str) -> Optional[str]:
     'SGVsbG8gV29ybGQ=' => 'Hello World'
     'usual text' => None
     """
+    return _decode_utf8(base64_to_bytes(b))
+
+
+def _decode_utf8(data: Optional[bytes]) -> Optional[str]:
+    if data is None:
+        return None
     try:
-        return base64.b64decode(bytes(b, 'UTF-8')).decode('UTF-8')
-    except (binascii.Error, UnicodeDecodeError):
+        return data.decode()
+    except UnicodeDecodeError:
         return None
@@ -0,0 +1,186 @@
+"""
+Registry of keyboard layouts.
+
+Every layout is described by the characters its keys produce, listed in the
+order of 'KEYS' (the keys of the US layout). When a layout is registered, the
+registry compiles:
+
+- translation tables between it and every layout of another script;
+- a classification table which maps every character to a class: a set of
+  the layouts containing it.
+
+To detect the layout of a text, it's translated by the classification table
+once, the classes present in it are counted and their counts are summed up
+per layout. Thus, the number of passes over the text doesn't depend on the
+number of layouts. Words are
+looked at separately only if the text contains characters foreign to its
+layout.
+"""
+
+import re
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+__all__ = ['KEYS', 'Layout', 'LayoutRegistry', 'DEFAULT_LAYOUTS', 'EN', 'RU', 'UA', 'BY', 'DE']
+
+KEYS = r"""qwertyuiop[]asdfghjkl;'zxcvbnm,./`QWERTYUIOP{}ASDFGHJKL:"|ZXCVBNM<>?~@#$^&\-=_+"""
+
+# Characters are classified into latin-1 code points: one-character strings of this range are cached by the
+# interpreter, which makes counting of them much cheaper. Other latin-1 characters are classified as unknown
+# except whitespace, which is kept as is to split the classified text into the same words as the original one.
+_LATIN1_WHITESPACE = frozenset(code for code in range(256) if chr(code).isspace())
+_CLASS_CHARS = [chr(code) for code in range(0x80, 0x100) if code not in _LATIN1_WHITESPACE]
+_UNKNOWN_CLASS = _CLASS_CHARS[0]
+_MAX_CLASSES = len(_CLASS_CHARS) - 1
+
+_re_whitespace = re.compile(r"(\s+)")
+
+
+class Layout(NamedTuple):
+    name: str
+    script: str                     # layouts of the same script are never switched to each other
+    keys: str                       # characters produced by 'KEYS'
+    lang_codes: Tuple[str, ...]     # users with these languages prefer the layout
+
+
+EN = Layout('EN', 'latin', KEYS, ('en',))
+RU = Layout('RU', 'cyrillic',
+            r"""йцукенгшщзхъфывапролджэячсмитьбю.ёЙЦУКЕНГШЩЗХЪФЫВАПРОЛДЖЭ/ЯЧСМИТЬБЮ,Ё"№;:?\-=_+""",
+            ('ru',))
+UA = Layout('UA', 'cyrillic',
+            r"""йцукенгшщзхїфівапролджєячсмитьбю.'ЙЦУКЕНГШЩЗХЇФІВАПРОЛДЖЄҐЯЧСМИТЬБЮ,₴"№;:?ґ-=_+""",
+            ('uk',))
+BY = Layout('BY', 'cyrillic',
+            r"""йцукенгшўзх'фывапролджэячсмітьбю.ёЙЦУКЕНГШЎЗХ'ФЫВАПРОЛДЖЭ/ЯЧСМІТЬБЮ,Ё"№;:?\-=_+""",
+            ('be',))
+DE = Layout('DE', 'latin',
+            r"""qwertzuiopü+asdfghjklöäyxcvbnm,.-^QWERTZUIOPÜ*ASDFGHJKLÖÄ'YXCVBNM;:_°"§$&/#ß´?`""",
+            ('de',))
+
+DEFAULT_LAYOUTS = (EN, RU, UA, BY, DE)
+
+
+class LayoutRegistry:
+    """
+    Usage:
+    >>> registry = LayoutRegistry([EN, RU])
+    >>> registry.switch("ghbdtn vbh")
+    'привет мир'
+
+    Every word is switched independently. Ties between layouts are resolved
+    in favor of the layout of the whole text, then in favor of the one
+    registered first. Words fitting layouts of different scripts equally
+    (punctuation, for example) always follow the layout of the whole text.
+    """
+
+    def __init__(self, layouts: Iterable[Layout] = ()) -> None:
+        self._layouts: List[Layout] = []
+        self._masks: Dict[int, int] = {}                  # bitmasks of the layouts by characters
+        self._classes: Dict[int, str] = {}
+        self._members: Dict[str, Tuple[int, ...]] = {}     # indices of the layouts by classes
+        self._tables: Dict[Tuple[int, int], Dict[int, str]] = {}
+        for layout in layouts:
+            self.register(layout)
+
+    @property
+    def layouts(self) -> Tuple[Layout, ...]:
+        return tuple(self._layouts)
+
+    def register(self, layout: Layout) -> None:
+        if len(layout.keys) != len(KEYS):
+            raise ValueError(f"The layout {layout.name} must have {len(KEYS)} keys, not {len(layout.keys)}")
+        if any(x.name == layout.name for x in self._layouts):
+            raise ValueError(f"The layout {layout.name} is already registered")
+        if any(char.isspace() for char in layout.keys):
+            raise ValueError(f"The layout {layout.name} must not contain whitespace")
+
+        index = len(self._layouts)
+        masks = dict(self._masks)
+        for char in layout.keys:
+            masks[ord(char)] = masks.get(ord(char), 0) | 1 << index
+        distinct_masks = sorted(set(masks.values()))
+        if len(distinct_masks) > _MAX_CLASSES:
+            raise ValueError(f"Too many distinct classes of characters, {_MAX_CLASSES} is the maximum")
+        class_by_mask = dict(zip(distinct_masks, _CLASS_CHARS[1:]))
+
+        self._masks = masks
+        self._classes = {code: _UNKNOWN_CLASS for code in range(256) if code not in _LATIN1_WHITESPACE}
+        self._classes.update((code, class_by_mask[mask]) for code, mask in masks.items())
+        self._members = {cls: tuple(i for i in range(index + 1) if mask >> i & 1)
+                         for mask, cls in class_by_mask.items()}
+        for i, other in enumerate(self._layouts):
+            if other.script != layout.script:
+                self._tables[(index, i)] = _compile_table(layout, other)
+                self._tables[(i, index)] = _compile_table(other, layout)
+        self._layouts.append(layout)
+
+    def detect(self, text: str) -> Optional[Layout]:
+        """:return: the layout which contains the most characters of the text or None if there are no such"""
+        best = self._best(self._score(self._count(text.translate(self._classes))))
+        return self._layouts[best] if best is not None else None
+
+    def switch(self, text: str, lang_code: str = "") -> str:
+        """
+        Retype every word of the text as if it was typed in the layout of
+        another script. If several layouts are suitable, the one preferred
+        by users with 'lang_code' is chosen.
+        """
+        classes = text.translate(self._classes)
+        counts = self._count(classes)
+        text_layout = self._best(self._score(counts))
+        if text_layout is None:
+            return text
+        # if all characters belong to the layout of the text, it's the best one for every word as well
+        native = {cls for cls, members in self._members.items() if text_layout in members}
+        if native.issuperset(counts):
+            return self._retype(text, text_layout, lang_code)
+
+        parts = _re_whitespace.split(text)
+        for i, word_classes in enumerate(_re_whitespace.split(classes)[::2]):
+            word_counts = self._count(word_classes)
+            if native.issuperset(word_counts):
+                parts[2 * i] = self._retype(parts[2 * i], text_layout, lang_code)
+                continue
+            scores = self._score(word_counts)
+            source = self._best(scores, text_layout)
+            if source is None:
+                continue
+            script = self._layouts[source].script
+            if any(score == scores[source] and self._layouts[j].script != script for j, score in enumerate(scores)):
+                source = text_layout
+            parts[2 * i] = self._retype(parts[2 * i], source, lang_code)
+        return "".join(parts)
+
+    def _count(self, classes: str) -> Dict[str, int]:
+        """:return: numbers of characters by their classes"""
+        return {cls: classes.count(cls) for cls in set(classes) if cls in self._members}
+
+    def _score(self, counts: Dict[str, int]) -> List[int]:
+        scores = [0] * len(self._layouts)
+        for cls, count in counts.items():
+            for i in self._members[cls]:
+                scores[i] += count
+        return scores
+
+    @staticmethod
+    def _best(scores: List[int], preferred: Optional[int] = None) -> Optional[int]:
+        best = max(range(len(scores)), key=scores.__getitem__, default=None)
+        if best is None or not scores[best]:
+            return None
+        return preferred if preferred is not None and scores[preferred] == scores[best] else best
+
+    def _retype(self, text: str, source: int, lang_code: str) -> str:
+        script = self._layouts[source].script
+        candidates = [i for i, x in enumerate(self._layouts) if x.script != script]
+        lang = lang_code.split('-')[0].lower()
+        preferred = [i for i in candidates if lang in self._layouts[i].lang_codes]
+        target = (preferred or candidates or [None])[0]
+        return text.translate(self._tables[(source, target)]) if target is not None else text
+
+
+def _compile_table(source: Layout, target: Layout) -> Dict[int, str]:
+    table = {}
+    # a key may produce the same character with and without Shift; the lowercase one wins
+    for src, dst in zip(source.keys, target.keys):
+        if src != dst:
+            table.setdefault(ord(src), dst)
+    return table
@@ -0,0 +1,62 @@
+"""
+Shared kernel of the processors producing HTML.
+
+The kernel makes both forms of the result at once: the plain one (used as the
+description of an inline result) and the escaped one (used as the text of the
+message), so the intermediate work is never repeated.
+
+Spacing is done by an interleaving slice assignment over the encoded text
+instead of a per-character loop. Pure ASCII text is spaced as bytes, any
+other text as UTF-32 code units. Escaping uses 'str.replace', since
+'str.translate' falls back to a slow per-character path for multi-character
+replacements like '&lt;'.
+"""
+
+from typing import NamedTuple, Optional
+
+from . import escape_html
+
+__all__ = ['Rendered', 'spaced_text', 'render']
+
+_UTF32 = 'utf-32-le'
+_UTF32_SPACE = " ".encode(_UTF32)
+
+
+class Rendered(NamedTuple):
+    html: str
+    plain: str
+
+
+def spaced_text(text: str) -> str:
+    """
+    'hello world' => 'h e l l o   w o r l d'
+
+    Trailing whitespace is stripped.
+    """
+    if not text:
+        return ""
+    if text.isascii():
+        out = bytearray(b' ') * (2 * len(text) - 1)
+        out[::2] = text.encode('ascii')
+        return out.decode('ascii').rstrip()
+    # lone surrogates are allowed in Python strings, so they must survive the round trip
+    out = bytearray(_UTF32_SPACE) * (2 * len(text) - 1)
+    memoryview(out).cast('I')[::2] = memoryview(text.encode(_UTF32, 'surrogatepass')).cast('I')
+    return out.decode(_UTF32, 'surrogatepass').rstrip()
+
+
+def render(text: str, upper: bool = False, spaced: bool = False, tag: Optional[str] = None) -> Rendered:
+    """
+    Make the plain and HTML forms of the text.
+
+    :param upper: convert the text to upper case (after spacing, like the banner maker always did)
+    :param spaced: separate all characters with spaces
+    :param tag: an HTML tag to wrap the escaped text into, without attributes
+    """
+    plain = spaced_text(text) if spaced else text
+    if upper:
+        plain = plain.upper()
+    html = escape_html(plain)
+    if tag:
+        html = f"<{tag}>{html}</{tag}>"
+    return Rendered(html, plain)
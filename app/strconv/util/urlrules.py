@@ -0,0 +1,192 @@
+"""
+Rulesets of tracking parameters which should be stripped from URLs.
+
+A ruleset is described by a JSON file like this:
+
+    {"rules": [
+        {"name": "utm", "prefixes": ["utm_"]},
+        {"name": "facebook", "params": ["fbclid"]},
+        {"name": "youtube", "domains": ["youtube.com", "youtu.be"], "params": ["si", "feature"]}
+    ]}
+
+Rules without domains apply to all URLs. Domain rules apply to the domain
+and all its subdomains. The rules are compiled once into a hash map of names
+and a trie of prefixes, so every key of the query string is looked at once,
+regardless of the number of rules. A matcher for a set of domains is
+compiled on the first request and reused later.
+"""
+
+import json
+import logging
+import os
+import time
+from collections import Counter
+from typing import Dict, FrozenSet, Iterable, List, NamedTuple, Optional, Tuple
+from urllib.parse import unquote_plus
+
+__all__ = ['Rule', 'Ruleset', 'RulesetFile']
+
+_TERMINAL = None    # the key of a trie node under which the name of the rule is stored
+
+
+class Rule(NamedTuple):
+    name: str
+    params: FrozenSet[str] = frozenset()
+    prefixes: Tuple[str, ...] = ()
+    domains: FrozenSet[str] = frozenset()       # empty for global rules
+
+    @classmethod
+    def from_dict(cls, d: dict) -> 'Rule':
+        unknown_fields = set(d) - set(cls._fields)
+        if unknown_fields:
+            raise ValueError(f"Unknown fields of the rule {d.get('name')}: {', '.join(sorted(unknown_fields))}")
+        if not isinstance(d.get('name'), str):
+            raise ValueError(f"The name of the rule must be a string: {d.get('name')!r}")
+        for field in ('params', 'prefixes', 'domains'):
+            # a string would be taken as a collection of its characters otherwise
+            value = d.get(field, [])
+            if not isinstance(value, list) or not all(isinstance(x, str) for x in value):
+                raise ValueError(f"The '{field}' field of the rule {d['name']} must be a list of strings")
+        return cls(d['name'], frozenset(d.get('params', ())), tuple(d.get('prefixes', ())),
+                   frozenset(domain.lower() for domain in d.get('domains', ())))
+
+
+class _Matcher:
+    def __init__(self, rules: Iterable[Rule]) -> None:
+        self._names: Dict[str, str] = {}
+        self._trie: dict = {}
+        # the first rule wins if several ones match the same parameter
+        for rule in rules:
+            for param in rule.params:
+                self._names.setdefault(param, rule.name)
+            for prefix in rule.prefixes:
+                node = self._trie
+                for char in prefix:
+                    node = node.setdefault(char, {})
+                node.setdefault(_TERMINAL, rule.name)
+
+    def match(self, key: str) -> Optional[str]:
+        """:return: the name of the rule stripping the parameter or None if it must be kept"""
+        rule = self._names.get(key)
+        if rule is not None:
+            return rule
+        node = self._trie
+        for char in key:
+            if _TERMINAL in node:
+                break
+            node = node.get(char)
+            if node is None:
+                return None
+        return node.get(_TERMINAL)
+
+
+class Ruleset:
+    """
+    Usage:
+    >>> ruleset = Ruleset([Rule('utm', prefixes=('utm_',))])
+    >>> ruleset.clean_query("www.example.com", "id=1&utm_source=foo")
+    ('id=1', Counter({'utm': 1}))
+    """
+
+    def __init__(self, rules: Iterable[Rule] = ()) -> None:
+        self.rules = tuple(rules)
+        self._global_rules = [rule for rule in self.rules if not rule.domains]
+        self._domain_rules: Dict[str, List[Rule]] = {}
+        for rule in self.rules:
+            for domain in rule.domains:
+                self._domain_rules.setdefault(domain, []).append(rule)
+        # matchers by sets of domains which have rules of their own
+        self._matchers: Dict[Tuple[str, ...], _Matcher] = {(): _Matcher(self._global_rules)}
+
+    @classmethod
+    def from_json(cls, text: str) -> 'Ruleset':
+        return cls(Rule.from_dict(d) for d in json.loads(text)['rules'])
+
+    def clean_query(self, host: str, query: str) -> Tuple[str, Counter]:
+        """
+        Strip tracking parameters from the query string of a URL. Other
+        parameters are kept as is, including their order and encoding.
+
+        :param host: the host name of the URL, parameters specific for its domain are stripped as well
+        :param query: the query string without the leading '?'
+        :return: the cleaned query and the number of stripped parameters by names of rules
+        """
+        stripped = Counter()
+        if not query:
+            return query, stripped
+        matcher = self._get_matcher(host)
+        kept = []
+        for param in query.split('&'):
+            if not param:
+                # dropped only if the query is changed anyway
+                continue
+            key = param.split('=', 1)[0]
+            if '%' in key or '+' in key:
+                key = unquote_plus(key)
+            rule = matcher.match(key)
+            if rule is None:
+                kept.append(param)
+            else:
+                stripped[rule] += 1
+        return ('&'.join(kept) if stripped else query), stripped
+
+    def _get_matcher(self, host: str) -> _Matcher:
+        labels = (host or "").lower().split('.')
+        suffixes = ('.'.join(labels[i:]) for i in range(len(labels)))
+        domains = tuple(domain for domain in suffixes if domain in self._domain_rules)
+        matcher = self._matchers.get(domains)
+        if matcher is None:
+            # domain rules take precedence over the global ones, the most specific domain goes first
+            rules = [rule for domain in domains for rule in self._domain_rules[domain]] + self._global_rules
+            matcher = self._matchers[domains] = _Matcher(rules)
+        return matcher
+
+
+class RulesetFile:
+    """
+    A ruleset loaded from the first existing file of several ones and
+    reloaded when the file is changed, or when a file preceding it appears.
+    The files are checked at most once per 'check_interval' seconds. If the
+    new version of the file is broken, the previous ruleset is kept.
+    """
+
+    _logger = logging.getLogger(__name__)
+
+    def __init__(self, *paths: str, check_interval: float = 5.0) -> None:
+        self.paths = paths
+        self.path: Optional[str] = None     # the file the current ruleset was loaded from
+        self._check_interval = check_interval
+        self._ruleset = Ruleset()
+        self._mtime: Optional[int] = None
+        self._checked_at = float('-inf')
+
+    def get(self) -> Ruleset:
+        now = time.monotonic()
+        if now - self._checked_at >= self._check_interval:
+            self._checked_at = now
+            self._reload_if_changed()
+        return self._ruleset
+
+    def _reload_if_changed(self) -> None:
+        for path in self.paths:
+            try:
+                mtime = os.stat(path).st_mtime_ns
+                break
+            except FileNotFoundError:
+                continue
+            except OSError as err:
+                self._logger.error(f"The ruleset cannot be read: {err}")
+                return
+        else:
+            self._logger.error(f"None of the ruleset files exists: {', '.join(self.paths)}")
+            return
+        if path == self.path and mtime == self._mtime:
+            return
+        self.path, self._mtime = path, mtime
+        try:
+            with open(path, encoding='utf-8') as f:
+                self._ruleset = Ruleset.from_json(f.read())
+        except (OSError, ValueError, KeyError, TypeError, AttributeError) as err:
+            self._logger.error(f"The ruleset from {path} is broken, the previous version is kept: {err}")
+            return
+        self._logger.info(f"{len(self._ruleset.rules)} rules were loaded from {path}")
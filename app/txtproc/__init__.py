@@ -9,4 +9,4 @@ If you're a developer of a new text processor, see the 'abc' module.
 """
 
 from .loader import TextProcessorsLoader
-from .abc import TextProcessor
+from .abc import TextProcessor, ProcessResult
@@ -2,18 +2,28 @@
 
 import re
 from abc import ABC, abstractmethod
+from dataclasses import dataclass
 from typing import Collection, Optional
 
+from .features import Feature
 from .util import classproperty
 
 
 __all__ = [
-    'TextProcessor', 'PrefixedTextProcessor',
+    'ProcessResult', 'TextProcessor', 'PrefixedTextProcessor',
     'Exclusive', 'Reversible', 'Universal', 'HTML',
     'Encoder', 'Decoder'
 ]
 
 
+@dataclass(frozen=True)
+class ProcessResult:
+    """Everything the bot needs to know to show the result of a processor."""
+    text: str
+    description: str
+    parse_mode: str = ""
+
+
 class TextProcessor(ABC):
     """
     Base class for all text processors. Your class must extend this one to
@@ -35,13 +45,29 @@ class TextProcessor(ABC):
     Processors are allowed to return a string containing HTML tags. In this
     case, set the 'use_html' field to True. Note, however, that processors
     must escape HTML entities in the input query by themselves! Use the
-    'strconv.util.escape_html' function for that. The parse mode is deliberately
+    'strconv.util.markup.render' function for that: it makes both the escaped
+    text and the plain description at once. The parse mode is deliberately
     restricted to HTML only. Telegram flavored Markdown is much harder to
     escape properly.
 
     If you use HTML, it's likely you'll want to override the 'get_description'
     method as well. By default, description the message equals to its text,
     but Telegram renders all HTML tags inside it as plain text.
+
+    The bot uses the 'get_result' method to get the text and description at
+    once. By default, it calls 'process' only once and 'get_description' only
+    if it's overridden. Override 'get_result' itself if the text and
+    description share some intermediate work.
+
+    If processing of some queries may take too long (arbitrary arithmetic,
+    for example), set the 'is_expensive' field to True. The bot may run such
+    processors in worker processes with a deadline (see the 'pool' module),
+    so both the processor and its result must be picklable.
+
+    To make the matching of queries cheaper, declare the features the query
+    must have in the 'required_features' class variable (see the 'features'
+    module). The loader won't call 'can_process' for queries that lack any
+    of them.
     """
 
     # Marker used instead of 'issubclass' to search for descendants of this class.
@@ -52,6 +78,9 @@ class TextProcessor(ABC):
     is_reversible = False
 
     use_html = False
+    is_expensive = False
+
+    required_features = Feature(0)
 
     @classmethod
     @abstractmethod
@@ -64,6 +93,17 @@ class TextProcessor(ABC):
         """Transform the query and return the result."""
         pass
 
+    @classmethod
+    def match(cls, query: str, lang_code: str = "") -> Optional['TextProcessor']:
+        """
+        Return an instance of the processor if it can handle the query or None otherwise.
+
+        Override this method if checking the query involves the same work as
+        processing it. The returned instance may carry the result of that work
+        over to the 'process' method.
+        """
+        return cls() if cls.can_process(query, lang_code) else None
+
     def get_description(self, query: str, lang_code: str = "") -> str:
         """
         By default, description of the message equals to the processed text itself.
@@ -71,6 +111,29 @@ class TextProcessor(ABC):
         """
         return self.process(query, lang_code)
 
+    @classmethod
+    def on_chosen(cls, query: str, lang_code: str = "") -> None:
+        """
+        Called when a user has sent the result of the processor for the query (if inline feedback is enabled for
+        the bot). Collect statistics of the results here rather than in 'process', which runs on every keystroke.
+        """
+        pass
+
+    def get_result(self, query: str, lang_code: str = "") -> ProcessResult:
+        """Transform the query and return the text, description and parse mode of the result together."""
+        text = self.process(query, lang_code)
+        if type(self).get_description is TextProcessor.get_description:
+            description = text
+        else:
+            description = self.get_description(query, lang_code)
+        return ProcessResult(text, description, self.parse_mode)
+
+    @classproperty
+    @classmethod
+    def parse_mode(cls) -> str:
+        """Return the parse mode for the Bot API."""
+        return "HTML" if cls.use_html else ""
+
     @classproperty
     @classmethod
     def name(cls) -> str:
@@ -173,6 +236,8 @@ class Reversible:
 
 class Universal:
     """Mix-in class that's used for processors that can handle any non-empty text."""
+    required_features = Feature.NON_EMPTY
+
     @classmethod
     def can_process(cls, query: str, lang_code: str = "") -> bool:
         return len(query) > 0
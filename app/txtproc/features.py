@@ -0,0 +1,64 @@
+"""
+Cheap features of a query that are extracted once and shared by all processors.
+
+Text processors may declare the features they need in the 'required_features'
+class variable. The loader extracts the features of every query exactly once
+and doesn't even call 'can_process' of processors whose requirements aren't
+satisfied. Note that the features are a prefilter only: they must never be
+stricter than the 'can_process' method of the processor.
+"""
+
+import string
+from enum import IntFlag
+from typing import FrozenSet, Iterable, Optional
+
+__all__ = ['Feature', 'extract_features', 'set_typographic_chars']
+
+
+class Feature(IntFlag):
+    NON_EMPTY = 1
+    # all characters of the query belong to the alphabet
+    BINARY_ALPHABET = 2
+    HEX_ALPHABET = 4
+    BASE64_ALPHABET = 8
+    # the query contains '{{'
+    SUBSTITUTION = 16
+    # the query starts with 'http://' or 'https://'
+    URL = 32
+    # the query contains at least one of the characters the rules of the typographer begin with
+    TYPOGRAPHIC_CHARS = 64
+
+
+_binary_alphabet = frozenset("01 ")
+_hex_alphabet = frozenset(string.hexdigits + " ")
+_base64_alphabet = frozenset(string.ascii_letters + string.digits + "+/=")
+# set by the typographer from its rules; None if any character may begin them
+_typographic_chars: Optional[FrozenSet[str]] = frozenset()
+
+
+def set_typographic_chars(chars: Optional[Iterable[str]]) -> None:
+    """Set the characters the rules of the typographer begin with. None means any character may begin them."""
+    global _typographic_chars
+    _typographic_chars = frozenset(chars) if chars is not None else None
+
+
+def extract_features(query: str) -> Feature:
+    """Compute the feature set of the query. Characters of the query are scanned only once."""
+    if not query:
+        return Feature(0)
+
+    features = Feature.NON_EMPTY
+    chars = frozenset(query)
+    if chars <= _binary_alphabet:
+        features |= Feature.BINARY_ALPHABET
+    if chars <= _hex_alphabet:
+        features |= Feature.HEX_ALPHABET
+    if chars <= _base64_alphabet:
+        features |= Feature.BASE64_ALPHABET
+    if _typographic_chars is None or not chars.isdisjoint(_typographic_chars):
+        features |= Feature.TYPOGRAPHIC_CHARS
+    if '{' in chars and "{{" in query:
+        features |= Feature.SUBSTITUTION
+    if query.startswith(("http://", "https://")):
+        features |= Feature.URL
+    return features
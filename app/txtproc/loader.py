@@ -1,13 +1,17 @@
 import inspect
 import pkgutil
 import importlib
+import time
 from typing import *
 
 from .abc import TextProcessor
+from .features import Feature, extract_features
 
 T = TypeVar('T')
 TextProcessorTypesPair = Tuple[Type[TextProcessor], Type[TextProcessor]]
 TextProcessorsPair = Tuple[TextProcessor, TextProcessor]
+# is called with every checked processor and the duration of its 'can_process' method in seconds
+MatchObserver = Callable[[Type[TextProcessor], float], None]
 
 
 def get_implementations_from_module(cls: Type[T], module) -> Iterable[Type[T]]:
@@ -48,6 +52,10 @@ class TextProcessorsLoader:
     the constructor parameter, it gathers all concrete implementations of
     the 'TextProcessor' class from either a module or all modules in some
     package.
+
+    Processors are grouped by their 'required_features', so the features of
+    a query are extracted once and the whole group is skipped without calling
+    'can_process' if the query lacks some of them.
     """
     all_processors = None          # type: FrozenSet[Type[TextProcessor]]
     exclusive_processors = None    # type: Iterable[Type[TextProcessor]]
@@ -58,17 +66,61 @@ class TextProcessorsLoader:
         self.all_processors = frozenset(impls)
         self.exclusive_processors = {x for x in impls if x.is_exclusive}
         self.simple_processors = {x for x in impls if x not in self.exclusive_processors}
+        self._by_name = {x.snake_case_name: x for x in impls}
+        self._exclusive_index = self._build_index(self.exclusive_processors)
+        self._simple_index = self._build_index(self.simple_processors)
 
-    def match_exclusive_processors(self, query: str, lang_code: str = "") -> Iterable[TextProcessor]:
+    def match_exclusive_processors(self, query: str, lang_code: str = "",
+                                   features: Optional[Feature] = None,
+                                   observer: Optional[MatchObserver] = None) -> Iterable[TextProcessor]:
         """
         Iterate over the list of exclusive processors. Returns the list of
         instances of all processors which can process the query.
+
+        :param features: features of the query if they're already known (see the 'features' module)
+        :param observer: a function to measure the processors with (see the 'metrics' module)
         """
-        return [x() for x in self.exclusive_processors if x.can_process(query, lang_code)]
+        return self._match(self._exclusive_index, query, lang_code, features, observer)
 
-    def match_simple_processors(self, query: str, lang_code: str = "") -> Iterable[TextProcessor]:
+    def match_simple_processors(self, query: str, lang_code: str = "",
+                                features: Optional[Feature] = None,
+                                observer: Optional[MatchObserver] = None) -> Iterable[TextProcessor]:
         """
         Iterate over the list of non-exclusive processors. Returns the list of
         instances of all processors which can process the query.
+
+        :param features: features of the query if they're already known (see the 'features' module)
+        :param observer: a function to measure the processors with (see the 'metrics' module)
         """
-        return [x() for x in self.simple_processors if x.can_process(query, lang_code)]
+        return self._match(self._simple_index, query, lang_code, features, observer)
+
+    def find(self, snake_case_name: str) -> Optional[Type[TextProcessor]]:
+        """Return the processor by its 'snake_case_name' or None if there is no such processor."""
+        return self._by_name.get(snake_case_name)
+
+    @staticmethod
+    def _build_index(processors: Iterable[Type[TextProcessor]]) -> List[Tuple[Feature, List[Type[TextProcessor]]]]:
+        index: Dict[Feature, List[Type[TextProcessor]]] = {}
+        for proc in processors:
+            index.setdefault(proc.required_features, []).append(proc)
+        return list(index.items())
+
+    @staticmethod
+    def _match(index: List[Tuple[Feature, List[Type[TextProcessor]]]], query: str, lang_code: str,
+               features: Optional[Feature], observer: Optional[MatchObserver]) -> List[TextProcessor]:
+        if features is None:
+            features = extract_features(query)
+        candidates = (x for required, group in index if features & required == required for x in group)
+        if observer is None:
+            matches = (x.match(query, lang_code) for x in candidates)
+        else:
+            matches = (TextProcessorsLoader._observed_match(x, query, lang_code, observer) for x in candidates)
+        return [x for x in matches if x is not None]
+
+    @staticmethod
+    def _observed_match(proc: Type[TextProcessor], query: str, lang_code: str,
+                        observer: MatchObserver) -> Optional[TextProcessor]:
+        start = time.perf_counter()
+        match = proc.match(query, lang_code)
+        observer(proc, time.perf_counter() - start)
+        return match
@@ -1,12 +1,37 @@
-"""Module for management of Prometheus metrics"""
+"""
+Module for management of Prometheus metrics
 
-from typing import Dict
-from prometheus_client import start_http_server, Counter
+Besides the usage counters of processors, it provides histograms of the
+duration of 'can_process' and 'process' calls and the lengths of input and
+output texts, labelled by the 'snake_case_name' of the processor. Since
+inline queries come in a lot, only a fraction of them is measured (see
+'set_sampling_rate'). The decision is made once per query by 'sampled()',
+so all the metrics of the query are either recorded or not.
+"""
+
+import random
+from typing import Dict, Type
+from prometheus_client import start_http_server, Counter, Histogram
 
 from .abc import TextProcessor
 
 _COUNTER_PREFIX = "used_processor_"
 _counters: Dict[str, Counter] = {}
+_sampling_rate = 1.0
+
+_LATENCY_BUCKETS = (.00001, .000025, .00005, .0001, .00025, .0005, .001, .0025, .005, .01, .025, .05, .1, .5, 1.0)
+_LENGTH_BUCKETS = (8, 16, 32, 64, 128, 256, 512, 1024, 2048, 4096)
+
+_can_process_duration = Histogram("processor_can_process_seconds", "Duration of 'can_process' calls",
+                                  ['processor'], buckets=_LATENCY_BUCKETS)
+_process_duration = Histogram("processor_process_seconds", "Duration of 'process' calls",
+                              ['processor'], buckets=_LATENCY_BUCKETS)
+_input_length = Histogram("processor_input_length_chars", "Length of processed queries",
+                          ['processor'], buckets=_LENGTH_BUCKETS)
+_output_length = Histogram("processor_output_length_chars", "Length of results",
+                           ['processor'], buckets=_LENGTH_BUCKETS)
+inline_request_duration = Histogram("inline_request_seconds", "End-to-end time of handling of inline queries",
+                                    buckets=_LATENCY_BUCKETS)
 
 
 def register(*processors: TextProcessor) -> None:
@@ -24,6 +49,33 @@ def inc(query_id: str) -> None:
     _counters[proc_name].inc()
 
 
+def set_sampling_rate(rate: float) -> None:
+    """
+    Set the fraction of queries whose processors are measured.
+    :param rate: from 0.0 (disabled) to 1.0 (every query)
+    """
+    global _sampling_rate
+    if not 0.0 <= rate <= 1.0:
+        raise ValueError(f"The sampling rate must be in the [0, 1] range: {rate}")
+    _sampling_rate = rate
+
+
+def sampled() -> bool:
+    """Decide whether the current query should be measured."""
+    return _sampling_rate >= 1.0 or random.random() < _sampling_rate
+
+
+def observe_can_process(proc: Type[TextProcessor], seconds: float) -> None:
+    _can_process_duration.labels(proc.snake_case_name).observe(seconds)
+
+
+def observe_process(proc: TextProcessor, seconds: float, input_length: int, output_length: int) -> None:
+    name = proc.snake_case_name
+    _process_duration.labels(name).observe(seconds)
+    _input_length.labels(name).observe(input_length)
+    _output_length.labels(name).observe(output_length)
+
+
 def serve(port: int) -> None:
     """Runs a WSGI server for metrics"""
     start_http_server(port)
@@ -0,0 +1,199 @@
+"""
+Pool of worker processes for expensive text processors.
+
+Processors marked with 'is_expensive' may take a lot of time on some
+pathological queries. To not stall the handling of other queries, the bot
+runs them in worker processes and waits for their results until the deadline
+of the query only. Results that miss the deadline are dropped. Since a task
+that is already running cannot be cancelled, the workers are replaced with
+fresh ones in this case. The pool is shared by the threads handling queries,
+so the old workers are killed only when no query waits for them anymore.
+
+Worker processes have their own copies of all modules. If processors depend
+on some data that is changed in the main process (exchange rates, for
+example), pass a 'version_func' to recycle the workers when the data changes
+and an 'initializer' to install the current data into new workers.
+
+The workers are started by a fork server: forking the main process, which
+runs other threads, could copy a lock held by one of them into the child.
+So processors, their results and the arguments of the initializer must be
+picklable, and the modules they're defined in are imported by every worker.
+Workers import the main module as '__mp_main__' as well, so it must not
+set anything up outside of the "if __name__ == '__main__'" block. The fork
+server imports it and the 'preload' modules once, and the workers inherit
+them instead of importing them on their own.
+"""
+
+import time
+import logging
+import multiprocessing
+import threading
+from multiprocessing.pool import AsyncResult, Pool
+from typing import *
+
+from prometheus_client import Counter
+
+from .abc import ProcessResult, TextProcessor
+
+__all__ = ['ProcessorPool', 'PendingResult']
+
+_timeouts = Counter("processor_pool_timeouts", "Results of expensive processors dropped by the deadline",
+                    ['processor'])
+_failures = Counter("processor_pool_failures", "Expensive processors failed with an exception", ['processor'])
+_recycles = Counter("processor_pool_recycles", "Replacements of all worker processes", ['reason'])
+
+
+class _Generation:
+    """Worker processes started for one version of the data."""
+
+    def __init__(self, pool: Pool, version: int) -> None:
+        self.pool = pool
+        self.version = version
+        self.in_flight = 0      # tasks whose results are not collected yet
+
+
+class PendingResult(NamedTuple):
+    processor: TextProcessor
+    async_result: AsyncResult
+    deadline: float
+    generation: _Generation
+
+
+def _get_result(processor: TextProcessor, query: str, lang_code: str) -> ProcessResult:
+    return processor.get_result(query, lang_code)
+
+
+class ProcessorPool:
+    """
+    Usage:
+    >>> pool = ProcessorPool(processes=2, timeout=0.5)
+    >>> pending = [pool.submit(proc, query, lang_code) for proc in expensive_processors]
+    >>> results = pool.collect(pending)     # None for the results that missed the deadline
+
+    The worker processes are started lazily on the first submission. All
+    methods are thread-safe.
+    """
+
+    _logger = logging.getLogger(__name__)
+
+    def __init__(self, processes: int, timeout: float,
+                 version_func: Callable[[], int] = lambda: 0,
+                 initializer: Optional[Callable[..., None]] = None,
+                 initargs_func: Callable[[], tuple] = tuple,
+                 preload: Iterable[str] = ()) -> None:
+        """
+        :param processes: the number of worker processes
+        :param timeout: the time given to processors of one query, in seconds
+        :param version_func: a function returning the current version of the data the processors depend on
+        :param initializer: a function to call in every new worker process
+        :param initargs_func: a function returning the arguments for the initializer
+        :param preload: names of the modules to import in the fork server, the packages of processors usually
+        """
+        self._processes = processes
+        self._timeout = timeout
+        self._version_func = version_func
+        self._initializer = initializer
+        self._initargs_func = initargs_func
+        self._context = multiprocessing.get_context('forkserver')
+        # takes effect if the fork server isn't running yet; the fork server is shared by all pools
+        self._context.set_forkserver_preload(['__main__', __package__, *preload])
+        self._lock = threading.Lock()
+        # new tasks are submitted to the current generation only
+        self._current: Optional[_Generation] = None
+        # replaced generations, they're killed as soon as all their tasks are collected
+        self._retired: List[_Generation] = []
+
+    def submit(self, processor: TextProcessor, query: str, lang_code: str = "") -> PendingResult:
+        """Start computing the result of the processor in a worker process."""
+        started: Optional[_Generation] = None
+        while True:
+            with self._lock:
+                generation = self._get_generation(started)
+                if generation is not None:
+                    generation.in_flight += 1
+                    async_result = generation.pool.apply_async(_get_result, (processor, query, lang_code))
+                    idle = self._pop_idle_generations()
+                    break
+            if started is not None:
+                # the data has changed while the workers were starting
+                self._terminate([started])
+            # starting of processes takes a while, so it's done without the lock
+            version = self._version_func()
+            started = _Generation(self._context.Pool(self._processes, self._initializer, self._initargs_func()),
+                                  version)
+        if started is not None and started is not generation:
+            # another thread has started the workers in the meantime
+            idle.append(started)
+        self._terminate(idle)
+        return PendingResult(processor, async_result, time.monotonic() + self._timeout, generation)
+
+    def collect(self, pending: Iterable[PendingResult]) -> List[Optional[ProcessResult]]:
+        """
+        Wait for the results until their deadline.
+        :return: results in the same order; None for failed processors and those that missed the deadline
+        """
+        pending = list(pending)
+        results = []
+        for p in pending:
+            p.async_result.wait(max(p.deadline - time.monotonic(), 0))
+            if not p.async_result.ready():
+                _timeouts.labels(p.processor.snake_case_name).inc()
+                self._logger.warning(f"{p.processor.name} missed the deadline")
+                # the stuck worker is killed later, when the other queries using it collect their results
+                with self._lock:
+                    self._retire(p.generation, 'timeout')
+                results.append(None)
+                continue
+            try:
+                results.append(p.async_result.get())
+            except Exception as err:
+                _failures.labels(p.processor.snake_case_name).inc()
+                self._logger.exception(f"{p.processor.name} failed in a worker process", exc_info=err)
+                results.append(None)
+
+        with self._lock:
+            for p in pending:
+                p.generation.in_flight -= 1
+            idle = self._pop_idle_generations()
+        self._terminate(idle)
+        return results
+
+    def shutdown(self) -> None:
+        with self._lock:
+            generations = self._retired + ([self._current] if self._current else [])
+            self._current = None
+            self._retired = []
+        self._terminate(generations)
+
+    def _get_generation(self, started: Optional[_Generation]) -> Optional[_Generation]:
+        """
+        Must be called with the lock held.
+        :param started: new workers to install if there are no current ones
+        :return: the current workers; None if new ones must be started
+        """
+        version = self._version_func()
+        if self._current is not None and self._current.version != version:
+            self._retire(self._current, 'version')
+        if self._current is None and started is not None and started.version == version:
+            self._current = started
+        return self._current
+
+    def _retire(self, generation: _Generation, reason: str) -> None:
+        # must be called with the lock held; several queries may find the same generation stuck
+        if generation is not self._current:
+            return
+        _recycles.labels(reason).inc()
+        self._current = None
+        self._retired.append(generation)
+
+    def _pop_idle_generations(self) -> List[_Generation]:
+        # must be called with the lock held
+        idle = [g for g in self._retired if g.in_flight == 0]
+        self._retired = [g for g in self._retired if g.in_flight > 0]
+        return idle
+
+    @staticmethod
+    def _terminate(generations: Iterable[_Generation]) -> None:
+        for g in generations:
+            g.pool.terminate()
+            g.pool.join()
@@ -6,11 +6,13 @@ Note, the 'resolve_text_processor_name' function must not be placed in the
 localization system!
 """
 
+import json
 from dataclasses import dataclass
-from typing import Type, Union, Iterable, List, TypeVar, Collection, FrozenSet
+from typing import Type, Union, Iterable, List, TypeVar, Collection, FrozenSet, Dict
 from klocmod import LanguageDictionary
 
 from txtproc import TextProcessor
+from queryutil import InlineKeyboardBuilder
 
 T = TypeVar('T')
 
@@ -57,6 +59,50 @@ def collect_help_messages(processors: FrozenSet[Type[TextProcessor]],
     return res
 
 
+@dataclass(frozen=True)
+class LocalizedHelp:
+    message: str                # the text of the '/help' message
+    reply_markup: str           # the keyboard with a button for every page, serialized as JSON
+    pages: Dict[str, str]       # texts of the pages by names of processors
+    titles: Dict[str, str]      # titles of the pages by names of processors
+
+
+class HelpCatalog:
+    """
+    Help messages and keyboards of all text processors. They're built once
+    per language, so the help handlers only look them up and send them.
+    """
+
+    def __init__(self, processors: Iterable[Type[TextProcessor]], buttons_per_row: int = 2) -> None:
+        self._processors = frozenset(processors)
+        self._buttons_per_row = buttons_per_row
+        self._cache: Dict[str, LocalizedHelp] = {}
+
+    def get(self, lang: LanguageDictionary) -> LocalizedHelp:
+        localized_help = self._cache.get(lang.name)
+        if localized_help is None:
+            localized_help = self._cache[lang.name] = self._build(lang)
+        return localized_help
+
+    def warm_up(self, langs: Iterable[LanguageDictionary]) -> None:
+        """Build the help for the languages in advance."""
+        for lang in langs:
+            self.get(lang)
+
+    def _build(self, lang: LanguageDictionary) -> LocalizedHelp:
+        # sorted to make the order of the buttons stable between restarts
+        messages = sorted(collect_help_messages(self._processors, lang), key=lambda m: m.name)
+        kb = InlineKeyboardBuilder()
+        for row in divide_chunks(messages, self._buttons_per_row):
+            r = kb.add_row()
+            for msg in row:
+                r.add(msg.title, callback_data=f"help:{msg.name}")
+        return LocalizedHelp(message=lang['help_message'],
+                             reply_markup=json.dumps(kb.build()),
+                             pages={m.name: f"*{m.title}*\n\n{m.description}" for m in messages},
+                             titles={m.name: m.title for m in messages})
+
+
 def divide_chunks(lst: Collection[T], n: int) -> Iterable[Collection[T]]:
     """Split a list to a list of lists of n elements."""
     lst = list(lst)
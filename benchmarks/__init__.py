@@ -0,0 +1,18 @@
+"""
+Benchmarks of the hot paths of the bot.
+
+Run them from the root of the repository with the 'app' directory in the path:
+
+    PYTHONPATH=app python -m benchmarks.suite --output results.json
+    PYTHONPATH=app python -m benchmarks.suite --baseline benchmarks/baseline.json
+
+The suite measures every processor over the corpora in 'benchmarks.corpora'
+and exits with a non-zero code if the median latency of some benchmark grew
+beyond the tolerance compared to the baseline. The committed baseline is
+also compared with on CI, where regressions are reported without failing
+the build, since the runners are slower and noisier than the machine the
+baseline was measured on.
+
+Comparisons of kernels with their former implementations live in the
+'benchmarks.experiments' package and are run by hand.
+"""
@@ -0,0 +1,57 @@
+"""Realistic and worst-case queries grouped by their kind."""
+
+import base64
+from typing import Dict, List
+
+_cyrillic_sentence = "Съешь же ещё этих мягких французских булок, да выпей чаю. "
+_ascii_sentence = "The quick brown fox jumps over the lazy dog -- again... "
+
+CORPORA: Dict[str, List[str]] = {
+    'short_ascii': [
+        "hello",
+        "Hello, world!",
+        "ghbdtn",
+        "<<quoted>> -- dash",
+        "2+2*2",
+        "10 USD",
+    ],
+    'long_cyrillic': [
+        _cyrillic_sentence * 20,
+        (_cyrillic_sentence * 50).upper(),
+        "руддщ цщкдв " * 100,
+    ],
+    'long_ascii': [
+        _ascii_sentence * 40,
+        "a != b, c <= d, e -> f (c) (tm) " * 30,
+    ],
+    'urls': [
+        "https://example.com/",
+        "https://www.google.com/search?q=текст+на+русском&utm_source=bot&utm_medium=inline",
+        "http://пример.рф/путь/к/странице?параметр=значение",
+        "https://example.com/%D0%BF%D1%83%D1%82%D1%8C?q=%D1%82%D0%B5%D0%BA%D1%81%D1%82",
+        "https://xn--e1afmkfd.xn--p1ai/",
+        "https://www.instagram.com/p/Cabc123/?igshid=abcdef",
+    ],
+    'binhex64_blobs': [
+        "01001000 01100101 01101100 01101100 01101111",
+        "48656c6c6f2c20776f726c6421",
+        "d09fd180d0b8d0b2d0b5d182" * 20,
+        base64.b64encode(("Привет, мир! " * 20).encode()).decode(),
+        base64.b64encode(b"hello").decode(),
+    ],
+    'calculator': [
+        "{{2*2}}",
+        "foo {{2+2*2 EUR to USD}} bar",
+        "{{ 10 долларов в рубли }}, {{ 10 евро в рубли }}",
+        "{{((((1+2)*3-4)/5)**2)%7}} and {{(1+(2+(3+(4+(5+6)))))*7}}",
+        "{{1}} " * 50,
+    ],
+    'worst_case': [
+        "{{" * 2000,
+        "{{" + " " * 2000,
+        "{{1" + " " * 2000 + "x}}",
+        "0" * 4000,
+        "A" * 4000,
+        "-" * 4000,
+    ],
+}
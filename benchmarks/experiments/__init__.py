@@ -0,0 +1,10 @@
+"""
+One-off comparisons of kernels with their former implementations or
+alternative backends. Unlike the suite, they only print their timings and
+have no baseline, so they are run by hand when the kernels are changed:
+
+    PYTHONPATH=app python -m benchmarks.experiments.calc_backends
+    PYTHONPATH=app python -m benchmarks.experiments.calc_tokenizer
+    PYTHONPATH=app python -m benchmarks.experiments.binhex64_kernels
+    PYTHONPATH=app python -m benchmarks.experiments.html_kernels
+"""
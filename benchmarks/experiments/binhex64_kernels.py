@@ -0,0 +1,71 @@
+"""
+Bytes kernels of 'strconv.util.binhex64' against the former per-byte
+implementations, which are kept here for comparison. The kernels are
+expected to be at least 10 times faster on inputs of a few kilobytes.
+"""
+
+import base64
+import re
+import timeit
+
+from strconv.util import split_every_n_characters
+from strconv.util.binhex64 import str_to_bin, bin_to_str, str_to_hex, hex_to_str, str_to_base64, base64_to_str
+
+SIZES = [64, 1024, 4096]
+NUMBER = 200
+TEXT = "Привет, мир! Hello, World! "
+
+
+def _legacy_str_to_bin(s: str) -> str:
+    return " ".join("{:08b}".format(n) for n in s.encode())
+
+
+def _legacy_bin_to_str(b: str) -> str:
+    b = re.sub(r"\s+", "", b)
+    return bytes(int(x, 2) for x in split_every_n_characters(8, b)).decode()
+
+
+def _legacy_str_to_hex(s: str) -> str:
+    return " ".join(split_every_n_characters(2, s.encode().hex()))
+
+
+def _legacy_hex_to_str(s: str) -> str:
+    return bytearray.fromhex(s).decode()
+
+
+def _legacy_str_to_base64(s: str) -> str:
+    return base64.b64encode(bytes(s, 'UTF-8')).decode('UTF-8')
+
+
+def _legacy_base64_to_str(b: str) -> str:
+    return base64.b64decode(bytes(b, 'UTF-8')).decode('UTF-8')
+
+
+# name, legacy function, kernel, function preparing the input from the plain text
+CASES = [
+    ('str_to_bin', _legacy_str_to_bin, str_to_bin, lambda s: s),
+    ('bin_to_str', _legacy_bin_to_str, bin_to_str, str_to_bin),
+    ('str_to_hex', _legacy_str_to_hex, str_to_hex, lambda s: s),
+    ('hex_to_str', _legacy_hex_to_str, hex_to_str, str_to_hex),
+    ('str_to_base64', _legacy_str_to_base64, str_to_base64, lambda s: s),
+    ('base64_to_str', _legacy_base64_to_str, base64_to_str, str_to_base64),
+]
+
+
+def _measure(func, arg) -> float:
+    return timeit.timeit(lambda: func(arg), number=NUMBER) / NUMBER
+
+
+def run() -> None:
+    for name, legacy, kernel, prepare in CASES:
+        print(name)
+        for size in SIZES:
+            text = (TEXT * (size // len(TEXT) + 1))[:size]
+            arg = prepare(text)
+            assert legacy(arg) == kernel(arg)
+            old, new = _measure(legacy, arg), _measure(kernel, arg)
+            print(f"{size:>8} chars: legacy {old * 1e6:10.1f} us, kernel {new * 1e6:10.1f} us, x{old / new:.1f}")
+
+
+if __name__ == '__main__':
+    run()
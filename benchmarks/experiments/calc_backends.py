@@ -0,0 +1,37 @@
+"""Comparison of the built-in arithmetic evaluator with numexpr (if installed manually) and bare eval."""
+
+import timeit
+
+from strconv.util import arith
+
+EXPRESSIONS = ["2*2", "(2+2)*2", "10/3", "7.26/6", "1234.5*0.0825+17", "2**10-(3+4)*5/6"]
+NUMBER = 2000
+
+
+def _numexpr_eval():
+    try:
+        # noinspection PyPackageRequirements
+        import numexpr
+    except ModuleNotFoundError:
+        return None
+    return lambda s: numexpr.evaluate(s).take(0)
+
+
+def run() -> None:
+    backends = {
+        'arith (cached)': arith.evaluate,
+        'arith (uncached)': lambda s: arith._evaluate_normalized.__wrapped__(arith._normalize(s)),
+        'eval': eval,
+    }
+    numexpr_eval = _numexpr_eval()
+    if numexpr_eval:
+        backends['numexpr'] = numexpr_eval
+
+    for name, func in backends.items():
+        seconds = timeit.timeit(lambda: [func(e) for e in EXPRESSIONS], number=NUMBER)
+        per_expr = seconds / NUMBER / len(EXPRESSIONS) * 1e6
+        print(f"{name:>18}: {per_expr:8.2f} µs per expression")
+
+
+if __name__ == '__main__':
+    run()
@@ -0,0 +1,57 @@
+"""
+Adversarial inputs for the substitution scanner of the calculator.
+
+The former implementation searched the query with a regular expression full
+of lazy quantifiers; it's kept here for comparison. The time of the scanner
+must grow linearly with the length of the query.
+"""
+
+import re
+import timeit
+
+from strconv.calc import find_substitutions
+
+_legacy_subst_re = re.compile(r"\{\{(?P<expr>[0-9+\-*/%^., ()]+?)? *?"
+                              r"((?P<from_curr>[A-Za-zа-я.]{3,}|[$€₽£¥]) *?"
+                              r"(to|>|в)? *?"
+                              r"(?P<to_curr>[A-Za-zа-я.]{3,}|[$€₽£¥])?)?? *?}}")
+
+ADVERSARIAL_INPUTS = {
+    'braces': lambda n: "{{" * n,
+    'spaces': lambda n: "{{" + " " * n,
+    'unclosed expr': lambda n: "{{1" + " " * n + "x}}",
+    'currency words': lambda n: "{{1 " + "usd " * n + "}",
+    'many substitutions': lambda n: "{{1}} " * n,
+}
+SIZES = [250, 500, 1000, 2000, 4000]
+NUMBER = 3
+# the legacy regex takes seconds on 1000 spaces and grows cubically
+LEGACY_MAX_SIZE = 500
+
+
+def _legacy_scan(query: str) -> int:
+    return sum(1 for _ in _legacy_subst_re.finditer(query))
+
+
+def _scan(query: str) -> int:
+    return sum(1 for _ in find_substitutions(query))
+
+
+def _measure(func, query: str) -> str:
+    seconds = timeit.timeit(lambda: func(query), number=NUMBER) / NUMBER
+    return f"{seconds * 1e3:10.3f} ms"
+
+
+def run() -> None:
+    for name, make_input in ADVERSARIAL_INPUTS.items():
+        print(name)
+        for size in SIZES:
+            query = make_input(size)
+            line = f"{len(query):>8} chars: scanner {_measure(_scan, query)}"
+            if size <= LEGACY_MAX_SIZE:
+                line += f", legacy regex {_measure(_legacy_scan, query)}"
+            print(line)
+
+
+if __name__ == '__main__':
+    run()
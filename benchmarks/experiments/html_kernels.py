@@ -0,0 +1,71 @@
+"""
+The shared kernel of HTML processors ('strconv.util.markup') against the
+banner maker of the baseline version, which is kept here for comparison,
+and against a single pass of 'str.join' and 'str.translate'.
+
+The baseline escaped the text before spacing, so its HTML differs from the
+kernel's one for texts with angle brackets; only the plain forms are checked.
+"""
+
+import timeit
+from io import StringIO
+
+from strconv.util import escape_html
+from strconv.util.markup import render
+
+SIZES = [64, 1024, 4096]
+NUMBER = 200
+TEXTS = {
+    'ascii': "Hello <b>World</b>! ",
+    'cyrillic': "Привет, <b>мир</b>! ",
+    'no markup': "Hello World! ",
+}
+_ESCAPE_TABLE = str.maketrans({'<': '&lt;', '>': '&gt;'})
+
+
+def _legacy_spaced_text(text: str) -> str:
+    def spaced_text_generator(s: str):
+        for c in s:
+            yield c
+            yield ' '
+
+    new_str = StringIO()
+    for ch in spaced_text_generator(text):
+        new_str.write(ch)
+    return new_str.getvalue().rstrip()
+
+
+def _legacy_banner(query: str) -> tuple:
+    # 'process' and 'get_description' of the baseline 'BannerMaker'
+    banner = _legacy_spaced_text(escape_html(query)).upper()
+    return "<code>{}</code>".format(banner), _legacy_spaced_text(query).upper()
+
+
+def _translate_banner(query: str) -> tuple:
+    banner = " ".join(query).rstrip().upper()
+    return f"<code>{banner.translate(_ESCAPE_TABLE)}</code>", banner
+
+
+def _banner(query: str) -> tuple:
+    return tuple(render(query, upper=True, spaced=True, tag='code'))
+
+
+def _measure(func, arg) -> float:
+    return min(timeit.repeat(lambda: func(arg), number=NUMBER, repeat=5)) / NUMBER
+
+
+def run() -> None:
+    for name, text in TEXTS.items():
+        print(f"banner, {name}")
+        for size in SIZES:
+            query = (text * (size // len(text) + 1))[:size]
+            assert _legacy_banner(query)[1] == _banner(query)[1]
+            assert _translate_banner(query) == _banner(query)
+            old, joined, new = _measure(_legacy_banner, query), _measure(_translate_banner, query), \
+                _measure(_banner, query)
+            print(f"{size:>8} chars: baseline {old * 1e6:10.1f} us, join+translate {joined * 1e6:10.1f} us, "
+                  f"kernel {new * 1e6:10.1f} us, x{old / new:.1f}")
+
+
+if __name__ == '__main__':
+    run()
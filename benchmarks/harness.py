@@ -0,0 +1,87 @@
+"""
+Measurement primitives of the benchmark suite: timing of single calls,
+aggregation into percentiles, persistence as JSON and comparison with
+a baseline.
+"""
+
+import json
+import statistics
+import time
+from dataclasses import dataclass, asdict
+from typing import Any, Callable, Dict, Iterable, List, Sequence
+
+__all__ = ['Measurement', 'Regression', 'measure', 'save_results', 'load_results', 'compare']
+
+DEFAULT_TOLERANCE = 0.25    # a 25% slowdown of the median is considered a regression
+
+
+@dataclass(frozen=True)
+class Measurement:
+    name: str
+    ops_per_sec: float
+    p50_us: float
+    p99_us: float
+    calls: int
+
+
+@dataclass(frozen=True)
+class Regression:
+    name: str
+    baseline_p50_us: float
+    current_p50_us: float
+
+    @property
+    def slowdown(self) -> float:
+        return self.current_p50_us / self.baseline_p50_us - 1
+
+
+def measure(name: str, func: Callable[[Any], Any], inputs: Sequence[Any],
+            calls: int = 2000, warmup: int = 100) -> Measurement:
+    """
+    Call 'func' with the inputs in turns and time every call separately.
+    The throughput is computed from the total time of all calls.
+    """
+    for i in range(warmup):
+        func(inputs[i % len(inputs)])
+
+    samples = []
+    clock = time.perf_counter_ns
+    for i in range(calls):
+        arg = inputs[i % len(inputs)]
+        start = clock()
+        func(arg)
+        samples.append(clock() - start)
+
+    total_seconds = sum(samples) / 1e9
+    percentiles = statistics.quantiles(samples, n=100, method='inclusive')
+    return Measurement(name=name,
+                       ops_per_sec=calls / total_seconds if total_seconds else float('inf'),
+                       p50_us=percentiles[49] / 1e3,
+                       p99_us=percentiles[98] / 1e3,
+                       calls=calls)
+
+
+def save_results(path: str, results: Iterable[Measurement]) -> None:
+    with open(path, 'w') as f:
+        json.dump([asdict(m) for m in results], f, indent=2, ensure_ascii=False)
+
+
+def load_results(path: str) -> List[Measurement]:
+    with open(path) as f:
+        return [Measurement(**obj) for obj in json.load(f)]
+
+
+def compare(results: Iterable[Measurement], baseline: Iterable[Measurement],
+            tolerance: float = DEFAULT_TOLERANCE) -> List[Regression]:
+    """
+    Find the benchmarks whose median latency grew by more than 'tolerance'.
+    Benchmarks missing from the baseline are ignored. The tail latency is too
+    noisy to fail on, so it's only reported.
+    """
+    baseline_by_name: Dict[str, Measurement] = {m.name: m for m in baseline}
+    regressions = []
+    for m in results:
+        base = baseline_by_name.get(m.name)
+        if base and m.p50_us > base.p50_us * (1 + tolerance):
+            regressions.append(Regression(m.name, base.p50_us, m.p50_us))
+    return regressions
@@ -0,0 +1,139 @@
+"""
+Benchmark suite of the hot paths: dispatching of queries, every processor
+discovered by 'TextProcessorsLoader' over the corpora, currency conversion
+with a mocked rates database and building and serialization of inline query results.
+
+    PYTHONPATH=app python -m benchmarks.suite --output results.json
+    PYTHONPATH=app python -m benchmarks.suite --baseline benchmarks/baseline.json
+
+The process exits with a non-zero code if some benchmark regressed against
+the baseline. 'benchmarks/baseline.json' holds the results of the current
+version of the code; regenerate it with '--output' when a change makes some
+path faster or slower on purpose. Absolute timings depend on the machine, so
+compare your changes with a baseline measured on the same machine.
+"""
+
+import argparse
+import logging
+import sys
+import tempfile
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable, Iterable, List, Optional, Sequence, Tuple
+
+import strconv
+from queryutil import InlineQueryResultsBuilder, InlineKeyboardBuilder, RawJSON, get_articles_generator_for, \
+    json_serialize
+from strconv import currates
+from strconv.currates.snapshots import SnapshotStore
+from txtproc import TextProcessorsLoader
+
+from .corpora import CORPORA
+from .harness import DEFAULT_TOLERANCE, Measurement, measure, save_results, load_results, compare
+
+LANG_CODE = "ru"
+MOCK_RATES = {"USD": 1, "RUB": 73.200918, "EUR": 0.937251, "CNY": 6.826292, "JPY": 133.9, "GBP": 0.83}
+CONVERSIONS = [
+    ("USD", "RUB", 10.0, "ru"),
+    ("€", "$", 9.85, ""),
+    ("¥", "RUB", 9.85, "zh"),
+    ("долларов", "рубли", 10.0, "ru"),
+    ("EUR", None, 1.0, "ru"),
+]
+
+# name, function, inputs
+Benchmark = Tuple[str, Callable[[Any], Any], Sequence[Any]]
+
+
+def mock_rates(directory: str) -> None:
+    """Replace the rates with a fresh snapshot filled with 'MOCK_RATES' for today."""
+    path = str(Path(directory) / 'currates')
+    today = datetime.utcnow().date()
+    SnapshotStore(path).save(today, MOCK_RATES, str(today))
+    currates._mock_database(path)
+
+
+def dispatch_benchmarks(loader: TextProcessorsLoader) -> Iterable[Benchmark]:
+    def match_all(query: str) -> None:
+        loader.match_exclusive_processors(query, LANG_CODE)
+        loader.match_simple_processors(query, LANG_CODE)
+
+    for corpus, queries in CORPORA.items():
+        yield f"match:{corpus}", match_all, queries
+
+
+def processor_benchmarks(loader: TextProcessorsLoader) -> Iterable[Benchmark]:
+    for proc in sorted(loader.all_processors, key=lambda p: p.snake_case_name):
+        def process(query: str, proc=proc) -> None:
+            proc.match(query, LANG_CODE).get_result(query, LANG_CODE)
+
+        for corpus, queries in CORPORA.items():
+            accepted = [q for q in queries if proc.match(q, LANG_CODE) is not None]
+            if accepted:
+                yield f"process:{proc.snake_case_name}:{corpus}", process, accepted
+
+
+def convert_benchmark() -> Benchmark:
+    return "currates.convert", lambda args: currates.convert(*args), CONVERSIONS
+
+
+def build_json_benchmark() -> Benchmark:
+    texts = [q for queries in CORPORA.values() for q in queries if q]
+    kb = InlineKeyboardBuilder()
+    kb.add_row().add("Decrypt", callback_data="1")
+    keyboard = RawJSON(json_serialize(kb.build()))
+
+    def build(count: int) -> None:
+        builder = InlineQueryResultsBuilder()
+        add_article = get_articles_generator_for(builder)
+        for i in range(count):
+            add_article(f"title {i}", texts[i % len(texts)], article_id=f"proc_{i}", reply_markup=keyboard)
+        builder.build_json()
+
+    return "queryutil.build_json", build, [1, 5, 10]
+
+
+def run(calls: int, name_filter: str = "") -> List[Measurement]:
+    loader = TextProcessorsLoader(strconv)
+    benchmarks = [*dispatch_benchmarks(loader), *processor_benchmarks(loader),
+                  convert_benchmark(), build_json_benchmark()]
+    results = []
+    for name, func, inputs in benchmarks:
+        if name_filter not in name:
+            continue
+        m = measure(name, func, inputs, calls)
+        results.append(m)
+        print(f"{m.name:<60} {m.ops_per_sec:>12,.0f} ops/s  p50 {m.p50_us:>9.2f} µs  p99 {m.p99_us:>9.2f} µs")
+    return results
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--calls', type=int, default=2000, help="number of timed calls per benchmark")
+    parser.add_argument('--filter', default="", help="run only benchmarks containing this substring")
+    parser.add_argument('--output', help="save the results into this JSON file")
+    parser.add_argument('--baseline', help="compare the results with this JSON file")
+    parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE,
+                        help="allowed relative growth of the median latency")
+    args = parser.parse_args(argv)
+
+    # processors log rejected input, which is expected for the worst-case corpus
+    logging.disable(logging.WARNING)
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        mock_rates(tmp_dir)
+        results = run(args.calls, args.filter)
+
+    if args.output:
+        save_results(args.output, results)
+    if not args.baseline:
+        return 0
+
+    regressions = compare(results, load_results(args.baseline), args.tolerance)
+    for r in regressions:
+        print(f"REGRESSION {r.name}: p50 {r.baseline_p50_us:.2f} µs -> {r.current_p50_us:.2f} µs "
+              f"(+{r.slowdown:.0%})", file=sys.stderr)
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
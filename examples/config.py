@@ -8,9 +8,21 @@ APP_HOST = '0.0.0.0'                      # '0.0.0.0' for a Docker isolated netw
 APP_PORT = 8080                           # A port for a local server, which the application establishes.
 SERVER_PORT = 8443                        # A port on a front-end web server.
 METRICS_PORT = 8000
+METRICS_SAMPLING_RATE = 0.1               # A fraction of inline queries whose processors are timed.
 UNIX_SOCKET = "/tmp/textUtilsBot.sock"    # A Unix domain socket to communicate with that web server.
 SOCKET_TYPE = 'TCP'                       # TCP or UNIX
 
+# Inline queries are handled by a pool of threads to not block the event loop.
+HANDLER_THREADS = 4
+
+# Processors that may take too long (the calculator, for example) run in separate processes.
+# Their results are dropped if they aren't ready in time. Set the number of workers to 0 to run them inline.
+EXPENSIVE_PROCESSORS_WORKERS = 2
+EXPENSIVE_PROCESSORS_TIMEOUT = 1.0        # in seconds
+
+# How long the original texts of encoded messages are kept for the "Decrypt" button.
+MESSAGES_TTL_IN_DAYS = 30
+
 # Set to 'False' for production use.
 # Besides the level of verbosity, determines whether polling or webhooks will be used.
 DEBUG = True
@@ -0,0 +1,90 @@
+import threading
+import time
+
+from answercache import AnswerCache
+
+
+def test_hit():
+    cache = AnswerCache(max_bytes=1024, ttl=60)
+    calls = []
+
+    def compute():
+        calls.append(1)
+        return ["foo"]
+
+    assert cache.get_or_compute(("foo", "en"), compute) == ["foo"]
+    assert cache.get_or_compute(("foo", "en"), compute) == ["foo"]
+    assert len(calls) == 1
+
+
+def test_get():
+    cache = AnswerCache(max_bytes=1024, ttl=60)
+    assert cache.get("foo") is None
+    cache.get_or_compute("foo", lambda: (["foo"]))
+    assert cache.get("foo") == ["foo"]
+
+
+def test_bounded_by_size():
+    cache = AnswerCache(max_bytes=20, ttl=60)
+    for i in range(5):
+        cache.get_or_compute(i, lambda: (["1234567"]))
+    assert len(cache) == 1
+    cache.get_or_compute("big", lambda: (["x" * 100]))
+    assert len(cache) == 1
+
+
+def test_ttl():
+    cache = AnswerCache(max_bytes=1024, ttl=0)
+    cache.get_or_compute("key", lambda: ("old"))
+    time.sleep(0.001)
+    assert cache.get_or_compute("key", lambda: ("new")) == "new"
+
+
+def test_values_are_dropped_with_version():
+    version = 0
+    cache = AnswerCache(max_bytes=1024, ttl=60, version_func=lambda: version)
+    cache.get_or_compute("foo", lambda: "old")
+    cache.get_or_compute("bar", lambda: "old")
+    version += 1
+    assert cache.get("bar") is None
+    assert len(cache) == 0
+    assert cache.get_or_compute("foo", lambda: "new") == "new"
+
+
+def test_value_of_old_version_is_not_stored():
+    version = 0
+    cache = AnswerCache(max_bytes=1024, ttl=60, version_func=lambda: version)
+
+    def compute():
+        nonlocal version
+        version += 1    # the data is updated during the computation
+        return "old"
+
+    assert cache.get_or_compute("foo", compute) == "old"
+    assert cache.get("foo") is None
+
+
+def test_coalescing():
+    cache = AnswerCache(max_bytes=1024, ttl=60)
+    started = threading.Event()
+    release = threading.Event()
+    calls = []
+
+    def compute():
+        calls.append(1)
+        started.set()
+        release.wait(1)
+        return "value"
+
+    results = []
+    owner = threading.Thread(target=lambda: results.append(cache.get_or_compute("key", compute)))
+    owner.start()
+    started.wait(1)
+    waiter = threading.Thread(target=lambda: results.append(cache.get_or_compute("key", compute)))
+    waiter.start()
+    release.set()
+    owner.join()
+    waiter.join()
+
+    assert results == ["value", "value"]
+    assert len(calls) == 1
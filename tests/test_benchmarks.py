@@ -0,0 +1,25 @@
+from pathlib import Path
+
+from benchmarks.harness import Measurement, measure, save_results, load_results, compare
+
+
+def test_measure():
+    m = measure("sum", sum, [[1, 2], [3]], calls=50, warmup=0)
+    assert m.name == "sum"
+    assert m.calls == 50
+    assert 0 < m.p50_us <= m.p99_us
+    assert m.ops_per_sec > 0
+
+
+def test_compare_with_baseline(tmp_path: Path):
+    baseline = [Measurement("a", 1000, 1.0, 2.0, 100), Measurement("b", 1000, 1.0, 2.0, 100)]
+    path = str(tmp_path / 'baseline.json')
+    save_results(path, baseline)
+    assert load_results(path) == baseline
+
+    results = [Measurement("a", 900, 1.1, 5.0, 100),
+               Measurement("b", 500, 2.0, 4.0, 100),
+               Measurement("c", 1, 1000.0, 1000.0, 100)]
+    regressions = compare(results, baseline, tolerance=0.25)
+    assert [r.name for r in regressions] == ["b"]
+    assert regressions[0].slowdown == 1.0
@@ -0,0 +1,65 @@
+import asyncio
+import threading
+from pathlib import Path
+
+from aiohttp import web
+
+from strconv import currates
+from strconv.currates import fetch
+from strconv.currates.extractors import field, iso_date
+
+from . import test_fiat
+
+
+async def serve_and_update(sources_factory, handlers):
+    app = web.Application()
+    for path, handler in handlers.items():
+        app.router.add_get(path, handler)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, '127.0.0.1', 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    try:
+        await currates.update_rates_async(sources_factory(f"http://127.0.0.1:{port}"))
+    finally:
+        await runner.cleanup()
+
+
+def test_update_rates_async(tmp_path: Path, monkeypatch):
+    currates._mock_database(str(tmp_path / 'currates.db'))
+    monkeypatch.setattr(fetch, '_RETRY_DELAY', 0)
+    attempts = []
+
+    async def flaky(_):
+        attempts.append(1)
+        if len(attempts) < 2:
+            return web.Response(status=503)
+        return web.Response(text=test_fiat.mock_source_json)
+
+    async def broken(_):
+        return web.Response(status=500)
+
+    def sources(base_url):
+        return [
+            currates.DataSource('flaky', f"{base_url}/flaky", field('success'), field('rates'), iso_date('date')),
+            currates.DataSource('broken', f"{base_url}/broken", field('success'), field('rates'), iso_date('date')),
+        ]
+
+    saving_threads = []
+    save = currates.SnapshotStore.save
+
+    def recording_save(self, *args):
+        saving_threads.append(threading.current_thread())
+        return save(self, *args)
+    monkeypatch.setattr(currates.SnapshotStore, 'save', recording_save)
+
+    version = currates.rates_version()
+    asyncio.run(serve_and_update(sources, {'/flaky': flaky, '/broken': broken}))
+
+    # the snapshot is written off the event loop
+    assert saving_threads and threading.main_thread() not in saving_threads
+    assert len(attempts) == 2
+    assert currates.rates_version() != version
+    res, to_curr = currates.convert("USD", "RUB", 1.0, lang_code="")
+    assert f"{res:.2f}" == f"{test_fiat.mock_rub:.2f}"
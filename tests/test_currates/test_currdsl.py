@@ -0,0 +1,32 @@
+import pytest
+
+from strconv.currates.currdsl import Currency, CurrencyIndex, InEnglish, InRussian
+from examples.currates_conf import CURRENCIES_MAPPING
+
+
+def linear_lookup(s: str):
+    mappings = (m.clone() for m in CURRENCIES_MAPPING)
+    return next((m for m in mappings if m.matches(s)), None)
+
+
+@pytest.mark.parametrize("s", ["RUB", "rur", "₽", "руб.", "р", "ruble", "rubles", "рубль", "рублей", "USD", "$",
+                               "dollar", "долларов", "euro", "евро", "₿", "биткоинов", "Rs", "£", "₪", "usd", "foo"])
+def test_index_is_equivalent_to_linear_matching(s):
+    expected = linear_lookup(s)
+    match = CurrencyIndex(CURRENCIES_MAPPING).lookup(s)
+    if expected is None:
+        assert match is None
+    else:
+        assert match.code == expected.code
+        for num in (1, 2, 5, 11, 21.5):
+            assert match.resolve_declension(num) == expected.resolve_declension(num)
+
+
+def test_first_definition_wins():
+    index = CurrencyIndex([
+        Currency('AAA', words=[InRussian('рубл', ('ь', 'я', 'ей'))]),
+        Currency('BBB', 'рубли', words=[InEnglish('рубл')]),
+    ])
+    assert index.lookup("рубли").code == 'AAA'
+    assert index.lookup("рублs").code == 'AAA'
+    assert index.lookup("BBB").code == 'BBB'
@@ -1,4 +1,5 @@
 import datetime
+import pytest
 from strconv import currates
 from strconv.currates.extractors import field, iso_date
 from pathlib import Path
@@ -46,3 +47,27 @@ def test_convert(tmp_path: Path, requests_mock):
     res, to_curr = currates.convert("доллар", "рубли", 1.0, lang_code="")
     assert f"{res:.2f}" == "73.20"
     assert to_curr == "рублей"
+
+
+def test_snapshot_is_loaded_from_file(tmp_path: Path, requests_mock):
+    currates._mock_database(str(tmp_path / 'currates.db'))
+    requests_mock.get(mock_source.url, text=mock_source_json)
+    currates.update_rates([mock_source])
+    version = currates.rates_version()
+
+    currates._mock_database(str(tmp_path / 'currates.db'))
+    assert currates.rates_version() > version
+    res, _ = currates.convert("USD", "EUR", 1.0, lang_code="")
+    assert res == mock_eur
+
+
+def test_empty_rates_are_not_fetched_on_demand(tmp_path: Path, requests_mock):
+    currates._mock_database(str(tmp_path / 'currates.db'))
+    requests_mock.get(mock_source.url, text=mock_source_json)
+    currates.update_rates([mock_source])
+
+    currates._mock_database(str(tmp_path / 'empty'))
+    assert not currates.currency_exists("USD", "")
+    with pytest.raises(currates.UnsupportedCurrency):
+        currates.convert("USD", "EUR", 1.0, lang_code="")
+    assert requests_mock.call_count == 1
@@ -0,0 +1,143 @@
+import datetime
+import os
+import pickle
+from pathlib import Path
+
+import pytest
+from strconv import currates
+from strconv.currates.snapshots import MappedRates, SnapshotFormatError, SnapshotStore, write_snapshot
+from strconv.currates.types import RatesSnapshot
+
+from tests.test_currates.test_fiat import mock_eur, mock_rub
+
+rates = {"USD": 1.0, "RUB": mock_rub, "EUR": mock_eur}
+
+
+def test_round_trip(tmp_path: Path):
+    path = str(tmp_path / 'test.rates')
+    write_snapshot(path, rates | {"X" * 17: 1.0}, "2025-01-01")
+
+    snapshot = MappedRates(path)
+    assert dict(snapshot) == rates
+    assert len(snapshot) == 3
+    assert snapshot["RUB"] == mock_rub
+    assert "GBP" not in snapshot
+    assert snapshot.get("GBP") is None
+    assert snapshot.date == "2025-01-01"
+    assert snapshot.created_at > 0
+
+
+def test_empty_snapshot(tmp_path: Path):
+    path = str(tmp_path / 'test.rates')
+    write_snapshot(path, {}, None)
+
+    snapshot = MappedRates(path)
+    assert len(snapshot) == 0
+    assert snapshot.date is None
+
+
+@pytest.mark.parametrize("corrupt", [lambda data: b'',
+                                     lambda data: data[:20],
+                                     lambda data: data[:-1],
+                                     lambda data: b'XXXX' + data[4:],
+                                     lambda data: data[:4] + b'\xff\x00' + data[6:]])
+def test_format_errors(tmp_path: Path, corrupt):
+    path = tmp_path / 'test.rates'
+    write_snapshot(str(path), rates, "2025-01-01")
+    path.write_bytes(corrupt(path.read_bytes()))
+
+    with pytest.raises(SnapshotFormatError):
+        MappedRates(str(path))
+
+
+def test_store(tmp_path: Path):
+    store = SnapshotStore(str(tmp_path / 'currates'))
+    assert store.days() == []
+    assert store.latest() is None
+
+    day1, day2 = datetime.date(2025, 1, 1), datetime.date(2025, 1, 2)
+    store.save(day2, rates, str(day2))
+    store.save(day1, {"USD": 1.0}, str(day1))
+    (tmp_path / 'currates' / 'README').touch()
+
+    assert store.days() == [day1, day2]
+    assert store.latest().date == str(day2)
+    assert dict(store.load(day1)) == {"USD": 1.0}
+    assert store.load(datetime.date(2024, 12, 31)) is None
+
+
+def test_store_skips_corrupt_snapshots(tmp_path: Path):
+    store = SnapshotStore(str(tmp_path))
+    day1, day2 = datetime.date(2025, 1, 1), datetime.date(2025, 1, 2)
+    store.save(day1, rates, str(day1))
+    Path(store.path_for(day2)).touch()
+
+    assert store.load(day2) is None
+    assert store.latest().date == str(day1)
+
+    Path(store.path_for(day1)).write_bytes(b'XXXX' * 10)
+    assert store.latest() is None
+
+
+def test_corrupt_snapshots_are_not_fatal(tmp_path: Path):
+    store = SnapshotStore(str(tmp_path))
+    day1, day2 = datetime.date(2025, 1, 1), datetime.date(2025, 1, 2)
+    store.save(day1, rates, str(day1))
+    Path(store.path_for(day2)).touch()
+    currates._mock_database(str(tmp_path))
+
+    assert currates.get_snapshot().date == str(day1)
+    with pytest.raises(currates.NoHistoricalRates):
+        currates.convert("USD", "EUR", 10.0, lang_code="", on_date=day2)
+
+
+def test_store_reopens_replaced_file(tmp_path: Path):
+    store = SnapshotStore(str(tmp_path))
+    day = datetime.date(2025, 1, 1)
+    first = store.save(day, rates, None)
+    assert store.load(day) is first
+
+    second = store.save(day, rates | {"CNY": 7.0}, str(day))
+    assert store.load(day) is second
+    assert "CNY" not in first
+    assert second["CNY"] == 7.0
+
+
+def test_snapshot_is_picklable(tmp_path: Path):
+    store = SnapshotStore(str(tmp_path))
+    snapshot = RatesSnapshot(1, "2025-01-01", store.save(datetime.date(2025, 1, 1), rates, "2025-01-01"))
+
+    restored = pickle.loads(pickle.dumps(snapshot))
+    assert restored.rates == rates
+    assert restored.date == snapshot.date
+
+
+def test_convert_on_date(tmp_path: Path):
+    day = datetime.date(2025, 1, 1)
+    SnapshotStore(str(tmp_path)).save(day, rates | {"EUR": 0.5}, str(day))
+    currates._mock_database(str(tmp_path))
+
+    res, to_curr = currates.convert("USD", "EUR", 10.0, lang_code="", on_date=day)
+    assert res == 5.0
+    assert to_curr == "EUR"
+
+    with pytest.raises(currates.NoHistoricalRates):
+        currates.convert("USD", "EUR", 10.0, lang_code="", on_date=datetime.date(2024, 12, 31))
+
+
+def test_import_legacy_database(tmp_path: Path):
+    import dbm
+    db_path = str(tmp_path / 'currates.db')
+    with dbm.open(db_path, 'c') as db:
+        db['date'] = "2025-01-01"
+        db['USD'] = "1.0"
+        db['EUR'] = str(mock_eur)
+    snapshots_path = str(tmp_path / 'currates')
+    currates._mock_database(snapshots_path)
+
+    currates._import_legacy_database(db_path)
+    currates._mock_database(snapshots_path)
+    assert os.listdir(snapshots_path) == ['2025-01-01.rates']
+    assert currates.get_snapshot().date == "2025-01-01"
+    res, _ = currates.convert("USD", "EUR", 1.0, lang_code="")
+    assert res == mock_eur
@@ -1,3 +1,11 @@
+import asyncio
+import logging
+import sqlite3
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
 import msgdb
 
 
@@ -6,3 +14,144 @@ def test_database(tmpdir):
     rowid = msgdb.insert("Hello World")
     assert rowid == 1
     assert msgdb.select(rowid) == "Hello World"
+
+
+def test_write_behind(tmpdir):
+    msgdb._mock_database(str(tmpdir.join('messages.db')))
+    msgdb.insert("Hello World")
+    msgdb.enable_write_behind(commit_interval=0.001)
+    rowids = [msgdb.insert(f"message {i}") for i in range(100)]
+    assert rowids == list(range(2, 102))
+    assert msgdb.select(rowids[-1]) == "message 99"
+    msgdb.shutdown()
+
+    msgdb._mock_database(str(tmpdir.join('messages.db')))
+    assert msgdb.select(1) == "Hello World"
+    assert msgdb.select("101") == "message 99"
+
+
+def test_failed_commit_is_retried(tmpdir):
+    path = str(tmpdir.join('messages.db'))
+    msgdb._mock_database(path)
+    writer = msgdb._WriteBehindWriter(path, 0, commit_interval=0.001)
+    rowid = writer.insert("Hello World", msgdb._digest("Hello World"), int(time.time()))
+    batch = [writer._queue.get()]
+
+    closed_db = sqlite3.connect(path)
+    closed_db.close()
+    assert not writer._commit(closed_db, batch)
+    assert writer.get_pending(rowid) == "Hello World"
+
+    db = sqlite3.connect(path)
+    assert writer._commit(db, batch)
+    db.close()
+    assert writer.get_pending(rowid) is None
+    assert msgdb.select(rowid) == "Hello World"
+
+
+def test_message_saved_by_another_process(tmpdir):
+    path = str(tmpdir.join('messages.db'))
+    msgdb._mock_database(path)
+    writer = msgdb._WriteBehindWriter(path, 1, commit_interval=0.001)
+    rowid = writer.insert("Hello World", msgdb._digest("Hello World"), int(time.time()))
+    assert msgdb.insert("Hello World") == 1
+
+    db = sqlite3.connect(path)
+    assert writer._commit(db, [writer._queue.get()])
+    db.close()
+    # the id was handed out by the writer, so it must point to the message anyway
+    assert msgdb.select(rowid) == "Hello World"
+    assert msgdb.insert("Hello World") == 1
+
+
+def test_rowid_taken_by_another_connection(tmpdir, caplog):
+    path = str(tmpdir.join('messages.db'))
+    msgdb._mock_database(path)
+    writer = msgdb._WriteBehindWriter(path, 0, commit_interval=0.001)
+    rowid = writer.insert("Hello World", msgdb._digest("Hello World"), int(time.time()))
+
+    # a process that ignores the lock takes the same id in the meantime
+    other_db = sqlite3.connect(path)
+    other_db.execute("INSERT INTO Messages(message, created_at) VALUES (?, ?)", ["Foreign", int(time.time())])
+    other_db.commit()
+    other_db.close()
+
+    db = sqlite3.connect(path)
+    with caplog.at_level(logging.ERROR, logger=msgdb.__name__):
+        assert writer._commit(db, [writer._queue.get()])
+    db.close()
+    assert f"The id {rowid} was taken by another connection" in caplog.text
+    assert msgdb.select(rowid) == "Foreign"
+
+
+@pytest.mark.skipif(msgdb.fcntl is None, reason="file locks are not supported")
+def test_write_behind_is_exclusive(tmpdir):
+    path = str(tmpdir.join('messages.db'))
+    msgdb._mock_database(path)
+    msgdb.enable_write_behind(commit_interval=0.001)
+    # the locks are bound to open files, so another process can be imitated within this one
+    with pytest.raises(msgdb.DatabaseLockedError):
+        msgdb._lock(path, exclusive=True)
+    with pytest.raises(msgdb.DatabaseLockedError):
+        msgdb._lock(path, exclusive=False)
+    msgdb.shutdown()
+
+    lock_file = msgdb._lock(path, exclusive=True)
+    with pytest.raises(msgdb.DatabaseLockedError):
+        msgdb.insert("Hello World")
+    with pytest.raises(msgdb.DatabaseLockedError):
+        msgdb.enable_write_behind()
+    lock_file.close()
+    assert msgdb.insert("Hello World") == 1
+
+
+def test_deduplication(tmpdir):
+    msgdb._mock_database(str(tmpdir.join('messages.db')))
+    rowid = msgdb.insert("Hello World")
+    assert msgdb.insert("Hello World") == rowid
+    assert msgdb.insert("Hello") != rowid
+
+    msgdb.enable_write_behind(commit_interval=0.001)
+    assert msgdb.insert("Hello World") == rowid
+    new_rowid = msgdb.insert("Bye")
+    assert msgdb.insert("Bye") == new_rowid
+    msgdb.shutdown()
+    assert msgdb.insert("Bye") == new_rowid
+
+
+def test_prune(tmpdir):
+    msgdb._mock_database(str(tmpdir.join('messages.db')))
+    old_rowids = [msgdb.insert(f"old {i}") for i in range(5)]
+    now = int(time.time()) + 100
+    assert msgdb.prune(ttl=50, now=now, batch_size=2) == 2
+    assert msgdb.prune(ttl=50, now=now) == 2
+    # the last row is kept to prevent reuse of its id
+    assert msgdb.prune(ttl=50, now=now) == 0
+    assert [msgdb.select(x) for x in old_rowids] == [None, None, None, None, "old 4"]
+    assert msgdb.insert("new") == old_rowids[-1] + 1
+
+
+def test_migration(tmpdir):
+    path = str(tmpdir.join('messages.db'))
+    db = sqlite3.connect(path)
+    db.execute("CREATE TABLE Messages(message TEXT NOT NULL)")
+    db.executemany("INSERT INTO Messages(message) VALUES (?)", [("old 1",), ("old 2",)])
+    db.commit()
+    db.close()
+
+    msgdb._mock_database(path)
+    assert msgdb.prune(ttl=50) == 0
+    assert [msgdb.select(x) for x in (1, 2)] == ["old 1", "old 2"]
+
+    db = sqlite3.connect(path)
+    assert db.execute("PRAGMA auto_vacuum").fetchone()[0] == msgdb._AUTO_VACUUM_INCREMENTAL
+    db.close()
+
+
+def test_concurrent_inserts(tmpdir):
+    msgdb._mock_database(str(tmpdir.join('messages.db')))
+    with ThreadPoolExecutor(8) as executor:
+        rowids = list(executor.map(msgdb.insert, ["Hello World"] * 50 + [f"message {i}" for i in range(50)]))
+    assert len(set(rowids[:50])) == 1
+    assert len(set(rowids)) == 51
+    assert asyncio.run(msgdb.select_async(rowids[0])) == "Hello World"
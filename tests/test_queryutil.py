@@ -1,3 +1,7 @@
+import json
+
+import pytest
+
 from queryutil import *
 
 
@@ -52,3 +56,28 @@ def test_add_article_to():
         }
     }]
     assert a.build_list() == e
+
+
+def test_build_json():
+    a = InlineQueryResultsBuilder()
+    add_article = get_articles_generator_for(a)
+    keyboard = InlineKeyboardBuilder()
+    keyboard.add_row().add("Decrypt", callback_data="1")
+    add_article("foo", "тест \"1\"\n", article_id="foo", reply_markup=RawJSON(json_serialize(keyboard.build())))
+    add_article("bar", "<b>test</b>", parse_mode="HTML", reply_markup=keyboard.build())
+    a.add(type='photo', photo_url="http://example.org/")
+    serialized = a.build_json()
+    assert json_serialize(serialized) is serialized
+    assert json.loads(serialized) == a.build_list()
+    assert a.build_list()[0]['reply_markup'] == keyboard.build()
+
+
+def test_empty_results_are_rejected():
+    a = InlineQueryResultsBuilder()
+    add_article = get_articles_generator_for(a)
+    add_article("foo", "")
+    a.add(type='article', input_message_content={'message_text': ""})
+    add_article("bar", "bar")
+    assert [x['id'] for x in a.build_list()] == ['0']
+    with pytest.raises(ValueError):
+        InlineQueryResultArticle("0", "foo", "", "")
@@ -0,0 +1,13 @@
+from startup import StartupProfile
+
+
+def test_startup_profile():
+    ticks = iter([1.0, 1.5, 3.5])
+    profile = StartupProfile(started_at=0.5, clock=lambda: next(ticks))
+    assert profile.mark("imports") == 0.5
+    assert profile.mark("processors") == 0.5
+    assert profile.mark("webhook") == 2.0
+    assert profile.phases == [("imports", 0.5), ("processors", 0.5), ("webhook", 2.0)]
+    assert profile.total == 3.0
+    report = profile.report()
+    assert "webhook" in report and "66.7%" in report and "3000.0 ms" in report
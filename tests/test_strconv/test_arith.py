@@ -0,0 +1,40 @@
+import pytest
+
+from strconv.util.arith import evaluate, EvaluationError, CostLimitExceeded
+
+
+@pytest.mark.parametrize("expr,res", [("2*2", 4),
+                                      ("(2+2)*2", 8),
+                                      ("10/3", 10/3),
+                                      ("7//2", 3),
+                                      ("-7%3", 2),
+                                      ("-2**2", -4),
+                                      ("2**-1", 0.5),
+                                      ("0.5**5000", 0.0),
+                                      ("2**-5000", 0.0),
+                                      ("2**1022+(2**1022-1)", 2**1023 - 1),
+                                      ("2**1023", 2**1023),
+                                      ("2**1023*1.5", 2**1023 * 1.5),
+                                      ("10**308*1.5", 1.5e308),
+                                      ("2.0**1023.5", 2.0**1023.5),
+                                      ("1.5**1750", 1.5**1750),
+                                      ("2^3", 1),
+                                      ("007 + 0.5", 7.5),
+                                      (" 1 + 1 ", 2)])
+def test_evaluate(expr, res):
+    assert evaluate(expr) == res
+
+
+@pytest.mark.parametrize("expr", ["1/0", "2+", "()", "2 ^ 3.5", "__import__('os')", "(1).real", "2(3)",
+                                  "(-8)**0.5", "(-8)**0.5*0", "1e308*10", "1e308*10-1e308*10",
+                                  "10**308*10.0", "2.0**1024", "1.5**2000", "0.5**-5000"])
+def test_invalid(expr):
+    with pytest.raises(EvaluationError):
+        evaluate(expr)
+
+
+@pytest.mark.parametrize("expr", ["9**9**9", "2**2000", "10**200*10**200", "(-3)**9999",
+                                  "2**1024", "2**1023+(2**1023-1)"])
+def test_cost_limit(expr):
+    with pytest.raises(CostLimitExceeded):
+        evaluate(expr)
@@ -9,3 +9,10 @@ def test_processor():
     processor = BannerMaker()
     assert processor.process("hello world") == "<code>H E L L O   W O R L D</code>"
     assert processor.get_description("hello world") == "H E L L O   W O R L D"
+
+
+def test_result():
+    result = BannerMaker().get_result("<b>")
+    assert result.text == "<code>&lt; B &gt;</code>"
+    assert result.description == "< B >"
+    assert result.parse_mode == "HTML"
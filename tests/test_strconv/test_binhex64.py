@@ -69,3 +69,36 @@ class TestBase64:
 
     def test_fails(self):
         assert base64_to_str(self.f) is None
+
+
+class TestBytesKernels:
+    data = "Привет, мир! Hello World".encode() * 200
+
+    def test_all_bytes(self):
+        data = bytes(range(256))
+        assert bytes_to_bin(data) == " ".join(f"{n:08b}" for n in data)
+        assert bin_to_bytes(bytes_to_bin(data)) == data
+        assert hex_to_bytes(bytes_to_hex(data)) == data
+        assert base64_to_bytes(bytes_to_base64(data)) == data
+
+    def test_memoryview(self):
+        view = memoryview(self.data)[13:-13]
+        expected = bytes(view)
+        assert bin_to_bytes(bytes_to_bin(view)) == expected
+        assert hex_to_bytes(bytes_to_hex(view)) == expected
+        assert base64_to_bytes(bytes_to_base64(view)) == expected
+        assert bytes_to_bin(bytearray(expected)) == bytes_to_bin(expected)
+
+    def test_empty(self):
+        assert bytes_to_bin(b"") == ""
+        assert bin_to_bytes("") == b""
+        assert bytes_to_hex(b"") == ""
+
+    def test_bin_whitespace(self):
+        assert bin_to_bytes("0100\n1000\t01101001") == b"Hi"
+
+    def test_bin_fails(self):
+        assert bin_to_bytes("0100100") is None
+        assert bin_to_bytes("01001002") is None
+        assert bin_to_bytes("0100_1000") is None
+        assert bin_to_bytes("０1001000") is None
@@ -1,7 +1,9 @@
+import datetime
 import pytest
 from pathlib import Path
 from strconv import currates
-from strconv.calc import Calculator
+from strconv.calc import Calculator, Expression, find_substitutions, parse_expression
+from txtproc.pool import ProcessorPool
 
 from tests.test_currates.test_fiat import mock_source, mock_source_json
 
@@ -35,3 +37,66 @@ def test_can_process(calc):
                                       ("{{ 1 usd }}", "6.83 CNY")])
 def test_process(calc, expr, res):
     assert calc.process(expr, lang_code="zh") == res
+
+
+@pytest.mark.parametrize("expr", ["{{(-8)**0.5}}", "{{2**1023+(2**1023-1)}}", "{{1.5**1000*1.5**1000}}"])
+def test_not_real_numbers(calc, expr):
+    assert calc.process(expr) == ""
+
+
+def test_process_on_date(calc):
+    today = datetime.datetime.utcnow().date()
+    assert calc.process(f"{{{{ 10 usd to rub @{today} }}}}", lang_code="en") == "732.01 RUB"
+    assert calc.process("{{ 10 usd to rub @2000-01-01 }}", lang_code="en") == ""
+
+
+@pytest.mark.parametrize("text,expression", [("2*2", Expression("2*2", None, None)),
+                                             (" (2+2)*2 ", Expression("(2+2)*2", None, None)),
+                                             ("2+2*2 EUR to USD", Expression("2+2*2", "EUR", "USD")),
+                                             ("9.85 ¥ > ₽", Expression("9.85", "¥", "₽")),
+                                             (" 10 долларов в рубли ", Expression("10", "долларов", "рубли")),
+                                             ("10 USD>EUR", Expression("10", "USD", "EUR")),
+                                             ("5 руб.", Expression("5", "руб.", None)),
+                                             ("usd", Expression("1", "usd", None)),
+                                             ("", None),
+                                             ("   ", None),
+                                             ("foo bar baz", None),
+                                             ("2 ab", None),
+                                             ("2 usd to", Expression("2", "usd", None)),
+                                             ("100 usd to rub @2025-01-01",
+                                              Expression("100", "usd", "rub", datetime.date(2025, 1, 1))),
+                                             ("eur@ 2025-01-01 ", Expression("1", "eur", None, datetime.date(2025, 1, 1))),
+                                             ("2 @2025-01-01", None),
+                                             ("usd @2025-13-01", None),
+                                             ("usd @20250101", None)])
+def test_parse_expression(text, expression):
+    assert parse_expression(text) == expression
+
+
+def test_find_substitutions():
+    query = "{{{2}}} {{ {{1}} }} {{fo}} }} {{3 usd}}"
+    assert [query[s.start:s.end] for s in find_substitutions(query)] == ["{{2}}", "{{1}}", "{{3 usd}}"]
+
+
+@pytest.mark.parametrize("query", ["{{" * 5000,
+                                   "{{" + " " * 5000,
+                                   "{{1" + " " * 5000 + "x}}",
+                                   "}}" * 5000])
+def test_adversarial_input(calc, query):
+    # would take ages with a backtracking regex
+    assert not calc.can_process(query)
+
+
+def test_max_substitutions(calc):
+    query = "{{1}}" * 101
+    assert calc.process(query) == "1" * 100 + "{{1}}"
+
+
+def test_in_processor_pool(calc):
+    pool = ProcessorPool(processes=1, timeout=10.0, initializer=currates.install_snapshot,
+                         initargs_func=lambda: (currates.get_snapshot(),))
+    try:
+        [result] = pool.collect([pool.submit(calc, "foo {{9.85 ¥ > ₽}} bar", "zh")])
+    finally:
+        pool.shutdown()
+    assert result.text == "foo ₽105.63 bar"
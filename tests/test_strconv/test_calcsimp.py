@@ -33,3 +33,8 @@ def test_can_process(calc):
                                       ("euro", "78.10 RUB")])
 def test_process(calc, expr, res):
     assert calc.process(expr, lang_code="ru") == res
+
+
+@pytest.mark.parametrize("expr", ["(-8)**0.5", "2**1023+(2**1023-1)", "1.5**1000*1.5**1000"])
+def test_not_real_numbers(calc, expr):
+    assert calc.process(expr) == ""
@@ -0,0 +1,53 @@
+import pytest
+
+from strconv.util.layouts import *
+
+
+@pytest.fixture(scope='module')
+def registry() -> LayoutRegistry:
+    return LayoutRegistry(DEFAULT_LAYOUTS)
+
+
+@pytest.mark.parametrize("text, lang_code, expected", [
+    ("ghbdtn vbh", "", "привет мир"),
+    ("ghbdtn vbh", "ru", "привет мир"),
+    ("ghbdsn cdsn", "uk", "привіт світ"),
+    ("ghsdbnfyyt", "be", "прывітанне"),
+    ("руддщ цщкдв", "", "hello world"),
+    ("рфддщ", "de", "hallo"),
+    ("привіт", "", "ghbdsn"),
+    ("ü", "", "х"),
+    ("", "", ""),
+    ("123 !", "", "123 !"),
+])
+def test_switch(registry, text, lang_code, expected):
+    assert registry.switch(text, lang_code) == expected
+
+
+def test_words_are_switched_independently(registry):
+    assert registry.switch("ghbdtn мир\nhello") == "привет vbh\nруддщ"
+    assert registry.switch("привіт ghbdsn", "uk") == "ghbdsn привіт"
+
+
+def test_ties_follow_layout_of_text(registry):
+    # 'y' and 'z' are swapped in the German layout
+    assert registry.switch("yes") == "нуы"
+    assert registry.switch("ü yes") == "х яуы"
+
+
+def test_detect(registry):
+    assert registry.detect("привіт") is UA
+    assert registry.detect("привет") is RU
+    assert registry.detect("hello") is EN
+    assert registry.detect("123") is None
+
+
+def test_register_invalid_layouts():
+    registry = LayoutRegistry([EN])
+    with pytest.raises(ValueError):
+        registry.register(EN)
+    with pytest.raises(ValueError):
+        registry.register(Layout('XX', 'latin', "abc", ()))
+    with pytest.raises(ValueError):
+        registry.register(Layout('XX', 'latin', " " + KEYS[1:], ()))
+    assert registry.layouts == (EN,)
@@ -0,0 +1,23 @@
+import pytest
+
+from strconv.util.markup import render, spaced_text, Rendered
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("hello world", "h e l l o   w o r l d"),
+    ("привет мир", "п р и в е т   м и р"),
+    ("a😀b", "a 😀 b"),
+    ("a\ud800", "a \ud800"),
+    ("trailing  \n", "t r a i l i n g"),
+    ("x", "x"),
+    ("", ""),
+])
+def test_spaced_text(text, expected):
+    assert spaced_text(text) == expected
+
+
+def test_render():
+    assert render("<b>") == Rendered("&lt;b&gt;", "<b>")
+    assert render("<b>", upper=True, spaced=True, tag='code') == Rendered("<code>&lt; B &gt;</code>", "< B >")
+    # upper case is applied after spacing, so expanded characters stay together
+    assert render("ß", upper=True, spaced=True).plain == "SS"
@@ -1,5 +1,8 @@
+import re
 import pytest
-from strconv.typographer import TypographerConverter
+from strconv.typographer import TypographerConverter, ReplacementTable, _first_chars
+from txtproc import features
+from txtproc.features import Feature, extract_features
 
 
 @pytest.fixture
@@ -35,3 +38,52 @@ def test_converter(converter):
     assert converter.process("(C) Kozalo.Ru") == "© Kozalo.Ru"
     assert converter.process("Kozalo(тм)") == "Kozalo™"    # just for testing purposes, there is no actual registration
     assert converter.process("(r)") == "®"
+
+
+def test_rules_are_applied_in_one_pass(converter):
+    # every replacement sees the original text, not the result of the previous rules
+    assert converter.process("<<-->>") == "«—»"
+    assert converter.process("a <-- b") == "a ←- b"
+
+
+def test_locale_rules(monkeypatch):
+    monkeypatch.setattr(TypographerConverter, 'replacements', list(TypographerConverter.replacements))
+    monkeypatch.setattr(TypographerConverter, 'locale_replacements', {})
+    monkeypatch.setattr(TypographerConverter, '_tables', {})
+    monkeypatch.setattr(features, '_typographic_chars', features._typographic_chars)
+    TypographerConverter.add_rule(r'"([^"]*)"', r"„\1“", lang_code="de")
+    TypographerConverter.add_rule("1/2", "½")
+    converter = TypographerConverter()
+
+    assert converter.can_process("1/2 cup", lang_code="en")
+    assert converter.process("1/2 cup", lang_code="en") == "½ cup"
+    assert not converter.can_process('"Hallo"', lang_code="en")
+    assert converter.process('"Hallo" "Welt"', lang_code="de") == "„Hallo“ „Welt“"
+    assert converter.process('"Hallo" -> 1/2', lang_code="de-AT") == "„Hallo“ → ½"
+    assert extract_features("1/2") & Feature.TYPOGRAPHIC_CHARS
+
+
+@pytest.mark.parametrize("pattern,expected_chars", [
+    ("<<", {'<'}),
+    (r"\.{3}", {'.'}),
+    (r"\([cс]\)", {'('}),
+    (r"(?:--|~)=?", {'-', '~'}),
+    (r"\s*->", None),          # may begin with any whitespace character
+    (r"x?->", None),            # a letter under IGNORECASE
+    (r"1/2|[0-9]+%", set("0123456789")),
+    (r"-*", None),              # matches the empty string
+])
+def test_first_chars(pattern, expected_chars):
+    chars = _first_chars(pattern, re.IGNORECASE)
+    assert chars == (frozenset(expected_chars) if expected_chars is not None else None)
+
+
+def test_first_chars_of_table():
+    assert ReplacementTable([("<<", "«"), (r"\.{3}", "…")]).first_chars == {'<', '.'}
+    assert ReplacementTable([("<<", "«"), ("a", "b")]).first_chars is None
+
+
+def test_prefilter(converter):
+    assert not extract_features("hello world") & TypographerConverter.required_features
+    assert extract_features("a -> b") & TypographerConverter.required_features
+    assert extract_features("(C) Kozalo.Ru") & TypographerConverter.required_features
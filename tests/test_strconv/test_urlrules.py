@@ -0,0 +1,80 @@
+import os
+
+import pytest
+
+from strconv.util.urlrules import Rule, Ruleset, RulesetFile
+
+RULES = [
+    Rule('youtube', params=frozenset({'si', 'feature'}), domains=frozenset({'youtube.com'})),
+    Rule('utm', prefixes=('utm_',)),
+    Rule('facebook', params=frozenset({'fbclid'})),
+    Rule('matomo', prefixes=('pk_', 'mtm_')),
+]
+
+
+@pytest.fixture(scope='module')
+def ruleset() -> Ruleset:
+    return Ruleset(RULES)
+
+
+@pytest.mark.parametrize("host, query, expected, stripped", [
+    ("example.com", "id=1&utm_source=foo&utm_medium=bar", "id=1", {'utm': 2}),
+    ("example.com", "fbclid=1&pk_campaign=2&mtm_kwd=3", "", {'facebook': 1, 'matomo': 2}),
+    ("example.com", "si=1&feature=share", "si=1&feature=share", {}),
+    ("www.youtube.com", "v=123&si=1&feature=share", "v=123", {'youtube': 2}),
+    ("YouTube.com", "si=1", "", {'youtube': 1}),
+    ("notyoutube.com", "si=1", "si=1", {}),
+    ("example.com", "utm=1&utm_=2&q=a%26b&empty=&flag", "utm=1&q=a%26b&empty=&flag", {'utm': 1}),
+    ("example.com", "utm%5Fsource=1", "", {'utm': 1}),
+    ("example.com", "a=1&&utm_=2&", "a=1", {'utm': 1}),
+    ("example.com", "a=1&&b=2", "a=1&&b=2", {}),
+    ("example.com", "", "", {}),
+])
+def test_clean_query(ruleset, host, query, expected, stripped):
+    assert ruleset.clean_query(host, query) == (expected, stripped)
+
+
+def test_from_json():
+    ruleset = Ruleset.from_json('{"rules": [{"name": "gclid", "params": ["gclid"], "domains": ["Example.com"]}]}')
+    assert ruleset.rules == (Rule('gclid', frozenset({'gclid'}), (), frozenset({'example.com'})),)
+    with pytest.raises(ValueError):
+        Ruleset.from_json('{"rules": [{"name": "typo", "param": ["gclid"]}]}')
+    with pytest.raises(ValueError):
+        Ruleset.from_json('{"rules": [{"name": "youtube", "params": "si"}]}')
+    with pytest.raises(ValueError):
+        Ruleset.from_json('{"rules": [{"name": "utm", "prefixes": [1]}]}')
+
+
+def test_ruleset_file_reload(tmp_path):
+    path = tmp_path / "rules.json"
+    path.write_text('{"rules": [{"name": "utm", "prefixes": ["utm_"]}]}')
+    rules_file = RulesetFile(str(path), check_interval=0)
+    ruleset = rules_file.get()
+    assert ruleset.clean_query("example.com", "utm_id=1&fbclid=2") == ("fbclid=2", {'utm': 1})
+    assert rules_file.get() is ruleset
+
+    path.write_text('{"rules": [{"name": "facebook", "params": ["fbclid"]}]}')
+    os.utime(path, ns=(0, os.stat(path).st_mtime_ns + 10**9))
+    assert rules_file.get().clean_query("example.com", "utm_id=1&fbclid=2") == ("utm_id=1", {'facebook': 1})
+
+    # a broken file doesn't replace the working ruleset
+    ruleset = rules_file.get()
+    path.write_text('{"rules": [')
+    os.utime(path, ns=(0, os.stat(path).st_mtime_ns + 2 * 10**9))
+    assert rules_file.get() is ruleset
+
+
+def test_ruleset_file_override(tmp_path):
+    default_path, override_path = tmp_path / "default.json", tmp_path / "override.json"
+    default_path.write_text('{"rules": [{"name": "utm", "prefixes": ["utm_"]}]}')
+    rules_file = RulesetFile(str(override_path), str(default_path), check_interval=0)
+    assert rules_file.get().clean_query("example.com", "utm_id=1&fbclid=2") == ("fbclid=2", {'utm': 1})
+    assert rules_file.path == str(default_path)
+
+    # the file overriding the default one is picked up as soon as it appears
+    override_path.write_text('{"rules": [{"name": "facebook", "params": ["fbclid"]}]}')
+    assert rules_file.get().clean_query("example.com", "utm_id=1&fbclid=2") == ("utm_id=1", {'facebook': 1})
+    assert rules_file.path == str(override_path)
+
+    override_path.unlink()
+    assert rules_file.get().clean_query("example.com", "utm_id=1&fbclid=2") == ("fbclid=2", {'utm': 1})
@@ -1,10 +1,16 @@
+import threading
+import time
 import pytest
 from typing import *
 
 import strconv
 import strconv.binhex64 as binhex64
 import strconv.langlayout as langlayout
-from txtproc import TextProcessorsLoader, TextProcessor
+import strconv.typographer    # sets the characters of Feature.TYPOGRAPHIC_CHARS
+import strconv.url as url
+from txtproc import TextProcessorsLoader, TextProcessor, ProcessResult
+from txtproc.features import Feature, extract_features
+from txtproc.pool import ProcessorPool
 
 
 @pytest.fixture
@@ -40,6 +46,11 @@ def test_import_strconv(loader, simple_processors, exclusive_processors):
     assert all(ep in loader.exclusive_processors for ep in exclusive_processors)
 
 
+def test_find(loader):
+    assert loader.find('url_cleaner') is url.URLCleaner
+    assert loader.find('unknown') is None
+
+
 def test_matching_simple_processors(loader, simple_processors, exclusive_processors):
     processor_classes = {type(x) for x in loader.match_simple_processors("hello")}
     assert all(sp in processor_classes for sp in simple_processors)
@@ -77,3 +88,159 @@ def test_name_property(processor, expected_name):
 ])
 def test_snake_case_name_property(processor, expected_name):
     assert processor.snake_case_name == processor().snake_case_name == expected_name
+
+
+def test_default_result():
+    class CountingProcessor(TextProcessor):
+        calls = 0
+
+        @classmethod
+        def can_process(cls, query: str, lang_code: str = "") -> bool:
+            return True
+
+        def process(self, query: str, lang_code: str = "") -> str:
+            self.calls += 1
+            return query.upper()
+
+    processor = CountingProcessor()
+    assert processor.get_result("foo") == ProcessResult("FOO", "FOO", "")
+    assert processor.calls == 1
+
+
+@pytest.mark.parametrize("query,expected_features", [
+    ("", Feature(0)),
+    ("hello", Feature.NON_EMPTY | Feature.BASE64_ALPHABET),
+    ("01 10", Feature.NON_EMPTY | Feature.BINARY_ALPHABET | Feature.HEX_ALPHABET),
+    ("4f 6b", Feature.NON_EMPTY | Feature.HEX_ALPHABET),
+    ("foo {{2+2}} bar", Feature.NON_EMPTY | Feature.SUBSTITUTION),
+    ("a -> b", Feature.NON_EMPTY | Feature.TYPOGRAPHIC_CHARS),
+    ("https://test.domain", Feature.NON_EMPTY | Feature.TYPOGRAPHIC_CHARS | Feature.URL),
+])
+def test_extract_features(query, expected_features):
+    assert extract_features(query) == expected_features
+
+
+def test_features_do_not_filter_out_matching_processors(loader):
+    queries = ["hello", "01001000 01101001", "48 69", "SGk=", "{{2*2}}", "a -> b", "(c)", "https://сайт.рф", ""]
+    for query in queries:
+        features = extract_features(query)
+        for proc in loader.all_processors:
+            if proc.can_process(query):
+                assert features & proc.required_features == proc.required_features, (proc, query)
+
+
+def test_decoders_decode_query_once(loader, monkeypatch):
+    calls = []
+
+    def counting_hex_to_str(s):
+        calls.append(s)
+        return "Hello World"
+    monkeypatch.setattr(binhex64, 'hex_to_str', counting_hex_to_str)
+
+    query = '48 65 6c 6c 6f 20 57 6f 72 6c 64'
+    processors = [x for x in loader.match_exclusive_processors(query) if isinstance(x, binhex64.HexadecimalDecoder)]
+    assert processors[0].process(query) == "Hello World"
+    assert calls == [query]
+
+
+def test_match_observer(loader):
+    observed = []
+    processors = loader.match_simple_processors("hello", observer=lambda proc, seconds: observed.append(proc))
+    assert set(type(x) for x in processors) <= set(observed)
+    assert binhex64.BinaryEncoder in observed
+    assert url.URLEncoder not in observed    # filtered out by the features
+
+
+def test_metrics_sampling():
+    from prometheus_client import REGISTRY
+    from txtproc import metrics
+
+    with pytest.raises(ValueError):
+        metrics.set_sampling_rate(1.5)
+    metrics.set_sampling_rate(0.0)
+    assert not any(metrics.sampled() for _ in range(100))
+    metrics.set_sampling_rate(1.0)
+    assert metrics.sampled()
+
+    labels = {'processor': binhex64.BinaryEncoder.snake_case_name}
+    before = REGISTRY.get_sample_value('processor_process_seconds_count', labels) or 0
+    metrics.observe_process(binhex64.BinaryEncoder(), 0.001, 5, 44)
+    assert REGISTRY.get_sample_value('processor_process_seconds_count', labels) == before + 1
+    assert REGISTRY.get_sample_value('processor_output_length_chars_sum', labels) >= 44
+
+
+class SleepingProcessor(TextProcessor):
+    is_expensive = True
+
+    @classmethod
+    def can_process(cls, query: str, lang_code: str = "") -> bool:
+        return True
+
+    def process(self, query: str, lang_code: str = "") -> str:
+        time.sleep(float(query))
+        return query
+
+
+def test_processor_pool():
+    versions = [1]
+    pool = ProcessorPool(processes=2, timeout=0.5, version_func=lambda: versions[0])
+    try:
+        pending = [pool.submit(SleepingProcessor(), "0"), pool.submit(SleepingProcessor(), "10")]
+        results = pool.collect(pending)
+        assert results == [ProcessResult("0", "0"), None]
+
+        # the stuck worker was killed
+        assert pool.collect([pool.submit(SleepingProcessor(), "0.1")]) == [ProcessResult("0.1", "0.1")]
+
+        versions[0] = 2
+        assert pool.collect([pool.submit(binhex64.BinaryEncoder(), "a")]) == [ProcessResult("01100001", "01100001")]
+    finally:
+        pool.shutdown()
+
+
+def test_processor_pool_keeps_workers_of_other_queries():
+    pool = ProcessorPool(processes=2, timeout=2.0)
+    try:
+        assert pool.collect([pool.submit(SleepingProcessor(), "0")]) == [ProcessResult("0", "0")]
+        stuck = pool.submit(SleepingProcessor(), "10")
+        time.sleep(1.0)
+        # submitted by another query to the same workers before the first one misses its deadline
+        running = pool.submit(SleepingProcessor(), "1.5")
+        assert pool.collect([stuck]) == [None]
+        assert pool.collect([running]) == [ProcessResult("1.5", "1.5")]
+        # new queries are handled by fresh workers, while the stuck ones are killed
+        assert pool.collect([pool.submit(SleepingProcessor(), "0")]) == [ProcessResult("0", "0")]
+        assert not pool._retired
+    finally:
+        pool.shutdown()
+
+
+def test_processor_pool_starts_workers_without_lock():
+    pool = ProcessorPool(processes=1, timeout=2.0)
+    context = pool._context
+    starting = threading.Event()
+    release = threading.Event()
+
+    class SlowContext:
+        @staticmethod
+        def Pool(*args):
+            starting.set()
+            release.wait(2)
+            return context.Pool(*args)
+
+    pool._context = SlowContext()
+    results = []
+    submitter = threading.Thread(target=lambda: results.append(pool.collect([pool.submit(SleepingProcessor(), "0")])))
+    try:
+        submitter.start()
+        assert starting.wait(2)
+        # other queries may collect their results meanwhile
+        assert pool._lock.acquire(timeout=1)
+        pool._lock.release()
+        release.set()
+        submitter.join()
+        assert results == [[ProcessResult("0", "0")]]
+        assert pool._current is not None
+    finally:
+        release.set()
+        pool.shutdown()
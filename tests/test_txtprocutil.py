@@ -1,4 +1,5 @@
-from txtprocutil import collect_help_messages, divide_chunks
+import json
+from txtprocutil import collect_help_messages, divide_chunks, HelpCatalog
 from tests.test_txtproc import simple_processors    # import the fixture
 from klocmod import LocalizationsContainer
 
@@ -16,3 +17,18 @@ def test_divide_chunks():
     assert [[1, 2], [3, 4]] == list(divide_chunks([1, 2, 3, 4], 2))
     assert [[1]] == list(divide_chunks([1], 2))
     assert [] == list(divide_chunks([], 2))
+
+
+def test_help_catalog(simple_processors):
+    lang_cont = LocalizationsContainer.from_file("app/localizations.ini")
+    catalog = HelpCatalog(simple_processors)
+    en_help = catalog.get(lang_cont.get_lang('en'))
+    assert catalog.get(lang_cont.get_lang('en-US')) is en_help
+    assert catalog.get(lang_cont.get_lang('ru')) is not en_help
+
+    keyboard = json.loads(en_help.reply_markup)['inline_keyboard']
+    buttons = [button for row in keyboard for button in row]
+    assert all(len(row) <= 2 for row in keyboard)
+    assert [b['callback_data'] for b in buttons] == [f"help:{name}" for name in sorted(en_help.pages)]
+    title = en_help.titles['binary_encoder']
+    assert en_help.pages['binary_encoder'].startswith(f"*{title}*\n\n")